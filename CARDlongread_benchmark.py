@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import argparse
+import os
+import tempfile
+import shutil
+import contextlib
+import pandas as pd
+# report extraction, summary statistics and synthetic report scripts in this directory
+import CARDlongread_extract_from_json as extractor
+import CARDlongread_extract_summary_statistics as summary
+import CARDlongread_generate_test_reports as generator
+# per-stage timers of extraction and summary functions
+from CARDlongread_profiling import stage_profiler
+
+# benchmark stages in pipeline order, as recorded by stage_profiler in extract_reports, build_summary and write_summary
+# report discovery (directory walk or file list) timed before parsing, as its own stage
+# parse stage split into reading, decoding and field extraction (get_fields_from_json), summed over per-file timings,
+# and the rest of the stage (task handling), so each shows up separately
+# aggregation stage split into the aggregation functions (benchmark_aggregation_functions) and the rest of the stage (run cutoff)
+benchmark_stages = ['discovery', 'parse: reading', 'parse: decoding', 'parse: fields', 'parse: other', 'table', 'aggregation: top ups and reconnections', 'aggregation: per experiment', 'aggregation: per flow cell', 'aggregation: distributions', 'aggregation: other', 'statistics', 'histograms', 'decay', 'trends', 'plotting', 'workbook']
+# per-file timing names of parse stage parts
+parse_stage_timings = {'parse: reading' : 'read', 'parse: decoding' : 'decode', 'parse: fields' : 'fields'}
+# aggregation functions of summary statistics script timed as parts of aggregation stage
+benchmark_aggregation_functions = {
+    'identify_topups' : 'aggregation: top ups and reconnections',
+    'get_flow_cells_and_output_per_experiment' : 'aggregation: per experiment',
+    'get_output_per_flow_cell' : 'aggregation: per flow cell',
+    'get_flow_cells_per_experiment_dist' : 'aggregation: distributions',
+    'get_minknow_version_dist' : 'aggregation: distributions'
+}
+
+# time calls of aggregation functions (benchmark_aggregation_functions) as profiler stages while in block
+# functions replaced in summary statistics module, so build_summary calls the timed functions, and restored on leaving block
+@contextlib.contextmanager
+def time_aggregation_functions(profiler):
+    def make_timed_function(function, stage_name):
+        def timed_function(*args, **kwargs):
+            with profiler.stage(stage_name):
+                return function(*args, **kwargs)
+        return timed_function
+    functions = {name : getattr(summary, name) for name in benchmark_aggregation_functions}
+    try:
+        for name, stage_name in benchmark_aggregation_functions.items():
+            setattr(summary, name, make_timed_function(functions[name], stage_name))
+        yield
+    finally:
+        for name, function in functions.items():
+            setattr(summary, name, function)
+
+# time each stage of report extraction and summary once, running the same functions as CARDlongread_report_to_summary.py
+# histograms, mux_scans and trends add the read length and q score, pore decay and trend stages
+# figures always rendered, never read from figure cache
+# reports from file list (read_report_filelist) if filelist given, otherwise found in json_dir
+# returns dictionary of stage name and seconds (0 for stages not run) and report count
+def run_benchmark(json_dir, parser='selective', recursive=False, plots=True, plot_workers=1, run_cutoff=1, output_file=None, histograms=True, mux_scans=True, trends=True, filelist=None):
+    # timings only, tracemalloc would slow parsing and plotting
+    profiler = stage_profiler(True, trace_memory=False)
+    # directory walk is lazy, so report list is collected here to time it apart from parsing
+    with profiler.stage('discovery'):
+        if filelist is not None:
+            report_files = extractor.read_report_filelist(filelist)
+        else:
+            report_files = list(extractor.find_json_reports(json_dir, recursive=recursive))
+    series = [name for name, requested in [('histograms', histograms), ('mux_scans', mux_scans)] if requested]
+    if len(series) > 0:
+        longread_extract, *longread_extract_series = extractor.extract_reports(report_files, parser, profiler=profiler, histograms=histograms, mux_scans=mux_scans)
+    else:
+        longread_extract = extractor.extract_reports(report_files, parser, profiler=profiler)
+        longread_extract_series = []
+    longread_extract_series = dict(zip(series, longread_extract_series))
+    with time_aggregation_functions(profiler):
+        cohort_summary = summary.build_summary(longread_extract, run_cutoff, plots=plots, plot_workers=plot_workers, profiler=profiler, histograms=longread_extract_series.get('histograms'), mux_scans=longread_extract_series.get('mux_scans'), trends=trends)
+    with tempfile.TemporaryDirectory() as workbook_dir:
+        summary.write_summary(cohort_summary, output_file if output_file is not None else os.path.join(workbook_dir, 'benchmark.xlsx'), profiler=profiler)
+    stage_times = {stage : profiler.stages[stage]['wall_s'] if stage in profiler.stages else 0.0 for stage in benchmark_stages}
+    for stage, timing_name in parse_stage_timings.items():
+        stage_times[stage] = sum(profiler.file_latencies.get(timing_name, []))
+    stage_times['parse: other'] = max(profiler.stages['parse']['wall_s'] - sum(stage_times[stage] for stage in parse_stage_timings), 0.0)
+    stage_times['aggregation: other'] = max(profiler.stages['aggregation']['wall_s'] - sum(stage_times[stage] for stage in set(benchmark_aggregation_functions.values())), 0.0)
+    return stage_times, len(longread_extract)
+
+# time output table build from report rows repeated to table_rows rows
+# per-row .loc assignment into empty data frame (as extraction script did before column-wise build) against make_sequencing_report_df
+# reports from file list if filelist given, otherwise found in json_dir
+# returns dictionary of build method and best seconds over repeats
+def run_table_benchmark(json_dir, table_rows, parser='selective', recursive=False, repeat=1, filelist=None):
+    if filelist is not None:
+        report_files = extractor.read_report_filelist(filelist)
+    else:
+        report_files = extractor.find_json_reports(json_dir, recursive=recursive)
+    report_rows = []
+    for report_file in report_files:
+        current_row, current_series, error, manifest_entry = extractor.process_json_report(report_file, parser=parser)
+        if current_row is not None:
+            report_rows.append(current_row)
+    if len(report_rows) == 0:
+        raise ValueError(f'no JSON reports could be parsed in {filelist if filelist is not None else json_dir}')
+    report_rows = [report_rows[idx % len(report_rows)] for idx in range(table_rows)]
+    build_times = {'row-wise .loc' : None, 'column-wise' : None}
+    for attempt in range(repeat):
+        start_time = time.perf_counter()
+        sequencing_report_df = pd.DataFrame(index=range(table_rows), columns=extractor.sequencing_report_column_names)
+        for idx, current_row in enumerate(report_rows):
+            sequencing_report_df.loc[idx] = list(current_row)
+        loc_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        extractor.make_sequencing_report_df(report_rows)
+        column_time = time.perf_counter() - start_time
+        build_times['row-wise .loc'] = loc_time if build_times['row-wise .loc'] is None else min(build_times['row-wise .loc'], loc_time)
+        build_times['column-wise'] = column_time if build_times['column-wise'] is None else min(build_times['column-wise'], column_time)
+    return build_times
+
+# print table of stage times (best of repeats), milliseconds per report and change from previous results if given
+def print_benchmark_table(stage_times, report_count, previous_times=None):
+    print(f'{"Stage":<40}{"Seconds":>10}{"ms/report":>12}' + (f'{"Previous":>10}{"Change":>9}' if previous_times is not None else ''))
+    for stage in benchmark_stages + ['total']:
+        line = f'{stage:<40}{stage_times[stage]:>10.3f}{1000 * stage_times[stage] / max(report_count, 1):>12.3f}'
+        if previous_times is not None and stage in previous_times:
+            change = (stage_times[stage] / previous_times[stage] - 1) * 100 if previous_times[stage] > 0 else 0.0
+            line = line + f'{previous_times[stage]:>10.3f}{change:>+8.1f}%'
+        print(line)
+
+if __name__ == '__main__':
+    # set up command line argument parser
+    parser = argparse.ArgumentParser(description='This program times each stage of long read report extraction and summary (parsing, output table, aggregation, statistics, histograms, pore decay, trends, plotting and workbook writing) on synthetic or existing MinKNOW JSON reports.')
+
+    parser.add_argument('--json_dir', default=None, type=str, help = 'directory of existing JSON reports to benchmark on (optional; synthetic reports generated if not given)')
+    parser.add_argument('--filelist', default=None, type=str, help = 'text file listing existing JSON reports to benchmark on, instead of --json_dir (optional)')
+    parser.add_argument('--count', default=1000, type=int, help = 'number of synthetic reports to generate (optional, 1000 by default)')
+    parser.add_argument('--snapshots', default=2000, type=int, help = 'yield snapshots per synthetic report, which sets report size (optional, 2000 by default, about 400 KB per report)')
+    parser.add_argument('--seed', default=0, type=int, help = 'random seed for synthetic reports (optional, 0 by default)')
+    parser.add_argument('--keep', default=None, type=str, help = 'keep synthetic reports in this directory, reusing them if already there (optional; temporary directory removed by default)')
+    parser.add_argument('--generate_workers', default=1, type=int, help = 'number of worker processes used to generate synthetic reports (optional, 1 by default)')
+    parser.add_argument('--parser', default='selective', choices=['selective','full'], help = 'JSON parser benchmarked, as in CARDlongread_extract_from_json.py (optional, selective by default)')
+    parser.add_argument('--recursive', action=argparse.BooleanOptionalAction, default=False, help = 'also search subdirectories of JSON_DIR for JSON reports (optional; default false)')
+    parser.add_argument('--plots', action=argparse.BooleanOptionalAction, default=True, help = 'include plotting stage (optional; default true; --no-plots to skip)')
+    parser.add_argument('--histograms', action=argparse.BooleanOptionalAction, default=True, help = 'extract read length and q score histograms and include histogram stage (optional; default true; --no-histograms to skip)')
+    parser.add_argument('--mux_scans', action=argparse.BooleanOptionalAction, default=True, help = 'extract mux scan series and include pore decay stage (optional; default true; --no-mux_scans to skip)')
+    parser.add_argument('--trends', action=argparse.BooleanOptionalAction, default=True, help = 'include weekly and monthly trend stage (optional; default true; --no-trends to skip)')
+    parser.add_argument('--plot_workers', default=1, type=int, help = 'number of worker processes used to render figures (optional, 1 by default)')
+    parser.add_argument('--repeat', default=1, type=int, help = 'run benchmark this many times and report best time of each stage (optional, 1 by default)')
+    parser.add_argument('--table_rows', default=None, type=int, help = 'only time output table build at this many rows (rows parsed from reports and repeated), per-row .loc assignment against column-wise build (optional)')
+    parser.add_argument('--output', default=None, type=str, help = 'write stage times to JSON file, for comparing runs with --compare (optional)')
+    parser.add_argument('--compare', default=None, type=str, help = 'JSON file of stage times from earlier run (--output) to compare against (optional)')
+
+    args = parser.parse_args()
+
+    # generate synthetic reports unless existing reports given
+    json_dir = args.json_dir
+    temporary_dir = None
+    if json_dir is None and args.filelist is None:
+        if args.keep is not None:
+            json_dir = args.keep
+        else:
+            temporary_dir = tempfile.mkdtemp(prefix='CARDlongread_benchmark_')
+            json_dir = temporary_dir
+        if not os.path.isdir(json_dir) or len(os.listdir(json_dir)) == 0:
+            start_time = time.perf_counter()
+            generator.write_synthetic_reports(json_dir, args.count, args.generate_workers, seed=args.seed, snapshots=args.snapshots)
+            print(f'Generated {args.count} synthetic reports in {json_dir} ({time.perf_counter() - start_time:.1f} s)')
+
+    if args.table_rows is not None:
+        try:
+            build_times = run_table_benchmark(json_dir, args.table_rows, args.parser, args.recursive, args.repeat, args.filelist)
+        except ValueError as e:
+            quit(f'ERROR: {e}!')
+        finally:
+            if temporary_dir is not None:
+                shutil.rmtree(temporary_dir)
+        print(f'Output table build, {args.table_rows} rows, best of {args.repeat}')
+        print(f'{"Method":<30}{"Seconds":>10}{"Speedup":>10}')
+        for method, seconds in build_times.items():
+            print(f'{method:<30}{seconds:>10.3f}{build_times["row-wise .loc"] / seconds:>9.1f}x')
+        if args.output is not None:
+            with open(args.output, 'w') as outfile:
+                json.dump({'table_rows' : args.table_rows, 'parser' : args.parser, 'repeat' : args.repeat, 'table_build' : build_times}, outfile, indent=1)
+        quit()
+
+    try:
+        # best time of each stage over repeats
+        best_times = None
+        for repeat in range(args.repeat):
+            stage_times, report_count = run_benchmark(json_dir, args.parser, args.recursive, args.plots, args.plot_workers, histograms=args.histograms, mux_scans=args.mux_scans, trends=args.trends, filelist=args.filelist)
+            if best_times is None:
+                best_times = stage_times
+            else:
+                best_times = {stage: min(best_times[stage], stage_times[stage]) for stage in benchmark_stages}
+        best_times['total'] = sum(best_times[stage] for stage in benchmark_stages)
+    finally:
+        if temporary_dir is not None:
+            shutil.rmtree(temporary_dir)
+
+    # compare with earlier results if given
+    previous_times = None
+    if args.compare is not None:
+        with open(args.compare) as infile:
+            previous_times = json.load(infile)['stages']
+    print(f'{report_count} reports, {args.parser} parser, best of {args.repeat}')
+    print_benchmark_table(best_times, report_count, previous_times)
+
+    # save results
+    if args.output is not None:
+        with open(args.output, 'w') as outfile:
+            json.dump({'reports' : report_count, 'parser' : args.parser, 'repeat' : args.repeat, 'stages' : best_times}, outfile, indent=1)
@@ -2,129 +2,817 @@
 # long read sequencing report JSON parser
 # output fields are Experiment Name, Sample Name, Run Date, PROM ID, Flow Cell ID, Data output (Gb), N50 (kb), MinKNOW Version
 # look for Q score in the future and possibly also total reads
-import glob
 import json
+# regular expressions for scanning JSON report bytes (--parser selective)
+import re
+# bind parser choice to worker function
+import functools
 import pandas as pd
 import numpy as np
 import argparse
 import dataclasses
-# get fields from json
-def get_fields_from_json(input_json_dict):
-    # define fields_from_json class
-    @dataclasses.dataclass
-    class fields_from_json:
-        experiment_name : ''
-        sample_name : ''
-        run_date : ''
-        prom_id : ''
-        flow_cell_id : ''
-        minknow_version : ''
-        data_output : float = 0
-        n50 : float = 0
-        modal_q_score_passed : float = 0
-        modal_q_score_failed : float = 0
-        starting_active_pores : float = 0
-        second_active_pore_count : float = 0
-    # get elements from json-based dictionary
-    fields_from_json.experiment_name = input_json_dict['protocol_run_info']['user_info']['protocol_group_id']
-    fields_from_json.sample_name = input_json_dict['protocol_run_info']['user_info']['sample_id']
-    fields_from_json.run_date = input_json_dict['protocol_run_info']['start_time'][0:10]
-    fields_from_json.prom_id = input_json_dict['host']['serial']
-    fields_from_json.flow_cell_id = input_json_dict['protocol_run_info']['flow_cell']['flow_cell_id']
-    # be sure to handle exception of no data output
+# process pool for parallel report parsing (--workers)
+import concurrent.futures
+# file metadata and content hashes for manifest cache (--incremental)
+import os
+import hashlib
+# per-stage and per-file timing and memory instrumentation (--profile)
+import time
+from CARDlongread_profiling import stage_profiler
+# report discovery (--recursive, --include) and compressed reports
+import fnmatch
+import gzip
+import zlib
+# optional zstandard package for reading .json.zst reports
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+# optional pyarrow package for Parquet and Feather output (--format)
+import importlib.util
+pyarrow_available = importlib.util.find_spec('pyarrow') is not None
+# output table column names and types (schema of tsv, Parquet and Feather output)
+# repeated identifiers (PROM ID, Flow Cell ID, MinKNOW Version) are categorical, Run Date is a date
+# numeric columns are nullable, with missing values (written as NA) for values missing from report
+sequencing_report_columns = {
+    'Experiment Name' : 'object',
+    'Sample Name' : 'object',
+    'Run Date' : 'datetime64[ns]',
+    'PROM ID' : 'category',
+    'Flow Cell ID' : 'category',
+    'Data output (Gb)' : 'Float64',
+    'N50 (kb)' : 'Float64',
+    'MinKNOW Version' : 'category',
+    'Passed Modal Q Score' : 'Float64',
+    'Failed Modal Q Score' : 'Float64',
+    'Starting Active Pores' : 'Int64',
+    'Second Pore Count' : 'Int64'
+}
+sequencing_report_column_names = list(sequencing_report_columns)
+# define fields_from_json class
+# one record per report, __slots__ keeps records compact when parsing thousands of reports
+# field order matches output table columns
+@dataclasses.dataclass
+class fields_from_json:
+    __slots__ = ('experiment_name', 'sample_name', 'run_date', 'prom_id', 'flow_cell_id', 'data_output', 'n50', 'minknow_version', 'modal_q_score_passed', 'modal_q_score_failed', 'starting_active_pores', 'second_active_pore_count')
+    experiment_name : str
+    sample_name : str
+    run_date : str
+    prom_id : str
+    flow_cell_id : str
+    data_output : float
+    n50 : float
+    minknow_version : str
+    modal_q_score_passed : float
+    modal_q_score_failed : float
+    starting_active_pores : float
+    second_active_pore_count : float
+# report field schema
+# each output field maps to a path in the report JSON, an optional conversion and a value used if the path is missing
+# paths are tuples of object keys and array indices
+# fields without a missing value are required (KeyError if not in report)
+common_report_fields = {
+    'experiment_name' : {'path' : ('protocol_run_info','user_info','protocol_group_id')},
+    'sample_name' : {'path' : ('protocol_run_info','user_info','sample_id')},
+    'run_date' : {'path' : ('protocol_run_info','start_time'), 'convert' : lambda start_time: start_time[0:10]},
+    'prom_id' : {'path' : ('host','serial')},
+    'flow_cell_id' : {'path' : ('protocol_run_info','flow_cell','flow_cell_id')},
     # convert data output from bases to Gb with three decimal places
     # use total estimated bases as output
-    if 'estimated_selected_bases' in input_json_dict['acquisitions'][3]['acquisition_run_info']['yield_summary']:
-        fields_from_json.data_output = round(pd.to_numeric(input_json_dict['acquisitions'][3]['acquisition_run_info']['yield_summary']['estimated_selected_bases'])/1e9, 3)
-    else:
-        fields_from_json.data_output = 0
+    # values are strings in reports; rounded as NumPy floats (half to even on scaled value, as pd.to_numeric before), not Python floats
+    'data_output' : {'path' : ('acquisitions',3,'acquisition_run_info','yield_summary','estimated_selected_bases'), 'convert' : lambda bases: float(round(np.float64(bases)/1e9, 3)), 'missing' : 0.0},
     # get n50 in kb to two decimal places for estimated bases, not basecalled bases
-    if 'n50' in input_json_dict['acquisitions'][3]['read_length_histogram'][3]['plot']['histogram_data'][0]:
-        fields_from_json.n50 = round(pd.to_numeric(input_json_dict['acquisitions'][3]['read_length_histogram'][3]['plot']['histogram_data'][0]['n50'])/1e3, 2)
-    else:
-        fields_from_json.n50 = 0
+    'n50' : {'path' : ('acquisitions',3,'read_length_histogram',3,'plot','histogram_data',0,'n50'), 'convert' : lambda n50: float(round(np.float64(n50)/1e3, 2)), 'missing' : 0.0},
+    # modal q score for passed (index 0) and failed (index 1) reads
+    'modal_q_score_passed' : {'path' : ('acquisitions',3,'qscore_histograms',0,'histogram_data',0,'modal_q_score'), 'convert' : float, 'missing' : np.nan},
+    'modal_q_score_failed' : {'path' : ('acquisitions',3,'qscore_histograms',0,'histogram_data',1,'modal_q_score'), 'convert' : float, 'missing' : np.nan},
+    # active pores from first (index 0) and second (index 1) mux scans
+    'starting_active_pores' : {'path' : ('acquisitions',3,'acquisition_run_info','bream_info','mux_scan_results',0,'counts'), 'convert' : lambda counts: counts['single_pore'] + counts['reserved_pore'], 'missing' : np.nan},
+    'second_active_pore_count' : {'path' : ('acquisitions',3,'acquisition_run_info','bream_info','mux_scan_results',1,'counts'), 'convert' : lambda counts: counts['single_pore'] + counts['reserved_pore'], 'missing' : np.nan}
+}
+# MinKNOW report layouts, newest last
+# layout detected once per report from path found only in that layout, falling back to newest layout
+# fields listed for a layout replace common fields of the same name
+report_layouts = [
+    # old software_versions path in 2023 MinKNOW releases
+    {'detect' : ('software_versions',), 'fields' : {'minknow_version' : {'path' : ('software_versions','distribution_version')}}},
+    # new software_versions path in 2024 MinKNOW releases (through 24.02.19)
+    {'detect' : ('protocol_run_info','software_versions'), 'fields' : {'minknow_version' : {'path' : ('protocol_run_info','software_versions','distribution_version')}}}
+]
+
+# compile path into function returning value at that path in report dictionary
+# KeyError, IndexError or TypeError if path not in report
+def compile_report_path(path):
+    path = tuple(path)
+    def get_value(report):
+        for key in path:
+            report = report[key]
+        return report
+    return get_value
+
+# compile field schema entry into accessor function returning converted field value
+def compile_field_accessor(field):
+    get_value = compile_report_path(field['path'])
+    convert = field.get('convert')
+    if 'missing' not in field:
+        if convert is None:
+            return get_value
+        return lambda report: convert(get_value(report))
+    missing = field['missing']
+    def field_accessor(report):
+        try:
+            value = get_value(report)
+        except (KeyError, IndexError, TypeError):
+            return missing
+        return value if convert is None else convert(value)
+    return field_accessor
+
+# compile layout into layout test and accessors for each fields_from_json field in order
+def compile_report_layout(layout):
+    layout_fields = {**common_report_fields, **layout['fields']}
+    get_detect_value = compile_report_path(layout['detect'])
+    def layout_detected(report):
+        try:
+            get_detect_value(report)
+        except (KeyError, IndexError, TypeError):
+            return False
+        return True
+    return layout_detected, [compile_field_accessor(layout_fields[field]) for field in fields_from_json.__slots__]
+
+compiled_report_layouts = [compile_report_layout(layout) for layout in report_layouts]
+
+# common bin grids for report histograms (--histograms), so histograms of runs with different bucket ranges can be summed
+# read lengths: 1 kb bins to 100 kb, then 10 kb bins to 1 Mb (longer reads counted in last bin)
+read_length_bin_edges = np.concatenate([np.arange(0, 100000, 1000), np.arange(100000, 1000001, 10000)]).astype(np.float64)
+# q scores: 0.5 bins from 0 to 50
+qscore_bin_edges = np.arange(0, 50.5, 0.5)
+# report histograms kept, each from path of histogram with bucket_ranges and bucket_values in report JSON
+# estimated bases per read length (histogram n50 is taken from) and bases per q score of passed (index 0) and failed (index 1) reads
+report_histogram_fields = {
+    'read_length_bases' : {'path' : ('acquisitions',3,'read_length_histogram',3,'plot','histogram_data',0), 'bin_edges' : read_length_bin_edges},
+    'qscore_passed_bases' : {'path' : ('acquisitions',3,'qscore_histograms',0,'histogram_data',0), 'bin_edges' : qscore_bin_edges},
+    'qscore_failed_bases' : {'path' : ('acquisitions',3,'qscore_histograms',0,'histogram_data',1), 'bin_edges' : qscore_bin_edges}
+}
+compiled_report_histogram_fields = [(compile_report_path(field['path']), field['bin_edges']) for field in report_histogram_fields.values()]
+
+# histograms of parsed reports on common bin grids, one row (float32) per report in output table order
+@dataclasses.dataclass
+class report_histograms:
+    read_length_bases : np.ndarray
+    qscore_passed_bases : np.ndarray
+    qscore_failed_bases : np.ndarray
+    read_length_bin_edges : np.ndarray = dataclasses.field(default_factory=lambda: read_length_bin_edges)
+    qscore_bin_edges : np.ndarray = dataclasses.field(default_factory=lambda: qscore_bin_edges)
+
+# rebin histogram onto common bin grid, spreading each bucket's value evenly over its range
+# cumulative value rises linearly across each bucket and is read off at the new bin edges, so buckets may have any width or gaps
+# values beyond the last bin edge are added to the last bin
+def rebin_histogram(bucket_starts, bucket_ends, bucket_values, bin_edges):
+    if len(bucket_values) == 0:
+        return np.zeros(len(bin_edges) - 1)
+    cumulative = np.cumsum(bucket_values)
+    bucket_edges = np.column_stack([bucket_starts, bucket_ends]).ravel()
+    cumulative_at_edges = np.column_stack([cumulative - bucket_values, cumulative]).ravel()
+    cumulative_at_bins = np.interp(bin_edges, bucket_edges, cumulative_at_edges, left=0.0)
+    binned = np.diff(cumulative_at_bins)
+    binned[-1] += cumulative[-1] - cumulative_at_bins[-1]
+    return binned
+
+# get histograms from json on common bin grids (tuple in report_histogram_fields order)
+# histograms missing from report are all zeros
+def get_histograms_from_json(input_json_dict):
+    histograms = []
+    for get_histogram_data, bin_edges in compiled_report_histogram_fields:
+        try:
+            histogram_data = get_histogram_data(input_json_dict)
+            bucket_starts = np.array([bucket_range['start'] for bucket_range in histogram_data['bucket_ranges']], dtype=np.float64)
+            bucket_ends = np.array([bucket_range['end'] for bucket_range in histogram_data['bucket_ranges']], dtype=np.float64)
+            bucket_values = np.array(histogram_data['bucket_values'], dtype=np.float64)
+        except (KeyError, IndexError, TypeError):
+            histograms.append(np.zeros(len(bin_edges) - 1, dtype=np.float32))
+            continue
+        histograms.append(rebin_histogram(bucket_starts, bucket_ends, bucket_values, bin_edges).astype(np.float32))
+    return tuple(histograms)
+
+# make report histograms from histogram rows (tuples in report_histogram_fields order), stacking each histogram into one 2D array
+def make_report_histograms(histogram_rows):
+    stacked_histograms = []
+    for histogram_index, field in enumerate(report_histogram_fields.values()):
+        if len(histogram_rows) > 0:
+            stacked_histograms.append(np.vstack([histogram_row[histogram_index] for histogram_row in histogram_rows]).astype(np.float32))
+        else:
+            stacked_histograms.append(np.zeros((0, len(field['bin_edges']) - 1), dtype=np.float32))
+    return report_histograms(*stacked_histograms)
+
+# concatenate report histograms of consecutive batches of reports (e.g., reports added in watch mode) in batch order
+def concat_report_histograms(histograms_list):
+    return report_histograms(*[np.concatenate([getattr(histograms, field_name) for histograms in histograms_list]) for field_name in report_histogram_fields])
+
+# full mux scan series of sequencing acquisition (--mux_scans)
+report_mux_scan_path = ('acquisitions',3,'acquisition_run_info','bream_info','mux_scan_results')
+get_report_mux_scan_results = compile_report_path(report_mux_scan_path)
+
+# mux scan series of parsed reports as ragged arrays, in output table order
+# scans of report i are hours[offsets[i]:offsets[i+1]] and active_pores[offsets[i]:offsets[i+1]], so a cohort takes three flat arrays
+@dataclasses.dataclass
+class report_mux_scans:
+    offsets : np.ndarray
+    hours : np.ndarray
+    active_pores : np.ndarray
+
+# get hours since run start and active pores (single + reserved pores, as for starting active pores) of each mux scan from json
+# returns tuple of two arrays, empty if report has no mux scans; scans without timestamp have NaN hours
+def get_mux_scans_from_json(input_json_dict):
+    try:
+        mux_scan_results = get_report_mux_scan_results(input_json_dict)
+        hours = np.array([float(mux_scan.get('mux_scan_timestamp', 'nan')) / 3600 for mux_scan in mux_scan_results], dtype=np.float32)
+        active_pores = np.array([mux_scan['counts']['single_pore'] + mux_scan['counts']['reserved_pore'] for mux_scan in mux_scan_results], dtype=np.int32)
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32)
+    return hours, active_pores
+
+# make report mux scans from mux scan rows ((hours, active pores) per report), concatenating series with offsets of each report
+def make_report_mux_scans(mux_scan_rows):
+    scan_counts = [len(hours) for hours, active_pores in mux_scan_rows]
+    offsets = np.concatenate([[0], np.cumsum(scan_counts)]).astype(np.int64)
+    hours = np.concatenate([np.zeros(0)] + [hours for hours, active_pores in mux_scan_rows]).astype(np.float32)
+    active_pores = np.concatenate([np.zeros(0)] + [active_pores for hours, active_pores in mux_scan_rows]).astype(np.int32)
+    return report_mux_scans(offsets, hours, active_pores)
+
+# concatenate report mux scans of consecutive batches of reports in batch order, shifting offsets of each batch past scans of earlier batches
+def concat_report_mux_scans(mux_scans_list):
+    scan_totals = np.cumsum([0] + [mux_scans.offsets[-1] for mux_scans in mux_scans_list])
+    offsets = np.concatenate([[0]] + [mux_scans.offsets[1:] + scan_total for mux_scans, scan_total in zip(mux_scans_list, scan_totals)]).astype(np.int64)
+    return report_mux_scans(offsets, np.concatenate([mux_scans.hours for mux_scans in mux_scans_list]), np.concatenate([mux_scans.active_pores for mux_scans in mux_scans_list]))
+
+# series kept for each report besides its output table row (--histograms, --mux_scans), written to OUTPUT_FILE.<name>.npz
+# get returns series of one report (tuple of arrays) from report JSON, paths are decoded whole by the selective parser,
+# make combines series of all reports in output table order, and concat joins series of consecutive batches of reports
+report_series = {
+    'histograms' : {'get' : get_histograms_from_json, 'paths' : [field['path'] for field in report_histogram_fields.values()], 'make' : make_report_histograms, 'concat' : concat_report_histograms},
+    'mux_scans' : {'get' : get_mux_scans_from_json, 'paths' : [report_mux_scan_path], 'make' : make_report_mux_scans, 'concat' : concat_report_mux_scans}
+}
+
+# write report series (report_histograms or report_mux_scans) to compressed NumPy file (.npz)
+def write_report_series(series_file, series):
+    with open(series_file, 'wb') as outfile:
+        np.savez_compressed(outfile, **dataclasses.asdict(series))
+
+# read report series written by write_report_series as series_class (report_histograms or report_mux_scans)
+def read_report_series(series_file, series_class):
+    with np.load(series_file) as series_arrays:
+        return series_class(**{field.name : series_arrays[field.name] for field in dataclasses.fields(series_class)})
+
+# get fields from json
+def get_fields_from_json(input_json_dict):
     # need to branch here because minknow version is in different locations depending on json version type
-    if 'software_versions' not in input_json_dict:
-        # new software_versions path in 2024
-        fields_from_json.minknow_version = input_json_dict['protocol_run_info']['software_versions']['distribution_version']
+    # detect layout once, then extract all fields with its accessors
+    for layout_detected, field_accessors in compiled_report_layouts:
+        if layout_detected(input_json_dict):
+            break
+    return fields_from_json(*[field_accessor(input_json_dict) for field_accessor in field_accessors])
+
+# make typed output data frame from report rows (tuples in fields_from_json order)
+# rows are transposed into columns once and each column converted to its output type
+def make_sequencing_report_df(report_rows):
+    if len(report_rows) > 0:
+        report_columns = zip(*report_rows)
     else:
-        # old software_versions path in 2023
-        fields_from_json.minknow_version = input_json_dict['software_versions']['distribution_version']
-    # get modal q score for passed and failed reads if found in json file
-    if 'qscore_histograms' in input_json_dict['acquisitions'][3]:
-        # test if passed reads present as element
-        if len(input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data']) >= 1:
-            # test if passed reads present as element but no reads actually passed
-            if 'modal_q_score' in input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data'][0]:
-                fields_from_json.modal_q_score_passed = input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data'][0]['modal_q_score']
-            else:
-                fields_from_json.modal_q_score_passed = 'NA'
-        else:
-            fields_from_json.modal_q_score_passed = 'NA'
-        # test if failed reads present
-        if len(input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data']) >= 2:
-            # test if failed reads present as element but no reads actually failed
-            if 'modal_q_score' in input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data'][1]:
-                fields_from_json.modal_q_score_failed = input_json_dict['acquisitions'][3]['qscore_histograms'][0]['histogram_data'][1]['modal_q_score']
-            else:
-                fields_from_json.modal_q_score_failed = 'NA'
+        report_columns = [[] for name in sequencing_report_column_names]
+    return pd.DataFrame({name : make_sequencing_report_column(column, sequencing_report_columns[name]) for name, column in zip(sequencing_report_column_names, report_columns)})
+
+# convert one column of report values to its output type
+# dates are parsed from YYYY-MM-DD strings, with unparseable dates missing
+def make_sequencing_report_column(column, column_type):
+    if column_type.startswith('datetime64'):
+        return pd.to_datetime(pd.Series(column, dtype=object), format='%Y-%m-%d', errors='coerce').astype(column_type)
+    return pd.Series(column, dtype=column_type)
+
+# output table formats, picked from output file extension unless --format set
+sequencing_report_formats = {'.tsv' : 'tsv', '.txt' : 'tsv', '.parquet' : 'parquet', '.pq' : 'parquet', '.feather' : 'feather', '.arrow' : 'feather'}
+
+# get output table format from output file extension (tsv if not recognised)
+def get_sequencing_report_format(output_file):
+    return sequencing_report_formats.get(os.path.splitext(output_file)[1].lower(), 'tsv')
+
+# write output table as tab-delimited text, Parquet or Feather (Arrow IPC file, uncompressed so it can be memory mapped)
+# Parquet and Feather keep column types, so no type inference when read back; both need the pyarrow package
+def write_sequencing_report_df(sequencing_report_df, output_file, output_format='tsv'):
+    if output_format == 'parquet':
+        sequencing_report_df.to_parquet(output_file, index=False)
+    elif output_format == 'feather':
+        sequencing_report_df.to_feather(output_file, compression='uncompressed')
+    else:
+        sequencing_report_df.to_csv(output_file,sep='\t',index=False,na_rep='NA')
+
+# selective JSON parsing
+# only the paths used by get_fields_from_json are decoded into Python objects
+# everything else (large histogram and time series arrays) is skipped by scanning the raw bytes
+# make nested selection of paths to decode from report JSON
+# objects are nested dictionaries keyed by field name, arrays nested dictionaries keyed by element index
+# True decodes the whole value at that path
+def make_report_json_selection(paths):
+    selection = {}
+    for path in paths:
+        node = selection
+        for key in path[:-1]:
+            if node.get(key) is True:
+                break
+            node = node.setdefault(key, {})
         else:
-            fields_from_json.modal_q_score_failed = 'NA'
+            node[path[-1]] = True
+    return selection
+
+# decode paths of all fields and layout tests in report schema
+report_json_paths = [field['path'] for field in common_report_fields.values()] + [layout['detect'] for layout in report_layouts] + [field['path'] for layout in report_layouts for field in layout['fields'].values()]
+report_json_selection = make_report_json_selection(report_json_paths)
+
+# selection also decoding paths of report series (--histograms, --mux_scans), made once for each set of series
+@functools.lru_cache(maxsize=None)
+def get_report_json_selection(series=()):
+    if len(series) == 0:
+        return report_json_selection
+    return make_report_json_selection(report_json_paths + [path for name in series for path in report_series[name]['paths']])
+# whitespace between JSON tokens
+json_whitespace = re.compile(rb'[ \t\n\r]*')
+# JSON strings, including escaped characters
+json_string = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# numbers, true, false and null
+json_scalar = re.compile(rb'[^\s,\]}]+')
+
+# make JSON decoding error for position idx in report bytes
+def json_report_error(message, buf, idx):
+    return json.JSONDecodeError(message, buf[:idx].decode('utf-8', 'replace'), idx)
+
+# find end of JSON array or object starting at idx in report bytes without building Python objects
+# counts bracket depth with numpy over growing chunks so small values stay cheap and memory stays bounded for large ones
+# with depth 1, idx is inside the container (outside any string) and the end of that container is returned
+def skip_json_container(buf, idx, depth=0):
+    in_string = 0
+    pos = idx
+    chunk_size = 4096
+    while pos < len(buf):
+        chunk = np.frombuffer(buf, dtype=np.uint8, count=min(chunk_size, len(buf) - pos), offset=pos)
+        # quotes and brackets in chunk
+        structural = np.flatnonzero((chunk == 34) | (chunk == 91) | (chunk == 93) | (chunk == 123) | (chunk == 125))
+        chars = chunk[structural]
+        quotes = chars == 34
+        # quotes that open or close strings (not escaped by odd number of backslashes)
+        # backslashes counted back into previous chunk, so also checked if previous chunk ended with a backslash
+        string_toggles = quotes.copy()
+        if np.any(chunk == 92) or (pos > idx and buf[pos - 1] == 92):
+            for q in np.flatnonzero(quotes):
+                backslash_idx = pos + int(structural[q]) - 1
+                while buf[backslash_idx] == 92:
+                    backslash_idx -= 1
+                if (pos + int(structural[q]) - 1 - backslash_idx) % 2 == 1:
+                    string_toggles[q] = False
+        # string state after each character, brackets only count outside strings
+        string_state = (np.cumsum(string_toggles) + in_string) & 1
+        outside_string = ~quotes & (string_state == 0)
+        depth_change = np.where(outside_string, np.where((chars == 91) | (chars == 123), 1, -1), 0)
+        depth_after = np.cumsum(depth_change) + depth
+        closed = np.flatnonzero(depth_after == 0)
+        if len(closed) > 0:
+            return pos + int(structural[closed[0]]) + 1
+        # carry state into next chunk
+        if len(chars) > 0:
+            depth = int(depth_after[-1])
+            in_string = int(string_state[-1])
+        pos += len(chunk)
+        chunk_size = min(chunk_size * 4, 1 << 20)
+    raise json_report_error('Unterminated array or object', buf, idx)
+
+# skip JSON value starting at idx and return position after it
+def skip_json_value(buf, idx):
+    if buf[idx] in b'[{':
+        return skip_json_container(buf, idx)
+    elif buf[idx] == 34:
+        token = json_string.match(buf, idx)
     else:
-        fields_from_json.modal_q_score_passed = 'NA'
-        fields_from_json.modal_q_score_failed = 'NA'
-    # get starting active pores if in json file
-    if len(input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results']) >= 1:
-        # get first (index 0) mux scan results
-        fields_from_json.starting_active_pores = input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results'][0]['counts']['single_pore'] + input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results'][0]['counts']['reserved_pore']
+        token = json_scalar.match(buf, idx)
+    if token is None:
+        raise json_report_error('Expecting value', buf, idx)
+    return token.end()
+
+# decode selected paths of JSON value starting at idx and return (value, position after value)
+# objects keep only selected keys; arrays keep None for unselected elements and end after the last selected element,
+# with the rest of the array skipped in one pass
+def select_json_value(buf, idx, selection):
+    if selection is True or buf[idx] not in b'[{':
+        end = skip_json_value(buf, idx)
+        return json.loads(buf[idx:end]), end
+    if buf[idx] == 123:
+        value = {}
+        idx = json_whitespace.match(buf, idx + 1).end()
+        if buf[idx] == 125:
+            return value, idx + 1
+        while True:
+            # object key and separator
+            key_token = json_string.match(buf, idx)
+            if key_token is None:
+                raise json_report_error('Expecting property name enclosed in double quotes', buf, idx)
+            key = json.loads(key_token.group())
+            idx = json_whitespace.match(buf, key_token.end()).end()
+            if buf[idx] != 58:
+                raise json_report_error("Expecting ':' delimiter", buf, idx)
+            idx = json_whitespace.match(buf, idx + 1).end()
+            if key in selection:
+                value[key], idx = select_json_value(buf, idx, selection[key])
+            else:
+                idx = skip_json_value(buf, idx)
+            idx = json_whitespace.match(buf, idx).end()
+            if buf[idx] == 125:
+                return value, idx + 1
+            if buf[idx] != 44:
+                raise json_report_error("Expecting ',' delimiter", buf, idx)
+            idx = json_whitespace.match(buf, idx + 1).end()
     else:
-        fields_from_json.starting_active_pores = 'NA'
-    # get second active pore count if in json file
-    if len(input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results']) >= 2:
-        # get first (index 0) mux scan results
-        fields_from_json.second_active_pore_count = input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results'][1]['counts']['single_pore'] + input_json_dict['acquisitions'][3]['acquisition_run_info']['bream_info']['mux_scan_results'][1]['counts']['reserved_pore']
+        value = []
+        last_selected = max((key for key in selection if isinstance(key, int)), default=-1)
+        idx = json_whitespace.match(buf, idx + 1).end()
+        if buf[idx] == 93:
+            return value, idx + 1
+        while True:
+            if len(value) in selection:
+                element, idx = select_json_value(buf, idx, selection[len(value)])
+            else:
+                element, idx = None, skip_json_value(buf, idx)
+            value.append(element)
+            if len(value) > last_selected:
+                return value, skip_json_container(buf, idx, 1)
+            idx = json_whitespace.match(buf, idx).end()
+            if buf[idx] == 93:
+                return value, idx + 1
+            if buf[idx] != 44:
+                raise json_report_error("Expecting ',' delimiter", buf, idx)
+            idx = json_whitespace.match(buf, idx + 1).end()
+
+# reports smaller than this are decoded whole, which is faster than selective decoding for small reports
+selective_json_min_size = 256 * 1024
+
+# load report JSON bytes keeping only the paths in selection (report_json_selection by default)
+def load_selected_json(buf, selection=report_json_selection):
+    if len(buf) < selective_json_min_size:
+        return json.loads(buf)
+    try:
+        idx = json_whitespace.match(buf).end()
+        data, idx = select_json_value(buf, idx, selection)
+    except IndexError:
+        # ran off end of truncated JSON report
+        raise json_report_error('Unexpected end of JSON report', buf, len(buf))
+    if json_whitespace.match(buf, idx).end() != len(buf):
+        raise json_report_error('Extra data', buf, idx)
+    return data
+
+# compressed report suffixes, read transparently
+compressed_report_suffixes = ('.gz', '.zst')
+
+# check whether report file name matches include pattern, with any compressed suffix removed
+def match_report_name(report_name, include='*.json'):
+    for suffix in compressed_report_suffixes:
+        if report_name.endswith(suffix):
+            report_name = report_name[:-len(suffix)]
+            break
+    return fnmatch.fnmatchcase(report_name, include)
+
+# find JSON reports in json_dir with os.scandir, yielding paths as they are found so parsing can start during the walk
+# with recursive set, descend into subdirectories (symbolic links to directories not followed)
+# include is matched against file names with any compressed suffix removed
+# entries sorted within each directory so output order is the same between runs
+def find_json_reports(json_dir, include='*.json', recursive=False):
+    directories = [json_dir]
+    while len(directories) > 0:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            print(e)
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append(entry.path)
+                continue
+            if match_report_name(entry.name, include):
+                yield entry.path
+        # visit subdirectories depth first in sorted order
+        directories.extend(reversed(subdirectories))
+
+# read list of JSON report paths (one per line) from text file
+def read_report_filelist(filelist):
+    with open(filelist, 'r') as infile:
+        return [x.strip() for x in infile.readlines()]
+
+# errors of truncated or corrupt compressed reports (e.g., archive still being written)
+compressed_report_errors = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+# read report bytes, decompressing .json.gz and .json.zst reports
+# truncated or corrupt compressed reports raise ValueError, as truncated JSON does, so they are reported per file
+def read_report_file(json_file):
+    if json_file.endswith('.gz'):
+        try:
+            with gzip.open(json_file, 'rb') as f:
+                return f.read()
+        except compressed_report_errors as e:
+            raise ValueError(f'{json_file}: {e}')
+    elif json_file.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError(f'{json_file}: zstandard package required to read .json.zst reports')
+        try:
+            with open(json_file, 'rb') as f:
+                compressed_bytes = f.read()
+            # decompress frame by frame, as streaming reads stop quietly at the end of a truncated frame
+            report_chunks = []
+            while True:
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+                report_chunks.append(decompressor.decompress(compressed_bytes))
+                if not decompressor.eof:
+                    raise EOFError('Compressed file ended before the end of the zstandard frame was reached')
+                compressed_bytes = decompressor.unused_data
+                if len(compressed_bytes) == 0:
+                    return b''.join(report_chunks)
+        except compressed_report_errors as e:
+            raise ValueError(f'{json_file}: {e}')
     else:
-        fields_from_json.second_active_pore_count = 'NA'
-    return fields_from_json
-# load json file list
-# user input
-inparser = argparse.ArgumentParser(description = 'Extract data from long read JSON report')
-inparser.add_argument('--json_dir', default=None, type=str, help = 'path to directory containing JSON files, if converting whole directory')
-inparser.add_argument('--filelist', default=None, type=str, help = 'text file containing list of all JSON reports to parse')
-inparser.add_argument('--output', action="store", type=str, dest="output_file", help="Output long read JSON report summary table in tab-delimited format")
-args = inparser.parse_args()
-# get list of files
-if args.json_dir is not None:
-    files = glob.glob(f'{args.json_dir}/*.json')
-elif args.filelist is not None:
-    with open(args.filelist, 'r') as infile:
-        files = [x.strip() for x in infile.readlines()]
-else:
-    quit('ERROR: No directory (--json_dir) or file list (--filelist) provided!')
-# create output data frame
-# set indices
-sequencing_report_df_indices = [np.arange(0,len(files))]
-# set column names
-sequencing_report_column_names = ['Experiment Name','Sample Name','Run Date','PROM ID','Flow Cell ID','Data output (Gb)','N50 (kb)','MinKNOW Version', 'Passed Modal Q Score', 'Failed Modal Q Score', 'Starting Active Pores', "Second Pore Count"]
-# initialize data frame with said column names and filenames as indexes
-sequencing_report_df = pd.DataFrame(index=sequencing_report_df_indices,columns=sequencing_report_column_names)
-# main loop to process files
-for idx, x in enumerate(files):
+        with open(json_file, 'rb') as f:
+            return f.read()
+
+# parse single JSON report file and return output table row
+# module level so it can be sent to worker processes (--workers)
+# errors (invalid JSON, unreadable or corrupt report files) returned rather than raised so they can be reported in file order
+# parser is either 'selective' (decode only fields used) or 'full' (decode whole report)
+# with incremental set, also return manifest entry (size, mtime, content hash and row) for the manifest cache
+# and reuse the row from previous_entry if the report content has not changed
+# with timings dictionary set, seconds spent reading, decoding and extracting fields are stored in it (--profile)
+# with series names set (report_series keys), also return dictionary of series of report (--histograms, --mux_scans), otherwise None
+def process_json_report(json_file, previous_entry=None, parser='selective', incremental=False, timings=None, series=()):
     try:
+        start_time = time.perf_counter()
         # JSON file
         # debug by printing JSON file to stdout
-        # print(x)
-        f = open (x, "r")
+        # print(json_file)
+        report_stat = os.stat(json_file)
+        report_bytes = read_report_file(json_file)
+        read_time = time.perf_counter()
+        if incremental:
+            manifest_entry = {'size' : report_stat.st_size, 'mtime' : report_stat.st_mtime_ns, 'sha256' : hashlib.sha256(report_bytes).hexdigest()}
+            # same content with new mtime (e.g., copied or touched report)
+            if previous_entry is not None and previous_entry['sha256'] == manifest_entry['sha256'] and all(name in previous_entry for name in series):
+                manifest_entry['row'] = previous_entry['row']
+                for name in series:
+                    manifest_entry[name] = previous_entry[name]
+                return manifest_entry['row'], get_manifest_series(previous_entry, series), None, manifest_entry
+        else:
+            manifest_entry = None
         # Reading Python dictionary from JSON file
-        data = json.loads(f.read())
+        if parser == 'selective':
+            data = load_selected_json(report_bytes, get_report_json_selection(series))
+        else:
+            data = json.loads(report_bytes)
+        decode_time = time.perf_counter()
         # get important information
         current_data_fields = get_fields_from_json(data)
-        sequencing_report_df.loc[idx] = [current_data_fields.experiment_name,current_data_fields.sample_name,current_data_fields.run_date,current_data_fields.prom_id,current_data_fields.flow_cell_id,current_data_fields.data_output,current_data_fields.n50,current_data_fields.minknow_version,current_data_fields.modal_q_score_passed,current_data_fields.modal_q_score_failed,current_data_fields.starting_active_pores,current_data_fields.second_active_pore_count]
-    except ValueError as e:
-        print(e)
-        continue
-# print output data frame to tab delimited tsv file
-sequencing_report_df.to_csv(args.output_file,sep='\t',index=False)
-# end program
-quit()
+        current_row = tuple(getattr(current_data_fields, field) for field in fields_from_json.__slots__)
+        if len(series) > 0:
+            current_series = {name : report_series[name]['get'](data) for name in series}
+        else:
+            current_series = None
+        if timings is not None:
+            timings['read'] = read_time - start_time
+            timings['decode'] = decode_time - read_time
+            timings['fields'] = time.perf_counter() - decode_time
+        if manifest_entry is not None:
+            manifest_entry['row'] = current_row
+            for name in series:
+                manifest_entry[name] = [values.tolist() for values in current_series[name]]
+        return current_row, current_series, None, manifest_entry
+    except (ValueError, OSError) as e:
+        return None, None, str(e), None
+
+# get dictionary of series cached in manifest entry (None if no series)
+def get_manifest_series(manifest_entry, series):
+    if len(series) == 0:
+        return None
+    return {name : tuple(np.asarray(values) for values in manifest_entry[name]) for name in series}
+
+# process (index, json_file, previous_entry) task from report discovery, keeping index and file with result
+# with profile set, also return per-file timings (total, read, decode and fields seconds), otherwise None
+def process_json_report_task(task, parser='selective', incremental=False, profile=False, series=()):
+    idx, json_file, previous_entry = task
+    if profile:
+        timings = {}
+        start_time = time.perf_counter()
+        processed_report = process_json_report(json_file, previous_entry, parser, incremental, timings, series)
+        timings['total'] = time.perf_counter() - start_time
+    else:
+        timings = None
+        processed_report = process_json_report(json_file, previous_entry, parser, incremental, series=series)
+    return (idx, json_file) + processed_report + (timings,)
+
+# load manifest cache of previously parsed reports
+# returns dictionary of manifest entries keyed by absolute report path
+# manifest discarded if written for a different set of output columns or column types
+def load_report_manifest(manifest_file, columns):
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, 'r') as infile:
+        manifest = json.load(infile)
+    if manifest.get('columns') != columns:
+        return {}
+    return manifest['reports']
+
+# write manifest cache of parsed reports
+# write to temporary file first so an interrupted run does not leave a truncated manifest
+def write_report_manifest(manifest_file, columns, manifest_reports):
+    with open(f'{manifest_file}.tmp', 'w') as outfile:
+        json.dump({'columns' : columns, 'reports' : manifest_reports}, outfile)
+    os.replace(f'{manifest_file}.tmp', manifest_file)
 
+# parse JSON reports (list or generator of paths, e.g., from find_json_reports) into typed output data frame in report order
+# usable from other Python code without writing an output table, e.g., extract_reports(paths) then build_summary in CARDlongread_extract_summary_statistics.py
+# errors of reports that could not be parsed are passed to error_callback (printed by default) in file order and the reports left out
+# with incremental set, rows of unchanged reports are reused from manifest_file, which is then rewritten
+# (with keep_manifest_reports set, keeping entries of reports not in report_files, e.g., when adding new reports in watch mode)
+# profiler (stage_profiler) records manifest, parse and table stages if given
+# with histograms or mux_scans set, returns data frame followed by report_histograms and/or report_mux_scans (in that order),
+# with series of each report in data frame row order
+# with report_file_column set, data frame starts with that column of absolute report paths (e.g., Report File for run store)
+def extract_reports(report_files, parser='selective', workers=1, incremental=False, manifest_file=None, profiler=None, error_callback=print, histograms=False, mux_scans=False, report_file_column=None, keep_manifest_reports=False):
+    if profiler is None:
+        profiler = stage_profiler()
+    if incremental and manifest_file is None:
+        raise ValueError('manifest_file required for incremental report extraction')
+    # report series kept besides rows (--histograms, --mux_scans)
+    series = tuple(name for name, requested in [('histograms', histograms), ('mux_scans', mux_scans)] if requested)
+    # output rows and series by file index, reports that could not be parsed left out
+    report_rows = {}
+    series_rows = {}
+    report_paths = {}
+    # load manifest cache from previous run (--incremental)
+    with profiler.stage('manifest'):
+        if incremental:
+            previous_manifest = load_report_manifest(manifest_file, sequencing_report_columns)
+        else:
+            previous_manifest = {}
+    # manifest for this run, reports no longer in file list are dropped unless keep_manifest_reports set
+    if keep_manifest_reports:
+        current_manifest = dict(previous_manifest)
+    else:
+        current_manifest = {}
+    # reuse rows for reports with unchanged size and mtime, yield all others to be parsed
+    # reports cached without series needed are parsed again
+    def report_tasks():
+        for idx, x in enumerate(report_files):
+            previous_entry = previous_manifest.get(os.path.abspath(x))
+            if previous_entry is not None:
+                report_stat = os.stat(x)
+                if previous_entry['size'] == report_stat.st_size and previous_entry['mtime'] == report_stat.st_mtime_ns and all(name in previous_entry for name in series):
+                    report_rows[idx] = previous_entry['row']
+                    report_paths[idx] = os.path.abspath(x)
+                    if len(series) > 0:
+                        series_rows[idx] = get_manifest_series(previous_entry, series)
+                    current_manifest[os.path.abspath(x)] = previous_entry
+                    continue
+            yield idx, x, previous_entry
+    # main loop to process files
+    # with more than one worker, spread JSON decoding and field extraction across a process pool
+    # executor.map returns results in input order so errors are reported in file order
+    # report discovery is lazy, so parse stage includes directory walk
+    process_json_report_with_options = functools.partial(process_json_report_task, parser=parser, incremental=incremental, profile=profiler.enabled, series=series)
+    # collect parsed reports and report per-file errors in file order
+    def collect_processed_reports(processed_reports):
+        for idx, x, current_row, current_series, error, manifest_entry, timings in processed_reports:
+            # per-file latencies of parsed reports (--profile)
+            if timings is not None:
+                for timing_name, seconds in timings.items():
+                    profiler.add_file_latency(timing_name, seconds)
+            if error is not None:
+                error_callback(error)
+                continue
+            report_rows[idx] = current_row
+            report_paths[idx] = os.path.abspath(x)
+            if current_series is not None:
+                series_rows[idx] = current_series
+            if manifest_entry is not None:
+                current_manifest[os.path.abspath(x)] = manifest_entry
+    with profiler.stage('parse'):
+        if workers > 1:
+            # worker processes shut down on leaving block, also if collecting results fails
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                # send files to workers in chunks to limit interprocess overhead
+                collect_processed_reports(executor.map(process_json_report_with_options, report_tasks(), chunksize=16))
+        else:
+            collect_processed_reports(map(process_json_report_with_options, report_tasks()))
+    # save manifest cache for next run
+    if incremental:
+        with profiler.stage('manifest'):
+            write_report_manifest(manifest_file, sequencing_report_columns, current_manifest)
+    # create typed output data frame from parsed reports in file order
+    with profiler.stage('table'):
+        sequencing_report_df = make_sequencing_report_df([report_rows[idx] for idx in sorted(report_rows)])
+        if report_file_column is not None:
+            sequencing_report_df.insert(0, report_file_column, [report_paths[idx] for idx in sorted(report_rows)])
+        if len(series) > 0:
+            return (sequencing_report_df,) + tuple(report_series[name]['make']([series_rows[idx][name] for idx in sorted(report_rows)]) for name in series)
+        return sequencing_report_df
+
+# load json file list
+# user input
+if __name__ == '__main__':
+    inparser = argparse.ArgumentParser(description = 'Extract data from long read JSON report')
+    inparser.add_argument('--json_dir', default=None, type=str, help = 'path to directory containing JSON files, if converting whole directory')
+    inparser.add_argument('--filelist', default=None, type=str, help = 'text file containing list of all JSON reports to parse')
+    inparser.add_argument('--output', action="store", type=str, dest="output_file", help="Output long read JSON report summary table in tab-delimited, Parquet (.parquet) or Feather (.feather/.arrow) format")
+    inparser.add_argument('--store', default=None, type=str, help = 'also add parsed reports to SQLite run store (created if new; reports already in store updated), for filtered summaries with -store of CARDlongread_extract_summary_statistics.py (optional; --output optional if set)')
+    inparser.add_argument('--format', default=None, choices=['tsv','parquet','feather'], dest="output_format", help = 'output table format; Parquet and Feather keep column types and need the pyarrow package (optional, from OUTPUT_FILE extension by default, tsv if not recognised)')
+    inparser.add_argument('--histograms', action=argparse.BooleanOptionalAction, default=False, help = 'also write read length and q score histograms of each report on common bin grids to OUTPUT_FILE.histograms.npz, for cohort N50/N90 and q score distributions in summary (optional; default false)')
+    inparser.add_argument('--mux_scans', action=argparse.BooleanOptionalAction, default=False, help = 'also write full mux scan series (hours and active pores of each scan) of each report to OUTPUT_FILE.mux_scans.npz, for pore decay rates in summary (optional; default false)')
+    inparser.add_argument('--workers', default=1, type=int, help = 'number of worker processes used to parse JSON reports (optional, 1 by default)')
+    inparser.add_argument('--parser', default='selective', choices=['selective','full'], help = 'decode only the JSON fields used (selective) or whole JSON reports (full; slower, validates whole file) (optional, selective by default)')
+    inparser.add_argument('--incremental', action=argparse.BooleanOptionalAction, default=False, help = 'only parse new or changed JSON reports, reusing rows cached in manifest file next to output (OUTPUT_FILE.manifest.json, or STORE.manifest.json without --output) (optional; default false)')
+    inparser.add_argument('--recursive', action=argparse.BooleanOptionalAction, default=False, help = 'also search subdirectories of JSON_DIR for JSON reports (optional; default false)')
+    inparser.add_argument('--include', default='*.json', type=str, help = "file name pattern for JSON reports in JSON_DIR, matched without .gz/.zst suffix (optional, '*.json' by default)")
+    inparser.add_argument('--watch', action=argparse.BooleanOptionalAction, default=False, help = 'keep polling JSON_DIR for new reports as runs finish, parsing only new reports and appending their rows to output (optional; default false)')
+    inparser.add_argument('--poll_interval', default=60, type=float, help = 'seconds between polls of JSON_DIR with --watch (optional, 60 by default)')
+    inparser.add_argument('--settle_time', default=60, type=float, help = 'seconds since last modification (with unchanged size) before a new report is parsed with --watch, so partially written reports are skipped (optional, 60 by default)')
+    inparser.add_argument('--max_polls', default=None, type=int, help = 'stop after this many polls with --watch (optional; runs until interrupted by default)')
+    inparser.add_argument('--summary_output', default=None, type=str, help = 'with --watch, rebuild this summary statistics XLSX from all rows after new reports are added (optional)')
+    inparser.add_argument('--summary_interval', default=30, type=float, help = 'minimum minutes between summary rebuilds with --watch (optional, 30 by default)')
+    inparser.add_argument('--plot_title', default=None, type=str, help = 'title for each plot in summary XLSX with --summary_output (optional)')
+    inparser.add_argument('--figure_cache', action=argparse.BooleanOptionalAction, default=True, help = 'reuse figures with unchanged inputs from on-disk figure cache in summary rebuilds with --summary_output (optional; default true; --no-figure_cache to bypass)')
+    inparser.add_argument('--figure_cache_dir', default=None, type=str, help = 'figure cache directory with --summary_output (optional, ~/.cache/CARDlongread_figures by default)')
+    inparser.add_argument('--profile', default=None, type=str, help = 'write stage timings, per-file parse latency percentiles, peak RSS and tracemalloc snapshots per stage to this JSON file (optional)')
+    inparser.add_argument('--profile_tracemalloc', action=argparse.BooleanOptionalAction, default=True, help = 'trace Python memory allocations per stage with --profile; slows parsing, so turn off for accurate timings (optional; default true)')
+    inparser.add_argument('--cprofile', nargs='?', const='auto', default=None, type=str, help = 'with --profile, also run cProfile on one stage (manifest, parse, table, write or, with --watch, scan; slowest stage if no stage given) and save statistics to PROFILE.prof (optional)')
+    args = inparser.parse_args()
+    if args.output_file is None and args.store is None:
+        quit('ERROR: No output file (--output) or run store (--store) provided!')
+    # manifest (--incremental) next to output file, or run store if no output file
+    manifest_file = f'{args.output_file if args.output_file is not None else args.store}.manifest.json'
+    # output table format from extension unless given
+    if args.output_format is None and args.output_file is not None:
+        args.output_format = get_sequencing_report_format(args.output_file)
+    if args.output_format not in [None, 'tsv'] and not pyarrow_available:
+        quit(f'ERROR: pyarrow package required for {args.output_format} output (--format)!')
+    # stage timers and memory snapshots, doing nothing unless --profile set
+    profiler = stage_profiler(args.profile is not None, args.profile_tracemalloc, args.cprofile)
+    # watch report tree for new reports until interrupted (or --max_polls)
+    if args.watch:
+        if args.json_dir is None:
+            quit('ERROR: No directory (--json_dir) to watch provided!')
+        from CARDlongread_watch import watch_reports
+        from CARDlongread_run_store import open_run_store
+        # check run store matches output table before watching
+        if args.store is not None:
+            try:
+                open_run_store(args.store).close()
+            except ValueError as e:
+                quit(f'ERROR: {e}')
+        try:
+            watch_reports(args.json_dir, args.output_file, args.output_format, args.store, args.include, args.recursive, args.parser, args.workers, args.incremental, manifest_file, args.histograms, args.mux_scans, args.poll_interval, args.settle_time, args.summary_output, args.summary_interval, args.plot_title, args.max_polls, profiler, figure_cache=args.figure_cache, figure_cache_dir=args.figure_cache_dir)
+        except KeyboardInterrupt:
+            print('Stopped watching', args.json_dir)
+        profiler.write(args.profile)
+        quit()
+    # get list of files
+    # directory walk is lazy so reports are parsed while the walk continues
+    if args.json_dir is not None:
+        files = find_json_reports(args.json_dir, args.include, args.recursive)
+    elif args.filelist is not None:
+        files = read_report_filelist(args.filelist)
+    else:
+        quit('ERROR: No directory (--json_dir) or file list (--filelist) provided!')
+    # parse reports into typed output data frame
+    # report series (--histograms, --mux_scans) kept in rows matching output table
+    series = [name for name, requested in [('histograms', args.histograms), ('mux_scans', args.mux_scans)] if requested]
+    # report file column for run store (--store)
+    if args.store is not None:
+        from CARDlongread_run_store import write_run_store, report_file_column
+    else:
+        report_file_column = None
+    if len(series) > 0:
+        sequencing_report_df, *sequencing_report_series = extract_reports(files, args.parser, args.workers, args.incremental, manifest_file, profiler, histograms=args.histograms, mux_scans=args.mux_scans, report_file_column=report_file_column)
+    else:
+        sequencing_report_df = extract_reports(files, args.parser, args.workers, args.incremental, manifest_file, profiler, report_file_column=report_file_column)
+        sequencing_report_series = []
+    with profiler.stage('write'):
+        # add runs to run store (--store)
+        if args.store is not None:
+            try:
+                write_run_store(args.store, sequencing_report_df)
+            except ValueError as e:
+                quit(f'ERROR: {e}')
+            sequencing_report_df = sequencing_report_df.drop(columns=report_file_column)
+        if args.output_file is not None:
+            # print output data frame to tab delimited tsv, Parquet or Feather file
+            write_sequencing_report_df(sequencing_report_df, args.output_file, args.output_format)
+            # each series next to output file
+            for name, series_values in zip(series, sequencing_report_series):
+                write_report_series(f'{args.output_file}.{name}.npz', series_values)
+    # write profile report (--profile)
+    profiler.write(args.profile)
+    # end program
+    quit()
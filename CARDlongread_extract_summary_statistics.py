@@ -2,94 +2,153 @@
 
 import pandas as pd
 import numpy as np
-import seaborn as sb
-import matplotlib.pyplot as plt
-import statistics
 import argparse
 import dataclasses
-# excel export with openpyxl
-import openpyxl
-# and xlsxwriter with pandas, though that could be modified to use openpyxl as well
-import xlsxwriter
+# plotting (seaborn, matplotlib) and excel export (xlsxwriter with pandas) modules imported only when needed
+# so tables-only runs (--tables_only) start quickly
+import json
+# cohort names from experiment names (batch mode)
+import re
 # for image saving
 from io import BytesIO
+# read image resolution from PNG header
+import struct
+# process pool for parallel figure rendering (-plot_workers)
+import concurrent.futures
+# on-disk figure cache
+import os
+import hashlib
+# per-stage timing and memory instrumentation (--profile)
+from CARDlongread_profiling import stage_profiler
+
+# input table formats, picked from input file extension
+longread_extract_formats = {'.parquet' : 'parquet', '.pq' : 'parquet', '.feather' : 'feather', '.arrow' : 'feather'}
+
+# read table of features extracted from long read sequencing reports
+# tab-delimited text is parsed and column types inferred, Parquet and Feather (from CARDlongread_extract_from_json.py --format) keep
+# the extractor's column types (categorical IDs and versions, Run Date as date, nullable numbers)
+# Feather files are memory mapped, so numeric columns are read without copying
+def read_longread_extract(input_file):
+    input_format = longread_extract_formats.get(os.path.splitext(input_file)[1].lower(), 'tsv')
+    if input_format == 'parquet':
+        return pd.read_parquet(input_file)
+    elif input_format == 'feather':
+        import pyarrow.feather
+        return pyarrow.feather.read_table(input_file, memory_map=True).to_pandas()
+    else:
+        return pd.read_csv(input_file,sep='\t')
+
+# get ordinal of percentile for column names (1st, 2nd, 3rd, 11th, 22nd, 2.5th)
+# th for 11-13 and percentiles with decimals, otherwise by last digit
+def get_ordinal(percentile):
+    if percentile != int(percentile) or int(percentile) % 100 in (11, 12, 13):
+        return f'{percentile:g}th'
+    return f'{percentile:g}' + {1 : 'st', 2 : 'nd', 3 : 'rd'}.get(int(percentile) % 10, 'th')
+
+# get summary statistics (total, min, max, mean, median, mode, and standard deviation) for several columns in one pass
+# columns are padded with NaN into one array and sorted once (stable sort keeps data order among equal values)
+# min, max, median, mode and any percentiles all come from the sorted array, vectorized across columns
+# missing values (NaN) are ignored and not counted in total
+# optional percentiles (0-100) and interquartile range added as extra columns without another pass
+# ValueError if any percentile outside 0-100
+def get_batched_summary_statistics(columns, property_names, percentiles=None, iqr=False):
+    if percentiles is not None and not all(0 <= percentile <= 100 for percentile in percentiles):
+        raise ValueError(f'percentiles must be between 0 and 100, not {", ".join(f"{percentile:g}" for percentile in percentiles if not 0 <= percentile <= 100)}')
+    # note that total gives the run count (across experiments and samples) for per run columns
+    # as in flow cells per unique sample for per experiment columns
+    rows = max([len(column) for column in columns] + [1])
+    values = np.full((rows, len(columns)), np.nan)
+    for idx, column in enumerate(columns):
+        values[0:len(column), idx] = pd.to_numeric(pd.Series(column), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    # sort each column once, NaN sorted to end
+    order = np.argsort(values, axis=0, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    column_idx = np.arange(len(columns))
+    totals = np.sum(~np.isnan(values), axis=0)
+    last_idx = np.maximum(totals - 1, 0)
+    # empty columns have no statistics
+    has_values = totals > 0
+    # value at fractional position in each sorted column (linear interpolation between neighbouring values)
+    def sorted_value_at(position):
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        lower_values = sorted_values[lower, column_idx]
+        upper_values = sorted_values[upper, column_idx]
+        return np.where(has_values, lower_values + (upper_values - lower_values) * (position - lower), np.nan)
+    min_values = np.where(has_values, sorted_values[0], np.nan)
+    max_values = np.where(has_values, sorted_values[last_idx, column_idx], np.nan)
+    # median is mean of two middle values for even totals
+    median_values = np.where(has_values, (sorted_values[last_idx // 2, column_idx] + sorted_values[totals // 2, column_idx]) / 2, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_values = np.nansum(values, axis=0) / totals
+        # correct rounding error of first estimate
+        mean_values = mean_values + np.nansum(values - mean_values, axis=0) / totals
+        # sample standard deviation, undefined for fewer than two values
+        stdev_values = np.where(totals > 1, np.sqrt(np.nansum((values - mean_values) ** 2, axis=0) / (totals - 1)), np.nan)
+    # mode is most common value, ties broken by first appearance in data
+    # find run of equal sorted values each element belongs to
+    positions = np.arange(rows)[:, None]
+    run_starts = np.ones(values.shape, dtype=bool)
+    run_starts[1:] = sorted_values[1:] != sorted_values[:-1]
+    run_ends = np.ones(values.shape, dtype=bool)
+    run_ends[:-1] = run_starts[1:]
+    run_start_idx = np.maximum.accumulate(np.where(run_starts, positions, 0), axis=0)
+    run_end_idx = np.flip(np.minimum.accumulate(np.flip(np.where(run_ends, positions, rows), axis=0), axis=0), axis=0)
+    # longest run wins, then run whose first value (first in stable sort) came earliest in data
+    mode_scores = np.where(positions < totals, (run_end_idx - run_start_idx + 1) * (rows + 1) - np.take_along_axis(order, run_start_idx, axis=0), -1)
+    mode_values = np.where(has_values, sorted_values[np.argmax(mode_scores, axis=0), column_idx], np.nan)
+    summary_statistics_df = pd.DataFrame({'Property' : property_names, 'Total' : totals, 'Min' : min_values, 'Max' : max_values, 'Mean' : mean_values, 'Median' : median_values, 'Mode' : mode_values, 'Standard Deviation' : stdev_values}, index=property_names)
+    # extra percentile columns
+    if percentiles is not None:
+        for percentile in percentiles:
+            summary_statistics_df[f'{get_ordinal(percentile)} percentile'] = sorted_value_at(last_idx * percentile / 100)
+    # interquartile range
+    if iqr:
+        summary_statistics_df['IQR'] = sorted_value_at(last_idx * 0.75) - sorted_value_at(last_idx * 0.25)
+    # return populated summary statistics data frame
+    return summary_statistics_df
 
-# get summary statistics (min, max, range, mean, median, mode, and standard deviation for N50, sequence output, and flow cells per sample)
-def get_summary_statistics(column):
-    # define summary statistics class
-    @dataclasses.dataclass
-    class summary_statistics:
-        total : int = 0
-        min : float = 0
-        max : float = 0
-        range : float = 0
-        mean : float = 0
-        median : float = 0
-        mode : float = 0
-        stdev : float = 0
-	# take single column of data frame as input
-	# fill summary statistics class with each statistic
-    # note that the line below should be used to give the total run count (across experiments and samples). Not useful with unique experiments, samples, etc.
-    # as in flow cells per unique sample
-    summary_statistics.total = len(column)
-    summary_statistics.min = min(column)
-    summary_statistics.max = max(column)
-    summary_statistics.range = summary_statistics.max - summary_statistics.min
-    summary_statistics.mean = statistics.mean(column)
-    summary_statistics.median = statistics.median(column)
-    summary_statistics.mode = statistics.mode(column)
-    summary_statistics.stdev = statistics.stdev(column)
-    # return data structure with each summary statistic as an attribute
-    return summary_statistics
-    
 # get output per flow cell in two column list
 def get_output_per_flow_cell(flow_cell_IDs, output, topup):
     # make data frame of flow cell IDs and output
-    flow_cells_to_output = pd.concat([flow_cell_IDs, output, topup], axis=1, join='inner')
-    # find unique flow cells
-    unique_flow_cells = np.unique(flow_cell_IDs.astype(str))
+    flow_cells_to_output = pd.concat([flow_cell_IDs.astype(str), output, topup], axis=1, join='inner')
+    # label each run with index of its flow cell among unique flow cells (sorted by flow cell ID)
+    flow_cell_codes, unique_flow_cells = pd.factorize(flow_cells_to_output['Flow Cell ID'], sort=True)
+    # total output per flow cell in one pass, adding runs in table order
+    output_per_flow_cell = np.bincount(flow_cell_codes, weights=pd.to_numeric(flow_cells_to_output['Data output (Gb)']).to_numpy(dtype=float), minlength=len(unique_flow_cells))
+    # unique top up labels per flow cell
+    unique_topup_per_flow_cell = flow_cells_to_output['Top up'].groupby(flow_cell_codes).unique()
     # create output_per_flow_cell_df data frame
-    output_per_flow_cell_df = pd.DataFrame({'Flow Cell ID' : unique_flow_cells}, index=unique_flow_cells, columns=['Flow Cell ID','Flow cell output (Gb)','Top up'])
-    # find flow cells and total output per unique experiment by iterating through unique experiment names
-    for i in unique_flow_cells:
-        unique_outputs_per_flow_cell = pd.unique(flow_cells_to_output[flow_cells_to_output['Flow Cell ID'] == i]['Data output (Gb)'])
-        unique_topup_per_flow_cell = pd.unique(flow_cells_to_output[flow_cells_to_output['Flow Cell ID'] == i]['Top up'])
-        # total_unique_outputs_per_flow_cell = len(unique_outputs_per_flow_cell)
-        total_output_per_flow_cell = sum(flow_cells_to_output[flow_cells_to_output['Flow Cell ID'] == i]['Data output (Gb)'])
-        output_per_flow_cell_df['Flow cell output (Gb)'][i] = total_output_per_flow_cell
-        output_per_flow_cell_df['Top up'][i] = unique_topup_per_flow_cell
-    # convert flow cell output total to numeric type for plotting
-    output_per_flow_cell_df['Flow cell output (Gb)'] = pd.to_numeric(output_per_flow_cell_df['Flow cell output (Gb)'])
+    output_per_flow_cell_df = pd.DataFrame({'Flow Cell ID' : unique_flow_cells, 'Flow cell output (Gb)' : output_per_flow_cell, 'Top up' : unique_topup_per_flow_cell.values}, index=np.asarray(unique_flow_cells), columns=['Flow Cell ID','Flow cell output (Gb)','Top up'])
     # return flow_cells_per_experiment_df data frame
     return output_per_flow_cell_df
     
+# remove extraneous suffixes (e.g., "_topup") from experiment names so top ups and recoveries count with their experiment
+def clean_experiment_names(experiments):
+    experiments = experiments.str.replace(r'_topup', '', regex=True)
+    experiments = experiments.str.replace(r'_recovery', '', regex=True)
+    # dashes and underscores are the same thing so change all dashes to underscores
+    experiments = experiments.str.replace(r'-', '_', regex=True)
+    return experiments
+
 # get flow cells per experiment in two column list
 def get_flow_cells_and_output_per_experiment(experiments, flow_cell_IDs, output):
     # take one column of experiments and one column of flow cell IDs from imported data frame as input
     # remove extraneous suffixes (e.g., "_topup") from experiment names
     # don't remove alphabetical characters altogether - e.g., PPMI_BLOOD_SSTEST is an experiment
     # experiment names should reflect independent brain isolates (e.g., PPMI_3080)
-    experiments = experiments.str.replace(r'_topup', '', regex=True)
-    experiments = experiments.str.replace(r'_recovery', '', regex=True)
-    # dashes and underscores are the same thing so change all dashes to underscores
-    experiments = experiments.str.replace(r'-', '_', regex=True)
+    experiments = clean_experiment_names(experiments)
     # make data frame of experiment names and flow cell IDs
     flow_cells_and_output_to_experiments = pd.concat([experiments, flow_cell_IDs, output], axis=1, join='inner')
-    # find unique experiment names
-    unique_experiments = np.unique(experiments)
-    # initialized flow_cells_per_experiment list
+    # label each run with index of its experiment among unique experiment names (sorted)
+    experiment_codes, unique_experiments = pd.factorize(flow_cells_and_output_to_experiments['Experiment Name'], sort=True, use_na_sentinel=False)
+    # unique flow cells per experiment
+    flow_cells_per_experiment = flow_cells_and_output_to_experiments['Flow Cell ID'].groupby(experiment_codes).nunique(dropna=False)
+    # total output per experiment in one pass, adding runs in table order
+    output_per_experiment = np.bincount(experiment_codes, weights=pd.to_numeric(flow_cells_and_output_to_experiments['Data output (Gb)']).to_numpy(dtype=float), minlength=len(unique_experiments))
     # create flow_cells_per_experiment_df data frame
-    flow_cells_and_output_per_experiment_df = pd.DataFrame({'Experiment Name' : unique_experiments}, index=unique_experiments, columns=['Experiment Name','Flow Cells','Total output (Gb)'])
-    # find flow cells and total output per unique experiment by iterating through unique experiment names
-    for i in unique_experiments:
-        unique_flow_cells_per_experiment = pd.unique(flow_cells_and_output_to_experiments[flow_cells_and_output_to_experiments['Experiment Name'] == i]['Flow Cell ID'])
-        total_unique_flow_cells_per_experiment = len(unique_flow_cells_per_experiment)
-        total_output_per_experiment = sum(flow_cells_and_output_to_experiments[flow_cells_and_output_to_experiments['Experiment Name'] == i]['Data output (Gb)'])
-        flow_cells_and_output_per_experiment_df['Flow Cells'][i] = total_unique_flow_cells_per_experiment
-        flow_cells_and_output_per_experiment_df['Total output (Gb)'][i] = total_output_per_experiment
-    # convert output flow cell counts and total output totals to numeric type for plotting
-    flow_cells_and_output_per_experiment_df['Flow Cells'] = pd.to_numeric(flow_cells_and_output_per_experiment_df['Flow Cells'])
-    flow_cells_and_output_per_experiment_df['Total output (Gb)'] = pd.to_numeric(flow_cells_and_output_per_experiment_df['Total output (Gb)'])
+    # flow cell counts and total output totals numeric type for plotting
+    flow_cells_and_output_per_experiment_df = pd.DataFrame({'Experiment Name' : unique_experiments, 'Flow Cells' : flow_cells_per_experiment.values, 'Total output (Gb)' : output_per_experiment}, index=np.asarray(unique_experiments), columns=['Experiment Name','Flow Cells','Total output (Gb)'])
     # return flow_cells_per_experiment_df data frame
     return flow_cells_and_output_per_experiment_df
     
@@ -106,83 +165,366 @@ def get_flow_cells_per_experiment_dist(column):
 
 # get MinKNOW version distribution
 def get_minknow_version_dist(column):
-    # unique minknow versions
-    unique_minknow_versions = np.unique(column)
+    # count numbers of each unique minknow version in dataset in one pass (sorted by version)
+    # categorical versions (Parquet or Feather input) counted as plain values so versions filtered out are not listed
+    minknow_version_counts = column.astype(object).value_counts(sort=False, dropna=False).sort_index()
     # create minknow_version_dist_df data frame
-    minknow_version_dist_df = pd.DataFrame({'MinKNOW Version' : unique_minknow_versions}, index=unique_minknow_versions, columns=['MinKNOW Version', 'Frequency'])
-    # count numbers of each in dataset
-    for i in unique_minknow_versions:
-        minknow_version_dist_df['Frequency'][i] = list(column).count(i)
+    minknow_version_dist_df = pd.DataFrame({'MinKNOW Version' : minknow_version_counts.index.values, 'Frequency' : minknow_version_counts.values}, index=minknow_version_counts.index.values, columns=['MinKNOW Version', 'Frequency'])
     # return data frame with versions and counts per version
     return minknow_version_dist_df
-    
-# make summary statistic data frame
-def make_summary_statistics_data_frame(summary_statistics_set, property_names):
-    # set column names
-    column_names = ['Property', 'Total', 'Min', 'Max', 'Mean', 'Median', 'Mode', 'Standard Deviation']
-    # initialize data frame
-    summary_statistics_df = pd.DataFrame(index=property_names, columns=column_names)
-    # iterate through each property and populate data frame with summary_statistics_set attributes
-    for idx, name in enumerate(property_names):
-        summary_statistics_df.loc[name] = [property_names[idx],summary_statistics_set[idx].total,summary_statistics_set[idx].min,summary_statistics_set[idx].max,summary_statistics_set[idx].mean,summary_statistics_set[idx].median,summary_statistics_set[idx].mode,summary_statistics_set[idx].stdev]
-    # return populated summary statistics data frame
-    return summary_statistics_df
-    
-# identify topups and reconnections (flow cell moved and run restarted)
-def identify_topups(column):
-    # make output array "topups" as long as input column
-    topups = [None] * len(column)
-    for idx, i in enumerate(column):
-        if "topup" in i:
-            # if topup in sample name, set value to topup
-            topups[idx] = "Top up"
-        elif "recovery" in i:
-            # if recovery in sample name, set value to recovery
-            topups[idx] = "Recovery"
-        elif "reconnected" in i:
-            # if reconnected in sample name, set value to reconnection
-            topups[idx] = "Reconnection"
+
+# sum histograms (one row per run, e.g., from CARDlongread_extract_from_json.py --histograms) within groups in one vectorized pass
+# runs sorted by group once and each group's rows added with np.add.reduceat, so memory stays at one row per group
+# returns sorted unique group keys and 2D array of summed histograms, one row per group
+def sum_histograms_by_group(histograms, group_keys):
+    group_codes, unique_groups = pd.factorize(group_keys, sort=True, use_na_sentinel=False)
+    if len(group_codes) == 0:
+        return unique_groups, np.zeros((0, histograms.shape[1]))
+    run_order = np.argsort(group_codes, kind='stable')
+    group_starts = np.flatnonzero(np.diff(group_codes[run_order], prepend=-1))
+    return unique_groups, np.add.reduceat(histograms[run_order].astype(np.float64), group_starts, axis=0)
+
+# get quantile (0-1) of each histogram row, interpolated linearly within bins (NaN for empty histograms)
+# read length N50 and N90 are the 0.5 and 0.1 quantiles of bases per read length (half or 90% of bases in reads at least that long)
+def get_histogram_quantile(histograms, bin_edges, quantile):
+    histograms = np.atleast_2d(np.asarray(histograms, dtype=np.float64))
+    cumulative = np.cumsum(histograms, axis=1)
+    totals = cumulative[:, -1]
+    target = totals * quantile
+    # first bin where cumulative total reaches quantile, then fraction of that bin needed
+    quantile_bins = np.argmax(cumulative >= target[:, np.newaxis], axis=1)
+    rows = np.arange(len(histograms))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bin_fraction = (target - (cumulative[rows, quantile_bins] - histograms[rows, quantile_bins])) / histograms[rows, quantile_bins]
+    quantiles = bin_edges[quantile_bins] + np.nan_to_num(bin_fraction) * np.diff(bin_edges)[quantile_bins]
+    quantiles[totals <= 0] = np.nan
+    return quantiles
+
+# get center of most populated bin of each histogram row (NaN for empty histograms)
+def get_histogram_mode(histograms, bin_edges):
+    histograms = np.atleast_2d(histograms)
+    modes = ((bin_edges[:-1] + bin_edges[1:]) / 2)[np.argmax(histograms, axis=1)]
+    modes[histograms.sum(axis=1) <= 0] = np.nan
+    return modes
+
+# get read length N50/N90 and passed and failed read q scores (modal and median) of summed histograms, one row per group
+def get_histogram_statistics_df(group_column, group_names, read_length_bases, qscore_passed_bases, qscore_failed_bases, read_length_bin_edges, qscore_bin_edges):
+    return pd.DataFrame({
+        group_column : group_names,
+        'Bases (Gb)' : read_length_bases.sum(axis=1) / 1e9,
+        'Read N50 (kb)' : get_histogram_quantile(read_length_bases, read_length_bin_edges, 0.5) / 1e3,
+        'Read N90 (kb)' : get_histogram_quantile(read_length_bases, read_length_bin_edges, 0.1) / 1e3,
+        'Passed modal Q score' : get_histogram_mode(qscore_passed_bases, qscore_bin_edges),
+        'Passed median Q score' : get_histogram_quantile(qscore_passed_bases, qscore_bin_edges, 0.5),
+        'Failed modal Q score' : get_histogram_mode(qscore_failed_bases, qscore_bin_edges),
+        'Failed median Q score' : get_histogram_quantile(qscore_failed_bases, qscore_bin_edges, 0.5)
+    }, columns=[group_column, 'Bases (Gb)', 'Read N50 (kb)', 'Read N90 (kb)', 'Passed modal Q score', 'Passed median Q score', 'Failed modal Q score', 'Failed median Q score'])
+
+# select runs of ragged mux scan series (report_mux_scans from CARDlongread_extract_from_json.py) with boolean run mask
+def select_mux_scan_runs(mux_scans, run_mask):
+    scan_counts = np.diff(mux_scans.offsets)
+    scan_mask = np.repeat(run_mask, scan_counts)
+    return dataclasses.replace(mux_scans, offsets=np.concatenate([[0], np.cumsum(scan_counts[run_mask])]).astype(np.int64), hours=mux_scans.hours[scan_mask], active_pores=mux_scans.active_pores[scan_mask])
+
+# fit exponential pore decay (active pores = initial pores * exp(-decay rate * hours)) to mux scan series of all runs at once
+# log-linear least squares weighted by active pores, so nearly empty late scans do not dominate
+# weighted sums of each run come from np.bincount over the flat ragged arrays, with no loop over runs
+# scans without active pores or timestamp left out; runs with fewer than three such scans get NaN
+# returns data frame of mux scans, decay rate (per hour), half-life (hours, NaN unless pores decay) and fitted initial active pores per run
+def get_pore_decay_rates(mux_scans):
+    scan_counts = np.diff(mux_scans.offsets)
+    run_count = len(scan_counts)
+    run_index = np.repeat(np.arange(run_count), scan_counts)
+    active_pores = mux_scans.active_pores.astype(np.float64)
+    fitted_scans = (active_pores > 0) & np.isfinite(mux_scans.hours)
+    weights = np.where(fitted_scans, active_pores, 0.0)
+    hours = np.where(fitted_scans, mux_scans.hours, 0.0)
+    log_active_pores = np.log(np.where(fitted_scans, active_pores, 1.0))
+    sum_w, sum_t, sum_y, sum_tt, sum_ty, fitted_scan_count = [np.bincount(run_index, weights=values, minlength=run_count) for values in [weights, weights * hours, weights * log_active_pores, weights * hours * hours, weights * hours * log_active_pores, fitted_scans.astype(np.float64)]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (sum_w * sum_ty - sum_t * sum_y) / (sum_w * sum_tt - sum_t * sum_t)
+        intercept = (sum_y - slope * sum_t) / sum_w
+        slope[fitted_scan_count < 3] = np.nan
+        decay_rate = -slope
+        half_life = np.where(decay_rate > 0, np.log(2) / decay_rate, np.nan)
+    return pd.DataFrame({'Mux scans' : scan_counts, 'Pore decay rate (1/h)' : decay_rate, 'Pore half-life (h)' : half_life, 'Fitted initial active pores' : np.exp(np.where(np.isnan(slope), np.nan, intercept))}, columns=['Mux scans', 'Pore decay rate (1/h)', 'Pore half-life (h)', 'Fitted initial active pores'])
+
+# get per-run pore decay table and per flow cell batch table from pore decay rates of runs in longread_extract
+# flow cell batch is the letter prefix of the flow cell ID (e.g., PAM of PAM12345); runs with half-life below half_life_cutoff hours are fast decay runs
+def get_pore_decay_tables(longread_extract, pore_decay_rates, half_life_cutoff=24):
+    pore_decay_df = pd.concat([longread_extract[['Experiment Name', 'Flow Cell ID', 'Run Date', 'Data output (Gb)', 'Starting Active Pores', 'Top up']].reset_index(drop=True), pore_decay_rates.reset_index(drop=True)], axis=1)
+    pore_decay_df.insert(pore_decay_df.shape[1], 'Fast decay', pore_decay_df['Pore half-life (h)'] < half_life_cutoff)
+    flow_cell_batches = longread_extract['Flow Cell ID'].astype(str).str.extract(r'^([A-Za-z]*)', expand=False).reset_index(drop=True).rename('Flow cell batch')
+    batch_groups = pore_decay_df.groupby(flow_cell_batches, sort=True)
+    flow_cell_batch_df = pd.DataFrame({'Runs' : batch_groups.size(), 'Median pore decay rate (1/h)' : batch_groups['Pore decay rate (1/h)'].median(), 'Median pore half-life (h)' : batch_groups['Pore half-life (h)'].median(), 'Fast decay runs' : batch_groups['Fast decay'].sum(), 'Fast decay fraction' : batch_groups['Fast decay'].mean()})
+    flow_cell_batch_df.insert(0, 'Flow cell batch', flow_cell_batch_df.index.values)
+    return pore_decay_df, flow_cell_batch_df
+
+# get worksheets of cohort, per experiment and per flow cell read length and q score statistics from run histograms
+# histograms (report_histograms from CARDlongread_extract_from_json.py) have one row per run of longread_extract
+# cohort worksheet also has cohort read length and q score distributions on the common bin grids
+def get_histogram_table_sheets(longread_extract, histograms):
+    histogram_names = ['read_length_bases', 'qscore_passed_bases', 'qscore_failed_bases']
+    bin_edges = [histograms.read_length_bin_edges, histograms.qscore_bin_edges]
+    # cohort totals
+    cohort_histograms = [getattr(histograms, name).sum(axis=0, dtype=np.float64)[np.newaxis, :] for name in histogram_names]
+    cohort_statistics_df = get_histogram_statistics_df('Cohort', ['All runs'], *cohort_histograms, *bin_edges)
+    read_length_dist_df = pd.DataFrame({'Read length start (kb)' : histograms.read_length_bin_edges[:-1] / 1e3, 'Read length end (kb)' : histograms.read_length_bin_edges[1:] / 1e3, 'Bases (Gb)' : cohort_histograms[0][0] / 1e9})
+    qscore_dist_df = pd.DataFrame({'Q score start' : histograms.qscore_bin_edges[:-1], 'Q score end' : histograms.qscore_bin_edges[1:], 'Passed bases (Gb)' : cohort_histograms[1][0] / 1e9, 'Failed bases (Gb)' : cohort_histograms[2][0] / 1e9})
+    # per experiment (top ups and recoveries with their experiment) and per flow cell sums
+    group_statistics = []
+    for group_column, group_keys in [('Experiment Name', clean_experiment_names(longread_extract['Experiment Name'])), ('Flow Cell ID', longread_extract['Flow Cell ID'].astype(str))]:
+        group_histograms = [sum_histograms_by_group(getattr(histograms, name), group_keys) for name in histogram_names]
+        group_statistics.append(get_histogram_statistics_df(group_column, np.asarray(group_histograms[0][0]), *[group_sums for group_names, group_sums in group_histograms], *bin_edges))
+    return [
+        ('Read length + Q score', [cohort_statistics_df, read_length_dist_df, qscore_dist_df]),
+        ('Read length + Q per experiment', [group_statistics[0]]),
+        ('Read length + Q per flow cell', [group_statistics[1]])
+    ]
+
+# trend metrics: output table column, name in trend tables and bin edges of per-bucket histograms
+# bins set precision of trend medians and percentiles (get_trend_quantile): 0.25 Gb, 0.1 kb and 10 pores
+# values outside bins counted in first or last bin
+trend_metrics = {
+    'Data output (Gb)' : {'name' : 'Run data output (Gb)', 'bin_edges' : np.linspace(0, 400, 1601)},
+    'N50 (kb)' : {'name' : 'Read N50 (kb)', 'bin_edges' : np.linspace(0, 150, 1501)},
+    'Starting Active Pores' : {'name' : 'Starting active pores', 'bin_edges' : np.linspace(0, 15000, 1501)}
+}
+# histogram bins of all trend metrics side by side, each metric starting at its offset
+trend_bin_offsets = np.cumsum([0] + [len(metric['bin_edges']) - 1 for metric in trend_metrics.values()])
+trend_bin_edges = np.concatenate([metric['bin_edges'] for metric in trend_metrics.values()])
+# trend time buckets of Run Date (weeks start on Monday)
+trend_periods = {'Week' : 'W-SUN', 'Month' : 'M'}
+# output table columns identifying a run in trend bucket fingerprints, with the trend metric columns
+trend_run_key_columns = ['Experiment Name', 'Sample Name', 'PROM ID', 'Flow Cell ID', 'Run Date']
+
+# mergeable aggregates of runs per time bucket (week or month of Run Date), so rolling windows and updates merge buckets
+# instead of going back to runs; keys are bucket start dates (YYYY-MM-DD) in order
+# counts and sums have one column per trend metric, histograms the bins of all trend metrics (trend_bin_offsets)
+# fingerprints are wrapping sums of run fingerprints (get_trend_run_fingerprints) per bucket, so changed runs in a bucket are noticed
+@dataclasses.dataclass
+class trend_buckets:
+    keys : np.ndarray
+    runs : np.ndarray
+    counts : np.ndarray
+    sums : np.ndarray
+    histograms : np.ndarray
+    fingerprints : np.ndarray
+    bin_edges : np.ndarray = dataclasses.field(default_factory=lambda: trend_bin_edges)
+
+# get bucket index of each run per period (trend_periods key) of Run Date (-1 if no or invalid run date) and bucket keys
+# dates converted to bucket start dates once per unique date rather than once per run
+def get_trend_bucket_codes(run_dates, period):
+    date_codes, unique_dates = pd.factorize(run_dates)
+    unique_starts = pd.to_datetime(pd.Series(np.asarray(unique_dates), dtype=object), errors='coerce').dt.to_period(trend_periods[period]).dt.start_time.dt.strftime('%Y-%m-%d')
+    start_codes, bucket_keys = pd.factorize(unique_starts, sort=True)
+    # runs without run date (-1) stay -1
+    return np.append(start_codes, -1)[date_codes], np.asarray(bucket_keys, dtype=str)
+
+# get 64-bit fingerprint of each run from its run key columns (trend_run_key_columns) and trend metric values
+# key columns not already text (e.g., run dates as dates) converted to text, so dates and YYYY-MM-DD text give the same fingerprint
+def get_trend_run_fingerprints(longread_extract):
+    run_values = pd.DataFrame({column : longread_extract[column] if pd.api.types.is_object_dtype(longread_extract[column]) else longread_extract[column].astype(str) for column in trend_run_key_columns})
+    for column in trend_metrics:
+        run_values[column] = pd.to_numeric(longread_extract[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    return pd.util.hash_pandas_object(run_values, index=False).to_numpy(dtype=np.uint64)
+
+# aggregate runs into trend buckets per period (trend_periods key) of Run Date, runs without run date left out
+# run_fingerprints (get_trend_run_fingerprints of longread_extract) computed if not given
+def aggregate_trend_buckets(longread_extract, period, run_fingerprints=None):
+    if run_fingerprints is None:
+        run_fingerprints = get_trend_run_fingerprints(longread_extract)
+    bucket_codes, bucket_keys = get_trend_bucket_codes(longread_extract['Run Date'], period)
+    dated_runs = bucket_codes >= 0
+    bucket_codes = bucket_codes[dated_runs]
+    bucket_count = len(bucket_keys)
+    buckets = trend_buckets(bucket_keys, np.bincount(bucket_codes, minlength=bucket_count), np.zeros((bucket_count, len(trend_metrics)), dtype=np.int64), np.zeros((bucket_count, len(trend_metrics))), np.zeros((bucket_count, trend_bin_offsets[-1]), dtype=np.int64), np.zeros(bucket_count, dtype=np.uint64))
+    # sums wrap around, so bucket fingerprints do not depend on run order
+    np.add.at(buckets.fingerprints, bucket_codes, run_fingerprints[dated_runs])
+    for metric_index, (column, metric) in enumerate(trend_metrics.items()):
+        metric_values = pd.to_numeric(longread_extract[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)[dated_runs]
+        metric_codes = bucket_codes[~np.isnan(metric_values)]
+        metric_values = metric_values[~np.isnan(metric_values)]
+        buckets.counts[:, metric_index] = np.bincount(metric_codes, minlength=bucket_count)
+        buckets.sums[:, metric_index] = np.bincount(metric_codes, weights=metric_values, minlength=bucket_count)
+        metric_bins = np.clip(np.searchsorted(metric['bin_edges'], metric_values, side='right') - 1, 0, len(metric['bin_edges']) - 2) + trend_bin_offsets[metric_index]
+        buckets.histograms += np.bincount(metric_codes * trend_bin_offsets[-1] + metric_bins, minlength=bucket_count * trend_bin_offsets[-1]).reshape(bucket_count, trend_bin_offsets[-1])
+    return buckets
+
+# get trend buckets of runs per period (trend_periods key) of Run Date, runs without run date left out
+# with previous (trend_buckets of an earlier summary), buckets before the last previous bucket are taken as settled (runs of past weeks
+# or months do not change): if runs dated before the last previous bucket have the same count and summed fingerprint as the settled
+# buckets, they are reused and only runs from the last previous bucket on (e.g., rest of last week and new week) are aggregated
+# settled runs are found by comparing Run Date values with the last bucket start, without parsing dates
+# otherwise (e.g., runs added to, removed from or changed in earlier weeks, different run cutoff) all runs are aggregated again
+def get_trend_buckets(longread_extract, period, previous=None):
+    if previous is not None and len(previous.keys) > 0:
+        watermark = str(previous.keys[-1])
+        run_dates = longread_extract['Run Date']
+        # YYYY-MM-DD run date text (tab-delimited input) sorts in date order
+        if pd.api.types.is_datetime64_any_dtype(run_dates):
+            settled_runs = (run_dates < pd.Timestamp(watermark)).to_numpy(dtype=bool)
         else:
-            # if topup or other labels not in sample name, set value to "Initial run"
-            topups[idx] = "Initial run"
+            settled_runs = (run_dates < watermark).to_numpy(dtype=bool)
+        settled_buckets = previous.keys < watermark
+        if settled_runs.sum() == previous.runs[settled_buckets].sum():
+            run_fingerprints = get_trend_run_fingerprints(longread_extract)
+            if np.sum(run_fingerprints[settled_runs], dtype=np.uint64) == np.sum(previous.fingerprints[settled_buckets], dtype=np.uint64):
+                recent_buckets = aggregate_trend_buckets(longread_extract.loc[~settled_runs, ['Run Date'] + list(trend_metrics)], period, run_fingerprints[~settled_runs])
+                # run dates not in YYYY-MM-DD form may sort after watermark but fall in settled buckets
+                if len(recent_buckets.keys) == 0 or recent_buckets.keys[0] >= watermark:
+                    return trend_buckets(**{field.name : np.concatenate([getattr(previous, field.name)[settled_buckets], getattr(recent_buckets, field.name)]) for field in dataclasses.fields(trend_buckets) if field.name != 'bin_edges'})
+            return aggregate_trend_buckets(longread_extract, period, run_fingerprints)
+    return aggregate_trend_buckets(longread_extract, period)
+
+# get quantile (0-1) of runs counted in each row of trend histograms, linearly interpolated between order statistics as pandas quantile
+# with each run at the centre of its bin, so within half a bin of the quantile of run values (missing if no runs)
+def get_trend_quantile(histograms, bin_edges, quantile):
+    run_counts = histograms.sum(axis=1)
+    bin_centres = (bin_edges[:-1] + bin_edges[1:]) / 2
+    cumulative_counts = np.cumsum(histograms, axis=1)
+    position = np.maximum(run_counts - 1, 0) * quantile
+    # bins of order statistics either side of position
+    lower_bins = np.minimum((cumulative_counts <= np.floor(position)[:, None]).sum(axis=1), len(bin_centres) - 1)
+    upper_bins = np.minimum((cumulative_counts <= np.ceil(position)[:, None]).sum(axis=1), len(bin_centres) - 1)
+    trend_quantile = bin_centres[lower_bins] + (position - np.floor(position)) * (bin_centres[upper_bins] - bin_centres[lower_bins])
+    return np.where(run_counts > 0, trend_quantile, np.nan)
+
+# get trend table of period (trend_periods key) from trend buckets, with one row per calendar bucket from first to last (empty buckets included)
+# mean, median and percentiles (0-100) of each trend metric per bucket and over rolling windows of trend_window buckets ending at each bucket
+# rolling statistics merge bucket aggregates, so medians and percentiles are read from summed histograms (get_trend_quantile)
+def get_trend_table(buckets, period, trend_window=4, percentiles=(10, 90)):
+    period_column = f'{period} start'
+    if len(buckets.keys) == 0:
+        return pd.DataFrame(columns=[period_column, 'Runs'])
+    calendar = pd.period_range(pd.Period(buckets.keys[0], trend_periods[period]), pd.Period(buckets.keys[-1], trend_periods[period]))
+    calendar_index = pd.Index(calendar.start_time.strftime('%Y-%m-%d')).get_indexer(buckets.keys)
+    # bucket aggregates on calendar, then rolling window sums from cumulative sums
+    aggregates = {}
+    for name in ['runs', 'counts', 'sums', 'histograms']:
+        bucket_values = getattr(buckets, name)
+        calendar_values = np.zeros((len(calendar),) + bucket_values.shape[1:], dtype=bucket_values.dtype)
+        calendar_values[calendar_index] = bucket_values
+        cumulative = np.cumsum(calendar_values, axis=0)
+        rolling_values = cumulative.copy()
+        rolling_values[trend_window:] -= cumulative[:-trend_window]
+        aggregates[name] = (calendar_values, rolling_values)
+    trend_df = pd.DataFrame({period_column : calendar.start_time.strftime('%Y-%m-%d'), 'Runs' : aggregates['runs'][0], f'Runs ({trend_window} {period.lower()} rolling)' : aggregates['runs'][1]})
+    for metric_index, metric in enumerate(trend_metrics.values()):
+        metric_bins = slice(trend_bin_offsets[metric_index], trend_bin_offsets[metric_index + 1])
+        for label, window_index in [('', 0), (f' ({trend_window} {period.lower()} rolling)', 1)]:
+            counts = aggregates['counts'][window_index][:, metric_index]
+            histograms = aggregates['histograms'][window_index][:, metric_bins]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                trend_df[f'{metric["name"]} mean{label}'] = aggregates['sums'][window_index][:, metric_index] / counts
+            trend_df[f'{metric["name"]} median{label}'] = get_trend_quantile(histograms, metric['bin_edges'], 0.5)
+            for percentile in percentiles:
+                trend_df[f'{metric["name"]} {get_ordinal(percentile)} percentile{label}'] = get_trend_quantile(histograms, metric['bin_edges'], percentile / 100)
+    return trend_df
+
+# write trend buckets of each period (dictionary of trend_periods key and trend_buckets) to compressed NumPy state file (.npz)
+# written to temporary file first so an interrupted run does not leave a truncated state
+def write_trend_state(state_file, period_buckets):
+    with open(f'{state_file}.tmp', 'wb') as outfile:
+        np.savez_compressed(outfile, **{f'{period}_{field.name}' : getattr(buckets, field.name) for period, buckets in period_buckets.items() for field in dataclasses.fields(trend_buckets)})
+    os.replace(f'{state_file}.tmp', state_file)
+
+# read trend buckets of each period from state file written by write_trend_state (empty if no state file)
+# buckets without fingerprints or on different histogram bins (e.g., state from another version) discarded
+def read_trend_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    period_buckets = {}
+    with np.load(state_file) as state_arrays:
+        for period in trend_periods:
+            if all(f'{period}_{field.name}' in state_arrays for field in dataclasses.fields(trend_buckets)):
+                buckets = trend_buckets(**{field.name : state_arrays[f'{period}_{field.name}'] for field in dataclasses.fields(trend_buckets)})
+                if np.array_equal(buckets.bin_edges, trend_bin_edges):
+                    period_buckets[period] = buckets
+    return period_buckets
+
+# find reconnections through sequence run flow cell ID (shared between runs) and sample name
+# reconnection if flow cell ID seen in an earlier run and same sample name more than once for given flow cell
+# hashes (flow cell ID, sample name) pairs once instead of rescanning earlier runs for every run
+def find_reconnections(sample_names, flow_cell_IDs):
+    runs = pd.DataFrame({'Flow Cell ID' : np.asarray(flow_cell_IDs, dtype=object), 'Sample Name' : np.asarray(sample_names, dtype=object)})
+    # flow cell ID in previous subset of list before current run
+    repeated_flow_cell = runs['Flow Cell ID'].duplicated(keep='first').to_numpy()
+    # runs with same flow cell ID and sample name (missing IDs or names never match)
+    runs_per_flow_cell_and_sample = runs.groupby(['Flow Cell ID','Sample Name'])['Sample Name'].transform('size').to_numpy()
+    return repeated_flow_cell & (runs_per_flow_cell_and_sample > 1)
+
+# identify topups and reconnections (flow cell moved and run restarted)
+# with flow cell IDs provided, also label reconnections found by find_reconnections in the same pass
+def identify_topups(column, flow_cell_IDs=None):
+    sample_names = pd.Series(np.asarray(column, dtype=object))
+    # if topup in sample name, set value to topup
+    # if recovery in sample name, set value to recovery
+    # if reconnected in sample name, set value to reconnection
+    conditions = [sample_names.str.contains('topup', regex=False, na=False), sample_names.str.contains('recovery', regex=False, na=False), sample_names.str.contains('reconnected', regex=False, na=False)]
+    labels = ['Top up', 'Recovery', 'Reconnection']
+    # detected reconnections take precedence over sample name labels
+    if flow_cell_IDs is not None:
+        conditions.insert(0, find_reconnections(column, flow_cell_IDs))
+        labels.insert(0, 'Reconnection')
+    # if topup or other labels not in sample name, set value to "Initial run"
+    topups = np.select(conditions, labels, default='Initial run')
     # return topups/no topups column
-    return topups
-
-# identify reconnections through sequence run flow cell ID (shared between runs), date, and experiment name
-# reconnection if same name and flow cell ID as previous run; add value to topups column shown before
-def identify_reconnections(data):
-    data_with_reconnections = data.copy()
-    # loop through rows of data frame on Flow Cell ID column
-    for idx, i in enumerate(data['Flow Cell ID']):
-        # see if flow cell ID in previous subset of list before current element
-        if i in list(data['Flow Cell ID'][0:idx]):
-            # get data frame for repeated flow cell
-            duplicate_flow_cell_id_df = data[data['Flow Cell ID'] == i]
-            # compare sample name for current run to all those with flow cell ID
-            test_sample_name = data.loc[idx]["Sample Name"]
-            # print(test_sample_name)
-            # if same sample name more than once for given flow cell, name most recent run as reconnection
-            if (sum(duplicate_flow_cell_id_df["Sample Name"] == test_sample_name) > 1):
-                data_with_reconnections.loc[(idx,"Top up")] = "Reconnection"
-    # return data frame with algorithmically detected reconnections in topups column
-    return data_with_reconnections
-    
-# make violinplot/swarmplot figure worksheet in output workbook
-def make_figure_worksheet(data,input_variable,workbook,worksheet_name,cutoff=None,title=None,top_up=None):
-    # create worksheet for figure output
-    worksheet=workbook.create_sheet(worksheet_name)
+    return topups.tolist()
+
+# import plotting modules on first use
+# render figures off screen with non-interactive backend
+def import_plotting_modules():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sb
+    return matplotlib, plt, sb
+
+# downsample data frame to at most max_points rows for scatterplots (no downsampling if max_points not set)
+# same fraction sampled from each top up category with fixed seed so figures are reproducible
+# at least one row kept from each category so rare run types stay visible
+def downsample_points(data,max_points=None,hue='Top up'):
+    if not max_points or len(data) <= max_points:
+        return data
+    fraction = max_points / len(data)
+    rng = np.random.default_rng(0)
+    # sample from each category of hue column, or from all rows if no hue column
+    if hue in data.columns:
+        categories = pd.factorize(data[hue])[0]
+    else:
+        categories = np.zeros(len(data), dtype=int)
+    keep = np.zeros(len(data), dtype=bool)
+    for category in np.unique(categories):
+        category_rows = np.flatnonzero(categories == category)
+        keep[rng.choice(category_rows, max(1, round(len(category_rows) * fraction)), replace=False)] = True
+    # keep original row order
+    return data[keep]
+
+# make violinplot/swarmplot figure as PNG image data
+# swarm layout is roughly quadratic, so above max_points values switch to a jittered strip plot of small translucent points
+def make_figure(data,input_variable,cutoff=None,title=None,top_up=None,max_points=None):
+    matplotlib, plt, sb = import_plotting_modules()
     # initialize raw data buffer for image
     imgdata=BytesIO()
     # initialize plot overall
     fig, ax = plt.subplots()
+    # large cohort mode if more than max_points values to plot
+    large_cohort = bool(max_points) and data[input_variable].count() > max_points
     # make swarm plot to show how data points overlap with distribution
     # color points based on top up variable (initial run, top up, reconnection, recovery)
     # replace color='black'
     if top_up is not None:
         rearranged_color_palette = [sb.color_palette()[0],sb.color_palette()[1],sb.color_palette()[4],sb.color_palette()[5]]
-        ax = sb.swarmplot(data=data,x=input_variable,hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette,edgecolor='white',linewidth=1)
+        if large_cohort:
+            ax = sb.stripplot(data=data,x=input_variable,hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette,size=2,alpha=0.4,jitter=0.3,linewidth=0)
+        else:
+            ax = sb.swarmplot(data=data,x=input_variable,hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette,edgecolor='white',linewidth=1)
     else:
-        ax = sb.swarmplot(data=data,x=input_variable,color='black')
+        if large_cohort:
+            ax = sb.stripplot(data=data,x=input_variable,color='black',size=2,alpha=0.4,jitter=0.3,linewidth=0)
+        else:
+            ax = sb.swarmplot(data=data,x=input_variable,color='black')
     # add violin plot using seaborn (sb.violinplot)
     # increase transparency to improve swarmplot visibility
     ax = sb.violinplot(data=data,x=input_variable,color='white',ax=ax)
@@ -197,19 +539,14 @@ def make_figure_worksheet(data,input_variable,workbook,worksheet_name,cutoff=Non
     # fig = swarmplot.get_figure()
     # save figure as 200 dpi PNG into buffer
     fig.savefig(imgdata, format='png', dpi=200)
-    # close figure
-    fig.clf()
-    # make openpyxl image from raw data
-    img = openpyxl.drawing.image.Image(imgdata)
-    # set location of image in worksheet (A1)
-    img.anchor = 'A1'
-    # add image to worksheet
-    worksheet.add_image(img)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
     
-# make starting active pores vs. run data output scatterplot in output workbook
-def make_active_pore_data_output_scatterplot(data,workbook,worksheet_name,title=None):
-    # create worksheet for figure output
-    worksheet=workbook.create_sheet(worksheet_name)
+# make starting active pores vs. run data output scatterplot as PNG image data
+def make_active_pore_data_output_scatterplot_figure(data,title=None,max_points=None):
+    matplotlib, plt, sb = import_plotting_modules()
     # initialize raw data buffer for image
     imgdata=BytesIO()
     # initialize plot overall
@@ -219,7 +556,8 @@ def make_active_pore_data_output_scatterplot(data,workbook,worksheet_name,title=
     # had to remove regression to use hue keyword
     # color points by topup/not topup run
     rearranged_color_palette = [sb.color_palette()[0],sb.color_palette()[1],sb.color_palette()[4],sb.color_palette()[5]]
-    ax = sb.scatterplot(data=data,x='Starting Active Pores',y='Data output (Gb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette)
+    # downsample to max_points runs for large cohorts
+    ax = sb.scatterplot(data=downsample_points(data,max_points),x='Starting Active Pores',y='Data output (Gb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette)
     # add title if specified
     if title is not None:
         ax.set_title(title)
@@ -236,20 +574,15 @@ def make_active_pore_data_output_scatterplot(data,workbook,worksheet_name,title=
     # fig = swarmplot.get_figure()
     # save figure as 150 dpi PNG into buffer
     fig.savefig(imgdata, format='png', dpi=150)
-    # close figure
-    fig.clf()
-    # make openpyxl image from raw data
-    img = openpyxl.drawing.image.Image(imgdata)
-    # set location of image in worksheet (A1)
-    img.anchor = 'A1'
-    # add image to worksheet
-    worksheet.add_image(img)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
     
-# make starting active pores vs. flow cell data output scatterplot in output workbook
+# make starting active pores vs. flow cell data output scatterplot as PNG image data
 # this doesn't work because starting active pores are distinct per run
-def make_active_pore_flow_cell_output_scatterplot(data,workbook,worksheet_name,title=None):     
-    # create worksheet for figure output
-    worksheet=workbook.create_sheet(worksheet_name)
+def make_active_pore_flow_cell_output_scatterplot_figure(data,title=None,max_points=None):
+    matplotlib, plt, sb = import_plotting_modules()
     # initialize raw data buffer for image
     imgdata=BytesIO()
     # initialize plot overall
@@ -258,7 +591,8 @@ def make_active_pore_flow_cell_output_scatterplot(data,workbook,worksheet_name,t
     # include regression by using sb.regplot() function
     # had to remove regression to use hue keyword
     # color points by topup/not topup run
-    ax = sb.scatterplot(data=data,x='Starting Active Pores',y='Flow cell output (Gb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'])
+    # downsample to max_points runs for large cohorts
+    ax = sb.scatterplot(data=downsample_points(data,max_points),x='Starting Active Pores',y='Flow cell output (Gb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'])
     # add title if specified
     if title is not None:
         ax.set_title(title)
@@ -275,19 +609,14 @@ def make_active_pore_flow_cell_output_scatterplot(data,workbook,worksheet_name,t
     # fig = swarmplot.get_figure()
     # save figure as 150 dpi PNG into buffer
     fig.savefig(imgdata, format='png', dpi=150)
-    # close figure
-    fig.clf()
-    # make openpyxl image from raw data
-    img = openpyxl.drawing.image.Image(imgdata)
-    # set location of image in worksheet (A1)
-    img.anchor = 'A1'
-    # add image to worksheet
-    worksheet.add_image(img)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
     
-# make starting active pores vs. n50 scatterplot in output workbook
-def make_active_pore_read_n50_scatterplot(data,workbook,worksheet_name,title=None):
-    # create worksheet for figure output
-    worksheet=workbook.create_sheet(worksheet_name)
+# make starting active pores vs. n50 scatterplot as PNG image data
+def make_active_pore_read_n50_scatterplot_figure(data,title=None,max_points=None):
+    matplotlib, plt, sb = import_plotting_modules()
     # initialize raw data buffer for image
     imgdata=BytesIO()
     # initialize plot overall
@@ -298,7 +627,8 @@ def make_active_pore_read_n50_scatterplot(data,workbook,worksheet_name,title=Non
     # color points by topup/not topup run
     # use colors not used for cutoff lines
     rearranged_color_palette = [sb.color_palette()[0],sb.color_palette()[1],sb.color_palette()[4],sb.color_palette()[5]]
-    ax = sb.scatterplot(data=data,x='Starting Active Pores',y='N50 (kb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette)
+    # downsample to max_points runs for large cohorts
+    ax = sb.scatterplot(data=downsample_points(data,max_points),x='Starting Active Pores',y='N50 (kb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette)
     # add title if specified
     if title is not None:
         ax.set_title(title)
@@ -313,19 +643,14 @@ def make_active_pore_read_n50_scatterplot(data,workbook,worksheet_name,title=Non
     # fig = swarmplot.get_figure()
     # save figure as 150 dpi PNG into buffer
     fig.savefig(imgdata, format='png', dpi=150)
-    # close figure
-    fig.clf()
-    # make openpyxl image from raw data
-    img = openpyxl.drawing.image.Image(imgdata)
-    # set location of image in worksheet (A1)
-    img.anchor = 'A1'
-    # add image to worksheet
-    worksheet.add_image(img)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
     
-# make starting active pores vs. n50 scatterplot in output workbook
-def make_read_n50_data_output_scatterplot(data,workbook,worksheet_name,title=None):
-    # create worksheet for figure output
-    worksheet=workbook.create_sheet(worksheet_name)
+# make read n50 vs. data output scatterplot as PNG image data
+def make_read_n50_data_output_scatterplot_figure(data,title=None):
+    matplotlib, plt, sb = import_plotting_modules()
     # initialize raw data buffer for image
     imgdata=BytesIO()
     # initialize plot overall
@@ -345,151 +670,614 @@ def make_read_n50_data_output_scatterplot(data,workbook,worksheet_name,title=Non
     # fig = swarmplot.get_figure()
     # save figure as 150 dpi PNG into buffer
     fig.savefig(imgdata, format='png', dpi=150)
-    # close figure
-    fig.clf()
-    # make openpyxl image from raw data
-    img = openpyxl.drawing.image.Image(imgdata)
-    # set location of image in worksheet (A1)
-    img.anchor = 'A1'
-    # add image to worksheet
-    worksheet.add_image(img)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
     
-# set up command line argument parser
-parser = argparse.ArgumentParser(description='This program gets summary statistics from long read sequencing report data.')
-
-# get input and output arguments
-parser.add_argument('-input', action="store", dest="input_file", help="Input tab-delimited tsv file containing features extracted from long read sequencing reports.")
-parser.add_argument('-output', action="store", dest="output_file", help="Output long read sequencing summary statistics XLSX")
-parser.add_argument('-plot_title', action="store", default=None, dest="plot_title", help="Title for each plot in output XLSX (optional)")
-# add boolean --plot_cutoff argument
-parser.add_argument('--plot_cutoff', action=argparse.BooleanOptionalAction, default=True, dest="plot_cutoff", help="Include cutoff lines in violin plots (optional; default true; --no-plot_cutoff to override)")
-# include failed run cutoff to exclude as well
-parser.add_argument('-run_cutoff', action="store", default=1, dest="run_cutoff", help="Minimum data output per flow cell run to include (optional, 1 Gb default)")
-
-# parse arguments
-results = parser.parse_args()
-
-# throw error if no input file provided
-if results.input_file is None:
-	quit('ERROR: No input file (-input) provided!')
-        
-# set default output filename
-if results.output_file is None:
-    results.output_file='output_summary_statistics.xlsx'
-
-# read tab delimited output into pandas data frame
-longread_extract_initial=pd.read_csv(results.input_file,sep='\t')
-
-# use functions above
-# first filter out low output runs
-longread_extract = longread_extract_initial[longread_extract_initial['Data output (Gb)'] > results.run_cutoff]
-# fix indices
-longread_extract.reset_index(drop='True',inplace=True)
-# add top up column to data frame
-# avoid nested tuple warning
-# longread_extract["Top up"] = identify_topups(longread_extract["Sample Name"])
-# add after 12th column or last column (dataframe.shape[1])
-longread_extract.insert(longread_extract.shape[1],"Top up",identify_topups(longread_extract["Sample Name"]),True)
-# identify reconnections amongst flow cells
-longread_extract = identify_reconnections(longread_extract)
-# flow cells per experiment
-longread_extract_flow_cells_and_output_per_experiment = get_flow_cells_and_output_per_experiment(longread_extract['Experiment Name'], longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'])
-# output per flow cell
-longread_extract_output_per_flow_cell = get_output_per_flow_cell(longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'], longread_extract['Top up'])
-# flow cells per experiment distribution
-longread_extract_flow_cells_per_experiment_dist = get_flow_cells_per_experiment_dist(longread_extract_flow_cells_and_output_per_experiment['Flow Cells'])
-# summary statistics on...
-# read N50
-read_N50_summary_stats = get_summary_statistics(longread_extract['N50 (kb)'])
-# sequence output
-sequence_output_summary_stats = get_summary_statistics(longread_extract['Data output (Gb)'])
-# starting active pores per run
-starting_active_pores_summary_stats = get_summary_statistics(longread_extract['Starting Active Pores'])
-# flow cells per experiment
-flow_cells_per_experiment_summary_stats = get_summary_statistics(longread_extract_flow_cells_and_output_per_experiment['Flow Cells'])
-# output per flow cell
-output_per_flow_cell_summary_stats = get_summary_statistics(longread_extract_output_per_flow_cell['Flow cell output (Gb)'])
-# total output per experiment
-output_per_experiment_summary_stats = get_summary_statistics(longread_extract_flow_cells_and_output_per_experiment['Total output (Gb)'])
-
-# combine summary stats into one list
-combined_summary_stats = [read_N50_summary_stats,sequence_output_summary_stats,starting_active_pores_summary_stats,flow_cells_per_experiment_summary_stats,output_per_flow_cell_summary_stats,output_per_experiment_summary_stats]
-
-# make data frame from combined_summary_stats
-combined_property_names = ['Read N50 (kb)','Run data output (Gb)','Starting active pores','Flow cells per experiment','Flow cell output (Gb)', 'Total experiment output (Gb)']
-combined_summary_stats_df = make_summary_statistics_data_frame(combined_summary_stats,combined_property_names)
-
-# minknow version distribution
-longread_extract_minknow_version_dist = get_minknow_version_dist(longread_extract['MinKNOW Version'])
-
-# save data frames as tab-delimited file (.tsv)
-# Example data structure
-# Header 
-# Property   Total   Min Max Mean    Median  Mode    Standard Deviation
-# Read N50 (kb)
-# Data output (Gb)
-# Flow cells per experiment
-# <empty>
-# Flow Cells    Frequency
-# 1 128
-# 2 398
-# etc.
-# <empty>
-# MinKNOW Version   Frequency
-# 22.10.7   756
-# 23.11.4   9
-# etc.
-# <empty>
-
-# output data frames and figures to excel spreadsheet
-writer = pd.ExcelWriter(results.output_file)
-# write data frames with a row between each
-# write combined summary stats
-start_row = 0
-combined_summary_stats_df.to_excel(writer, startrow=start_row, index=False, sheet_name='Summary statistics report')
-# write flow cells per experiment distribution
-# add 1 to row number after combined_summary_stats_df exported
-start_row = start_row + len(combined_summary_stats_df) + 2
-longread_extract_flow_cells_per_experiment_dist.to_excel(writer, startrow=start_row, index=False, sheet_name='Summary statistics report')
-# write minknow version distribution
-start_row = start_row + len(longread_extract_flow_cells_per_experiment_dist) + 2
-longread_extract_minknow_version_dist.to_excel(writer, startrow=start_row, index=False, sheet_name='Summary statistics report')
-# write flow cells and output per unique experiment on another worksheet
-longread_extract_flow_cells_and_output_per_experiment.to_excel(writer, index=False, sheet_name='FC + output per experiment')
-# close writer and save workbook
-writer.close()
-# then add svg figures
-# use openpyxl and pipe image data into new worksheets
-# append new worksheets to existing workbook
-workbook = openpyxl.load_workbook(results.output_file)
-
-# use make_figure_worksheet function to insert figures
-# if/else depending on whether -plot_cutoff set
-if results.plot_cutoff is True:
-    # show topups in first three plots
-    make_figure_worksheet(longread_extract,"N50 (kb)",workbook,'Read N50 plot',None,results.plot_title,True)
-    make_figure_worksheet(longread_extract,"Data output (Gb)",workbook,'Run data output plot',90,results.plot_title,True)
-    make_figure_worksheet(longread_extract,"Starting Active Pores",workbook,'Starting active pores plot',6500,results.plot_title,True)
-    # now topups in next three plots
-    make_figure_worksheet(longread_extract_flow_cells_and_output_per_experiment,"Flow Cells",workbook,'Flow cells per experiment plot',None,results.plot_title)
-    make_figure_worksheet(longread_extract_flow_cells_and_output_per_experiment,"Total output (Gb)",workbook,'Output per experiment plot',90,results.plot_title)
-    make_figure_worksheet(longread_extract_output_per_flow_cell,"Flow cell output (Gb)",workbook,'Output per flow cell plot',90,results.plot_title)
-else:
-    # show topups in first three plots
-    make_figure_worksheet(longread_extract,"N50 (kb)",workbook,'Read N50 plot',None,results.plot_title,True)
-    make_figure_worksheet(longread_extract,"Data output (Gb)",workbook,'Run data output plot',None,results.plot_title,True)
-    make_figure_worksheet(longread_extract,"Starting Active Pores",workbook,'Starting active pores plot',None,results.plot_title,True)
-    # now topups in next three plots
-    make_figure_worksheet(longread_extract_flow_cells_and_output_per_experiment,"Flow Cells",workbook,'Flow cells per experiment plot',None,results.plot_title)
-    make_figure_worksheet(longread_extract_flow_cells_and_output_per_experiment,"Total output (Gb)",workbook,'Output per experiment plot',None,results.plot_title)
-    make_figure_worksheet(longread_extract_output_per_flow_cell,"Flow cell output (Gb)",workbook,'Output per flow cell plot',None,results.plot_title)
-# use make_active_pore_data_output_scatterplot function to add starting active pore vs. data output scatterplot
-make_active_pore_data_output_scatterplot(longread_extract,workbook,'Active pores vs. data output',results.plot_title)
-# make_active_pore_flow_cell_output_scatterplot(longread_extract_output_per_flow_cell,workbook,'Active pores vs. flow cell output',results.plot_title)
-make_active_pore_read_n50_scatterplot(longread_extract,workbook,'Active pores vs. read N50',results.plot_title)
-make_read_n50_data_output_scatterplot(longread_extract,workbook,'Read N50 vs. data output',results.plot_title)
-# save workbook when done
-workbook.save(results.output_file)
-
-# script complete
-quit()
\ No newline at end of file
+# make pore decay rate vs. run data output scatterplot as PNG image data
+def make_pore_decay_data_output_scatterplot_figure(data,title=None,max_points=None):
+    matplotlib, plt, sb = import_plotting_modules()
+    # initialize raw data buffer for image
+    imgdata=BytesIO()
+    # initialize plot overall
+    fig, ax = plt.subplots()
+    # color points by topup/not topup run as in other scatterplots
+    rearranged_color_palette = [sb.color_palette()[0],sb.color_palette()[1],sb.color_palette()[4],sb.color_palette()[5]]
+    # downsample to max_points runs for large cohorts
+    ax = sb.scatterplot(data=downsample_points(data,max_points),x='Pore decay rate (1/h)',y='Data output (Gb)',hue="Top up",hue_order=['Initial run','Top up','Reconnection','Recovery'],palette=rearranged_color_palette)
+    # add title if specified
+    if title is not None:
+        ax.set_title(title)
+    # set minimum y and x to zero
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
+    # add 90 GB/30x cutoff
+    ax.axhline(y=90,color='gray')
+    # save figure as 150 dpi PNG into buffer
+    fig.savefig(imgdata, format='png', dpi=150)
+    # close figure so memory is released between plots
+    plt.close(fig)
+    # return PNG image data
+    return imgdata.getvalue()
+
+# get dots per inch stored in PNG image data (pHYs chunk), 96 if not stored
+def get_png_dpi(image_data):
+    phys_index = image_data.find(b'pHYs')
+    if phys_index < 0:
+        return 96
+    # pixels per unit in x direction, pixels per unit in y direction, unit (1 = metre)
+    x_density, y_density, unit = struct.unpack('>IIB', image_data[phys_index+4:phys_index+13])
+    if unit != 1 or x_density == 0:
+        return 96
+    return x_density * 0.0254
+
+# write all tables and figures to output workbook in one pass with xlsxwriter
+# table_sheets is a list of (worksheet name, list of data frames), data frames written with a row between each
+# figures is a list of (worksheet name, PNG image data), each figure anchored at A1 of its own worksheet
+# workbook is serialised once on close, so nothing is reloaded or saved twice
+def write_summary_workbook(output_file,table_sheets,figures):
+    with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+        for worksheet_name, data_frames in table_sheets:
+            start_row = 0
+            for data_frame in data_frames:
+                data_frame.to_excel(writer, startrow=start_row, index=False, sheet_name=worksheet_name)
+                # add 1 to row number after each data frame exported
+                start_row = start_row + len(data_frame) + 2
+        for worksheet_name, image_data in figures:
+            worksheet = writer.book.add_worksheet(worksheet_name)
+            # xlsxwriter shrinks images by their dpi, so scale back up to show figures at full pixel size
+            image_scale = get_png_dpi(image_data) / 96
+            worksheet.insert_image('A1', worksheet_name + '.png', {'image_data': BytesIO(image_data), 'x_scale': image_scale, 'y_scale': image_scale})
+
+# write tables only (no figures) as tab-delimited text or JSON, without importing plotting or excel modules
+# tsv: tables of each worksheet in workbook order with a blank line between each
+# json: object of worksheet names, each a list of tables as lists of row records (dates in ISO format)
+def write_summary_tables(output_file,table_sheets,table_format='tsv'):
+    with open(output_file, 'w') as outfile:
+        if table_format == 'json':
+            json.dump({worksheet_name: [json.loads(data_frame.to_json(orient='records', double_precision=15, date_format='iso')) for data_frame in data_frames] for worksheet_name, data_frames in table_sheets}, outfile, indent=1)
+        else:
+            data_frames = [data_frame for worksheet_name, worksheet_data_frames in table_sheets for data_frame in worksheet_data_frames]
+            for index, data_frame in enumerate(data_frames):
+                if index > 0:
+                    outfile.write('\n')
+                data_frame.to_csv(outfile, sep='\t', index=False, lineterminator='\n')
+
+# list (worksheet name, figure function, figure function arguments) specifications of all figures in output workbook
+# cutoff lines shown if plot_cutoff set, large cohort plotting above max_plot_points (0 or None turns it off)
+# pore decay vs. data output scatterplot added if per-run pore decay table given
+def get_figure_specs(longread_extract,flow_cells_and_output_per_experiment,output_per_flow_cell,title=None,plot_cutoff=True,max_plot_points=1000,pore_decay=None):
+    if plot_cutoff is True:
+        output_cutoff = 90
+        starting_active_pores_cutoff = 6500
+    else:
+        output_cutoff = None
+        starting_active_pores_cutoff = None
+    if max_plot_points is not None and max_plot_points <= 0:
+        max_plot_points = None
+    figure_specs = [
+        # show topups in first three plots
+        ('Read N50 plot', make_figure, (longread_extract,"N50 (kb)",None,title,True,max_plot_points)),
+        ('Run data output plot', make_figure, (longread_extract,"Data output (Gb)",output_cutoff,title,True,max_plot_points)),
+        ('Starting active pores plot', make_figure, (longread_extract,"Starting Active Pores",starting_active_pores_cutoff,title,True,max_plot_points)),
+        # now topups in next three plots
+        ('Flow cells per experiment plot', make_figure, (flow_cells_and_output_per_experiment,"Flow Cells",None,title,None,max_plot_points)),
+        ('Output per experiment plot', make_figure, (flow_cells_and_output_per_experiment,"Total output (Gb)",output_cutoff,title,None,max_plot_points)),
+        ('Output per flow cell plot', make_figure, (output_per_flow_cell,"Flow cell output (Gb)",output_cutoff,title,None,max_plot_points)),
+        # starting active pore vs. data output scatterplot
+        ('Active pores vs. data output', make_active_pore_data_output_scatterplot_figure, (longread_extract,title,max_plot_points)),
+        # ('Active pores vs. flow cell output', make_active_pore_flow_cell_output_scatterplot_figure, (output_per_flow_cell,title,max_plot_points)),
+        ('Active pores vs. read N50', make_active_pore_read_n50_scatterplot_figure, (longread_extract,title,max_plot_points)),
+        ('Read N50 vs. data output', make_read_n50_data_output_scatterplot_figure, (longread_extract,title))
+    ]
+    # pore decay rate vs. data output scatterplot
+    if pore_decay is not None:
+        figure_specs.append(('Pore decay vs. data output', make_pore_decay_data_output_scatterplot_figure, (pore_decay,title,max_plot_points)))
+    return figure_specs
+
+# make one figure from (worksheet name, figure function, figure function arguments) specification
+# module level so it can be sent to worker processes (-plot_workers)
+def render_figure_spec(figure_spec):
+    worksheet_name, figure_function, figure_args = figure_spec
+    return worksheet_name, figure_function(*figure_args)
+
+# default on-disk figure cache location and size
+default_figure_cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'CARDlongread_figures')
+default_figure_cache_size = 256
+
+# content hash of figure specification used as figure cache key
+# covers the plotting function and its source file (so edited plotting code and dpi are picked up), plotting library versions
+# and every argument: data frames by column names and hashed column contents, everything else (cutoff, title, options) by value
+def get_figure_cache_key(figure_spec):
+    worksheet_name, figure_function, figure_args = figure_spec
+    matplotlib, plt, sb = import_plotting_modules()
+    key = hashlib.sha256()
+    key.update(f'{figure_function.__module__}.{figure_function.__qualname__} {matplotlib.__version__} {sb.__version__}'.encode())
+    with open(figure_function.__code__.co_filename, 'rb') as source_file:
+        key.update(hashlib.sha256(source_file.read()).digest())
+    for figure_arg in figure_args:
+        if isinstance(figure_arg, pd.DataFrame):
+            for column_name in figure_arg.columns:
+                key.update(repr(column_name).encode())
+                # hash columns of unhashable values (e.g. arrays of top up labels per flow cell) by their text
+                try:
+                    column_hash = pd.util.hash_pandas_object(figure_arg[column_name], index=False)
+                except TypeError:
+                    column_hash = pd.util.hash_pandas_object(figure_arg[column_name].astype(str), index=False)
+                key.update(column_hash.values.tobytes())
+        else:
+            key.update(repr(figure_arg).encode())
+        # separate arguments
+        key.update(b'\0')
+    return key.hexdigest()
+
+# get cached PNG image data for figure cache key, None if not cached
+# cached figure is touched so least recently used figures are evicted first
+def load_cached_figure(cache_dir,cache_key):
+    cache_file = os.path.join(cache_dir, cache_key + '.png')
+    try:
+        with open(cache_file, 'rb') as infile:
+            image_data = infile.read()
+        os.utime(cache_file)
+    except OSError:
+        return None
+    return image_data
+
+# store PNG image data in figure cache, written to temporary file first so readers never see partial figures
+def store_cached_figure(cache_dir,cache_key,image_data):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, cache_key + '.png')
+    with open(f'{cache_file}.{os.getpid()}.tmp', 'wb') as outfile:
+        outfile.write(image_data)
+    os.replace(f'{cache_file}.{os.getpid()}.tmp', cache_file)
+
+# remove least recently used figures until figure cache is at most max_size_mb megabytes
+# figures may be removed by another process sharing the cache (-plot_workers, -cohort_workers) at any point, so they are skipped
+def evict_figure_cache(cache_dir,max_size_mb):
+    try:
+        cache_entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith('.png') and entry.is_file()]
+    except OSError:
+        return
+    # (mtime, size, path) of each figure, stat once per figure
+    cache_files = []
+    for entry in cache_entries:
+        try:
+            entry_stat = entry.stat()
+        except OSError:
+            continue
+        cache_files.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry.path))
+    # most recently used first
+    cache_files.sort(reverse=True)
+    cache_size = 0
+    for mtime, size, path in cache_files:
+        cache_size = cache_size + size
+        if cache_size > max_size_mb * 1024 * 1024:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# render all figures for output workbook, spread across plot_workers processes if more than one
+# returns (worksheet name, PNG image data) in the same order as figure_specs so worksheets are always added in a fixed order
+# if cache_dir set, figures with unchanged inputs are reused from the on-disk figure cache and only the rest are rendered
+def render_figures(figure_specs,plot_workers=1,cache_dir=None,cache_size=default_figure_cache_size):
+    rendered_figures = [None] * len(figure_specs)
+    # look up cached figures
+    if cache_dir is not None:
+        cache_keys = [get_figure_cache_key(figure_spec) for figure_spec in figure_specs]
+        for index, cache_key in enumerate(cache_keys):
+            image_data = load_cached_figure(cache_dir, cache_key)
+            if image_data is not None:
+                rendered_figures[index] = (figure_specs[index][0], image_data)
+    # render figures not in cache
+    missing_indices = [index for index, rendered_figure in enumerate(rendered_figures) if rendered_figure is None]
+    missing_specs = [figure_specs[index] for index in missing_indices]
+    if plot_workers > 1 and len(missing_specs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=plot_workers) as executor:
+            new_figures = list(executor.map(render_figure_spec, missing_specs))
+    else:
+        new_figures = [render_figure_spec(figure_spec) for figure_spec in missing_specs]
+    for index, new_figure in zip(missing_indices, new_figures):
+        rendered_figures[index] = new_figure
+    # store newly rendered figures and keep cache within size limit
+    if cache_dir is not None:
+        for index in missing_indices:
+            store_cached_figure(cache_dir, cache_keys[index], rendered_figures[index][1])
+        evict_figure_cache(cache_dir, cache_size)
+    return rendered_figures
+
+# aggregated runs, summary tables and rendered figures of one cohort from build_summary
+# longread_extract has runs above run cutoff with Top up column added
+@dataclasses.dataclass
+class longread_summary:
+    longread_extract : pd.DataFrame
+    flow_cells_and_output_per_experiment : pd.DataFrame
+    output_per_flow_cell : pd.DataFrame
+    # list of (worksheet name, list of tables) as in write_summary_workbook
+    table_sheets : list
+    # list of (worksheet name, PNG bytes) in worksheet order, empty if figures not rendered
+    figures : list = dataclasses.field(default_factory=list)
+    # run histograms matching longread_extract rows, if given
+    histograms : object = None
+    # per-run pore decay table from mux scan series, if given
+    pore_decay : object = None
+    # dictionary of trend period and trend_buckets of runs, if trends set
+    trend_buckets : object = None
+
+# check run histograms and mux scan series (if given) have one row or series per input run
+def check_run_series(longread_extract_initial, histograms=None, mux_scans=None):
+    if histograms is not None and len(histograms.read_length_bases) != len(longread_extract_initial):
+        raise ValueError(f'{len(histograms.read_length_bases)} run histograms for {len(longread_extract_initial)} runs')
+    if mux_scans is not None and len(mux_scans.offsets) - 1 != len(longread_extract_initial):
+        raise ValueError(f'{len(mux_scans.offsets) - 1} run mux scan series for {len(longread_extract_initial)} runs')
+
+# select runs above run_cutoff and label top ups, recoveries and reconnections
+# returns boolean mask of runs kept among input runs and data frame of runs kept with Top up column added
+def get_summary_runs(longread_extract_initial, run_cutoff=1):
+    # use functions above
+    # first filter out low output runs
+    run_mask = (longread_extract_initial['Data output (Gb)'] > run_cutoff).to_numpy(dtype=bool, na_value=False)
+    longread_extract = longread_extract_initial[run_mask]
+    # fix indices
+    longread_extract.reset_index(drop='True',inplace=True)
+    # add top up column to data frame
+    # avoid nested tuple warning
+    # longread_extract["Top up"] = identify_topups(longread_extract["Sample Name"])
+    # add after 12th column or last column (dataframe.shape[1])
+    # identify reconnections amongst flow cells in the same pass
+    longread_extract.insert(longread_extract.shape[1],"Top up",identify_topups(longread_extract["Sample Name"],longread_extract["Flow Cell ID"]),True)
+    return run_mask, longread_extract
+
+# build summary of long read sequencing report features (output of extract_reports in CARDlongread_extract_from_json.py or read_longread_extract)
+# runs with data output at or below run_cutoff left out, summary tables always built and figures rendered if plots set
+# data frame used as is, so reports can go from extraction to summary in one process without an intermediate table file
+# profiler (stage_profiler) records aggregation, statistics and plotting stages if given
+# with run histograms (report_histograms, one row per input run) given, read length and q score worksheets are added
+# with mux scan series (report_mux_scans, one series per input run) given, pore decay worksheet and plot are added
+# runs with pore half-life below half_life_cutoff hours are flagged as fast decay
+# with trends set, weekly and monthly trend worksheet is added, with rolling statistics over trend_window weeks or months
+# trend_state (dictionary of trend period and trend_buckets, e.g. from read_trend_state) gives buckets of an earlier summary to reuse where settled (see get_trend_buckets)
+def build_summary(longread_extract_initial, run_cutoff=1, percentiles=None, iqr=False, plots=True, plot_title=None, plot_cutoff=True, max_plot_points=1000, plot_workers=1, figure_cache_dir=None, figure_cache_size=default_figure_cache_size, profiler=None, histograms=None, mux_scans=None, half_life_cutoff=24, trends=False, trend_window=4, trend_state=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    check_run_series(longread_extract_initial, histograms, mux_scans)
+    with profiler.stage('aggregation'):
+        run_mask, longread_extract = get_summary_runs(longread_extract_initial, run_cutoff)
+    return summarise_runs(longread_extract, run_mask, percentiles, iqr, plots, plot_title, plot_cutoff, max_plot_points, plot_workers, figure_cache_dir, figure_cache_size, profiler, histograms, mux_scans, half_life_cutoff, trends, trend_window, trend_state)
+
+# summarise runs selected by get_summary_runs (longread_extract, with Top up column) into tables and figures (longread_summary)
+# run_mask selects rows of run histograms and mux scan series (one per input run) belonging to longread_extract
+# options as in build_summary
+def summarise_runs(longread_extract, run_mask, percentiles=None, iqr=False, plots=True, plot_title=None, plot_cutoff=True, max_plot_points=1000, plot_workers=1, figure_cache_dir=None, figure_cache_size=default_figure_cache_size, profiler=None, histograms=None, mux_scans=None, half_life_cutoff=24, trends=False, trend_window=4, trend_state=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    # aggregate runs per flow cell and experiment
+    with profiler.stage('aggregation'):
+        # flow cells per experiment
+        longread_extract_flow_cells_and_output_per_experiment = get_flow_cells_and_output_per_experiment(longread_extract['Experiment Name'], longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'])
+        # output per flow cell
+        longread_extract_output_per_flow_cell = get_output_per_flow_cell(longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'], longread_extract['Top up'])
+        # flow cells per experiment distribution
+        longread_extract_flow_cells_per_experiment_dist = get_flow_cells_per_experiment_dist(longread_extract_flow_cells_and_output_per_experiment['Flow Cells'])
+        # minknow version distribution
+        longread_extract_minknow_version_dist = get_minknow_version_dist(longread_extract['MinKNOW Version'])
+
+    with profiler.stage('statistics'):
+        # summary statistics on...
+        # read N50, sequence output, starting active pores per run, flow cells per experiment, output per flow cell, and total output per experiment
+        # all computed together by batched summary statistics engine
+        combined_summary_stats_columns = [longread_extract['N50 (kb)'],longread_extract['Data output (Gb)'],longread_extract['Starting Active Pores'],longread_extract_flow_cells_and_output_per_experiment['Flow Cells'],longread_extract_output_per_flow_cell['Flow cell output (Gb)'],longread_extract_flow_cells_and_output_per_experiment['Total output (Gb)']]
+
+        # make data frame from combined summary stats
+        combined_property_names = ['Read N50 (kb)','Run data output (Gb)','Starting active pores','Flow cells per experiment','Flow cell output (Gb)', 'Total experiment output (Gb)']
+        combined_summary_stats_df = get_batched_summary_statistics(combined_summary_stats_columns,combined_property_names,percentiles,iqr)
+
+    # save data frames as tab-delimited file (.tsv)
+    # Example data structure
+    # Header 
+    # Property   Total   Min Max Mean    Median  Mode    Standard Deviation
+    # Read N50 (kb)
+    # Data output (Gb)
+    # Flow cells per experiment
+    # <empty>
+    # Flow Cells    Frequency
+    # 1 128
+    # 2 398
+    # etc.
+    # <empty>
+    # MinKNOW Version   Frequency
+    # 22.10.7   756
+    # 23.11.4   9
+    # etc.
+    # <empty>
+
+    # worksheets of tables
+    # combined summary stats, flow cells per experiment distribution and minknow version distribution on first worksheet
+    # flow cells and output per unique experiment on another worksheet
+    table_sheets = [
+        ('Summary statistics report', [combined_summary_stats_df, longread_extract_flow_cells_per_experiment_dist, longread_extract_minknow_version_dist]),
+        ('FC + output per experiment', [longread_extract_flow_cells_and_output_per_experiment])
+    ]
+    # read length and q score histograms of runs kept, summed per cohort, experiment and flow cell
+    if histograms is not None:
+        with profiler.stage('histograms'):
+            histograms = dataclasses.replace(histograms, **{name : getattr(histograms, name)[run_mask] for name in ['read_length_bases', 'qscore_passed_bases', 'qscore_failed_bases']})
+            table_sheets.extend(get_histogram_table_sheets(longread_extract, histograms))
+    # pore decay rates of runs kept, fitted together, with flow cell batch table
+    if mux_scans is not None:
+        with profiler.stage('decay'):
+            pore_decay_df, flow_cell_batch_df = get_pore_decay_tables(longread_extract, get_pore_decay_rates(select_mux_scan_runs(mux_scans, run_mask)), half_life_cutoff)
+            table_sheets.append(('Pore decay', [flow_cell_batch_df, pore_decay_df]))
+    else:
+        pore_decay_df = None
+    # weekly and monthly trends of runs kept, settled buckets of trend_state reused
+    # trend percentiles as in summary statistics table, 10th and 90th if none given
+    if trends is True:
+        with profiler.stage('trends'):
+            if trend_state is None:
+                trend_state = {}
+            period_buckets = {period : get_trend_buckets(longread_extract, period, trend_state.get(period)) for period in trend_periods}
+            table_sheets.append(('Trends', [get_trend_table(buckets, period, trend_window, percentiles if percentiles is not None else (10, 90)) for period, buckets in period_buckets.items()]))
+    else:
+        period_buckets = None
+
+    # render figures, in parallel if plot_workers set
+    if plots is True:
+        figure_specs = get_figure_specs(longread_extract,longread_extract_flow_cells_and_output_per_experiment,longread_extract_output_per_flow_cell,plot_title,plot_cutoff,max_plot_points,pore_decay_df)
+        with profiler.stage('plotting'):
+            rendered_figures = render_figures(figure_specs,plot_workers,figure_cache_dir,figure_cache_size)
+    else:
+        rendered_figures = []
+    return longread_summary(longread_extract,longread_extract_flow_cells_and_output_per_experiment,longread_extract_output_per_flow_cell,table_sheets,rendered_figures,histograms,pore_decay_df,period_buckets)
+
+# write summary from build_summary as excel spreadsheet (tables, then figures in new worksheets in fixed order)
+# or only its tables as tab-delimited text or JSON if tables_only set
+def write_summary(cohort_summary, output_file, tables_only=False, table_format='tsv', profiler=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    if tables_only is True:
+        with profiler.stage('tables'):
+            write_summary_tables(output_file,cohort_summary.table_sheets,table_format)
+    else:
+        with profiler.stage('workbook'):
+            write_summary_workbook(output_file,cohort_summary.table_sheets,cohort_summary.figures)
+
+# get cohort of each run from its experiment name, for one summary per cohort (batch mode)
+# with prefixes given, cohort is the longest prefix the experiment name starts with
+# with regex given, cohort is the first capture group (or whole match if no groups) of the first match in the experiment name
+# runs in no cohort get missing cohort
+def get_cohort_keys(experiments, prefixes=None, regex=None):
+    experiments = pd.Series(np.asarray(experiments, dtype=object))
+    if regex is not None:
+        if re.compile(regex).groups == 0:
+            regex = f'({regex})'
+        return experiments.str.extract(regex, expand=True)[0]
+    cohort_keys = pd.Series(None, index=experiments.index, dtype=object)
+    # longer prefixes assigned last, so they win over shorter prefixes of the same name
+    for prefix in sorted(prefixes, key=len):
+        cohort_keys[experiments.str.startswith(prefix, na=False)] = prefix
+    return cohort_keys
+
+# build summaries of each cohort (batch mode) from one input table, cohort_keys giving cohort of each input run (missing if none)
+# runs above run_cutoff selected and top ups, recoveries and reconnections labelled once over all runs, then tables of each cohort
+# built from its runs; figures are rendered by write_cohort_summaries
+# returns dictionary of cohort and longread_summary in sorted cohort order, leaving out cohorts without runs above run_cutoff
+# cohort_trend_states is a dictionary of cohort and trend state (as trend_state of build_summary) of each cohort, if any
+# other options as in build_summary
+def build_cohort_summaries(longread_extract_initial, cohort_keys, run_cutoff=1, percentiles=None, iqr=False, profiler=None, histograms=None, mux_scans=None, half_life_cutoff=24, trends=False, trend_window=4, cohort_trend_states=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    check_run_series(longread_extract_initial, histograms, mux_scans)
+    if cohort_trend_states is None:
+        cohort_trend_states = {}
+    with profiler.stage('aggregation'):
+        run_mask, longread_extract = get_summary_runs(longread_extract_initial, run_cutoff)
+        # cohort index of each input run (-1 if in no cohort)
+        cohort_codes, cohorts = pd.factorize(np.asarray(cohort_keys, dtype=object), sort=True)
+        kept_cohort_codes = cohort_codes[run_mask]
+    cohort_summaries = {}
+    for cohort_code, cohort in enumerate(cohorts):
+        cohort_run_mask = kept_cohort_codes == cohort_code
+        if not cohort_run_mask.any():
+            continue
+        cohort_summaries[cohort] = summarise_runs(longread_extract[cohort_run_mask].reset_index(drop=True), run_mask & (cohort_codes == cohort_code), percentiles, iqr, False, profiler=profiler, histograms=histograms, mux_scans=mux_scans, half_life_cutoff=half_life_cutoff, trends=trends, trend_window=trend_window, trend_state=cohort_trend_states.get(cohort))
+    return cohort_summaries
+
+# get output file of one cohort: {cohort} in output_file replaced with cohort name, or _<cohort> added before extension
+# characters other than letters, digits, dots, dashes and underscores in cohort name replaced with underscores
+def get_cohort_output_file(output_file, cohort):
+    cohort_name = re.sub(r'[^A-Za-z0-9._-]', '_', str(cohort))
+    if '{cohort}' in output_file:
+        return output_file.replace('{cohort}', cohort_name)
+    output_root, output_extension = os.path.splitext(output_file)
+    return f'{output_root}_{cohort_name}{output_extension}'
+
+# get plot title of one cohort: {cohort} in plot_title replaced with cohort name, or cohort name added in parentheses
+# (cohort name alone if no plot title)
+def get_cohort_plot_title(plot_title, cohort):
+    if plot_title is None:
+        return str(cohort)
+    if '{cohort}' in plot_title:
+        return plot_title.replace('{cohort}', str(cohort))
+    return f'{plot_title} ({cohort})'
+
+# render figures of one cohort summary and write its workbook (or tables only) from
+# (cohort summary, output file, plot title, tables_only, table_format, plot_cutoff, max_plot_points, figure_cache_dir, figure_cache_size) task
+# module level so it can be sent to worker processes (-cohort_workers)
+def write_cohort_summary_task(task):
+    cohort_summary, output_file, plot_title, tables_only, table_format, plot_cutoff, max_plot_points, figure_cache_dir, figure_cache_size = task
+    if tables_only is False:
+        figure_specs = get_figure_specs(cohort_summary.longread_extract,cohort_summary.flow_cells_and_output_per_experiment,cohort_summary.output_per_flow_cell,plot_title,plot_cutoff,max_plot_points,cohort_summary.pore_decay)
+        cohort_summary = dataclasses.replace(cohort_summary, figures=render_figures(figure_specs,1,figure_cache_dir,figure_cache_size))
+    write_summary(cohort_summary, output_file, tables_only, table_format)
+    return output_file
+
+# write summaries of each cohort from build_cohort_summaries to output files (get_cohort_output_file) with per-cohort plot titles (get_cohort_plot_title)
+# cohorts spread across cohort_workers processes if more than one, each rendering its figures and writing its workbook,
+# so plotting modules are imported once per worker rather than once per cohort
+# returns output files written in cohort order
+def write_cohort_summaries(cohort_summaries, output_file, plot_title=None, tables_only=False, table_format='tsv', plot_cutoff=True, max_plot_points=1000, cohort_workers=1, figure_cache_dir=None, figure_cache_size=default_figure_cache_size, profiler=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    tasks = [(cohort_summary, get_cohort_output_file(output_file, cohort), get_cohort_plot_title(plot_title, cohort), tables_only, table_format, plot_cutoff, max_plot_points, figure_cache_dir, figure_cache_size) for cohort, cohort_summary in cohort_summaries.items()]
+    with profiler.stage('cohorts'):
+        if cohort_workers > 1 and len(tasks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=cohort_workers) as executor:
+                return list(executor.map(write_cohort_summary_task, tasks))
+        return [write_cohort_summary_task(task) for task in tasks]
+
+if __name__ == '__main__':
+    # set up command line argument parser
+    parser = argparse.ArgumentParser(description='This program gets summary statistics from long read sequencing report data.')
+
+    # get input and output arguments
+    parser.add_argument('-input', action="store", dest="input_file", help="Input tab-delimited tsv, Parquet (.parquet) or Feather (.feather/.arrow) file containing features extracted from long read sequencing reports.")
+    # run store input with query filters answered from store indexes
+    parser.add_argument('-store', action="store", default=None, dest="store_file", help="Input SQLite run store (from CARDlongread_extract_from_json.py --store) instead of -input; only runs matching filters below are read (optional)")
+    parser.add_argument('-date_from', action="store", default=None, dest="date_from", help="With -store, only runs on or after this date (YYYY-MM-DD) (optional)")
+    parser.add_argument('-date_to', action="store", default=None, dest="date_to", help="With -store, only runs on or before this date (YYYY-MM-DD) (optional)")
+    parser.add_argument('-experiment_prefix', action="store", default=None, dest="experiment_prefix", help="With -store, only runs of experiments whose names start with this prefix (optional)")
+    parser.add_argument('-minknow_version', action="store", nargs='+', default=None, dest="minknow_versions", help="With -store, only runs with these MinKNOW versions (optional)")
+    parser.add_argument('-flow_cell', action="store", nargs='+', default=None, dest="flow_cell_ids", help="With -store, only runs on these flow cells (optional)")
+    parser.add_argument('-prom_id', action="store", nargs='+', default=None, dest="prom_ids", help="With -store, only runs on these PromethIONs (optional)")
+    parser.add_argument('-output', action="store", dest="output_file", help="Output long read sequencing summary statistics XLSX")
+    # batch mode, one summary per cohort of experiments from one input table
+    parser.add_argument('-cohort_prefixes', action="store", nargs='+', default=None, dest="cohort_prefixes", help="Batch mode: write one summary per cohort of experiments whose names start with each prefix (longest matching prefix wins), named OUTPUT_FILE with _COHORT before extension or {cohort} in OUTPUT_FILE replaced (optional)")
+    parser.add_argument('-cohort_regex', action="store", default=None, dest="cohort_regex", help="Batch mode: cohort of each run is first capture group (or whole match) of this regular expression in experiment name, e.g. '^([A-Za-z]+)_'; runs not matching left out (optional)")
+    parser.add_argument('-cohort_workers', action="store", type=int, default=1, dest="cohort_workers", help="Number of worker processes writing cohort summaries in batch mode (optional, 1 by default)")
+    parser.add_argument('-histograms', action="store", default=None, dest="histograms_file", help="Run read length and q score histograms (INPUT_FILE.histograms.npz from CARDlongread_extract_from_json.py --histograms) for cohort, per experiment and per flow cell N50/N90 and q score worksheets (optional)")
+    parser.add_argument('-mux_scans', action="store", default=None, dest="mux_scans_file", help="Run mux scan series (INPUT_FILE.mux_scans.npz from CARDlongread_extract_from_json.py --mux_scans) for pore decay worksheet and pore decay vs. data output plot (optional)")
+    parser.add_argument('-half_life_cutoff', action="store", type=float, default=24, dest="half_life_cutoff", help="Pore half-life (hours) below which runs are flagged as fast decay with -mux_scans (optional, 24 h default)")
+    # weekly and monthly trends, with per-bucket aggregates saved between summaries
+    parser.add_argument('--trends', action=argparse.BooleanOptionalAction, default=False, dest="trends", help="Add trend worksheet of runs per week and per month of run date, with mean, median and percentiles (as -percentiles, 10th and 90th by default) of run data output, read N50 and starting active pores per week or month and over rolling windows (optional; default false)")
+    parser.add_argument('-trend_window', action="store", type=int, default=4, dest="trend_window", help="Number of weeks or months in rolling windows of trend worksheet (optional, 4 by default)")
+    parser.add_argument('-trend_state', action="store", default=None, dest="trend_state_file", help="Save per-week and per-month aggregates to this NumPy (.npz) file and reuse them in later summaries, so only runs of the last saved week or month and later are aggregated again (all runs if earlier weeks or months changed); sets --trends; in batch mode, named as OUTPUT_FILE for each cohort (optional)")
+    parser.add_argument('-plot_title', action="store", default=None, dest="plot_title", help="Title for each plot in output XLSX; in batch mode, {cohort} replaced with cohort name, or cohort name added in parentheses (optional; cohort name by default in batch mode)")
+    # tables only mode skips figures and writes tab-delimited or JSON tables instead of XLSX
+    parser.add_argument('--tables_only', '--tables-only', action=argparse.BooleanOptionalAction, default=False, dest="tables_only", help="Only write summary tables (no figures) as tab-delimited text or JSON instead of XLSX; plotting modules are never imported (optional; default false)")
+    parser.add_argument('-table_format', action="store", default='tsv', choices=['tsv','json'], dest="table_format", help="Output format of summary tables with --tables_only (optional, tsv by default)")
+    # add boolean --plot_cutoff argument
+    parser.add_argument('--plot_cutoff', action=argparse.BooleanOptionalAction, default=True, dest="plot_cutoff", help="Include cutoff lines in violin plots (optional; default true; --no-plot_cutoff to override)")
+    # include failed run cutoff to exclude as well
+    parser.add_argument('-run_cutoff', action="store", type=float, default=1, dest="run_cutoff", help="Minimum data output per flow cell run to include (optional, 1 Gb default)")
+
+    # parallel figure rendering
+    parser.add_argument('-plot_workers', '--plot_workers', action="store", type=int, default=1, dest="plot_workers", help="Number of worker processes used to render figures (optional, 1 by default)")
+    # large cohort plotting mode
+    parser.add_argument('-max_plot_points', action="store", type=int, default=1000, dest="max_plot_points", help="Point count above which violin plots use strip plots instead of swarm plots and scatterplots are downsampled (optional, 1000 by default; 0 to always plot every point as before)")
+    # on-disk figure cache
+    parser.add_argument('--figure_cache', action=argparse.BooleanOptionalAction, default=True, dest="figure_cache", help="Reuse figures with unchanged inputs from on-disk figure cache (optional; default true; --no-figure_cache to bypass)")
+    parser.add_argument('-figure_cache_dir', action="store", default=default_figure_cache_dir, dest="figure_cache_dir", help="Figure cache directory (optional, ~/.cache/CARDlongread_figures by default)")
+    parser.add_argument('-figure_cache_size', action="store", type=float, default=default_figure_cache_size, dest="figure_cache_size", help="Maximum figure cache size in MB; least recently used figures removed first (optional, 256 by default)")
+    # extra summary statistics
+    parser.add_argument('-percentiles', action="store", nargs='+', type=float, default=None, dest="percentiles", help="Percentiles (0-100) to add to summary statistics table (optional)")
+    parser.add_argument('--iqr', action=argparse.BooleanOptionalAction, default=False, dest="iqr", help="Include interquartile range in summary statistics table (optional; default false)")
+    # profiling
+    parser.add_argument('--profile', action="store", default=None, dest="profile", help="Write stage timings, peak RSS and tracemalloc snapshots per stage to this JSON file (optional)")
+    parser.add_argument('--profile_tracemalloc', action=argparse.BooleanOptionalAction, default=True, dest="profile_tracemalloc", help="Trace Python memory allocations per stage with --profile; slows plotting, so turn off for accurate timings (optional; default true)")
+    parser.add_argument('--cprofile', action="store", nargs='?', const='auto', default=None, dest="cprofile", help="With --profile, also run cProfile on one stage (input, aggregation, statistics, histograms, decay, trends, plotting, workbook, tables or, in batch mode, cohorts; slowest stage if no stage given) and save statistics to PROFILE.prof (optional)")
+
+    # parse arguments
+    results = parser.parse_args()
+    # stage timers and memory snapshots, doing nothing unless --profile set
+    profiler = stage_profiler(results.profile is not None, results.profile_tracemalloc, results.cprofile)
+
+    # throw error if no input file or run store provided
+    if results.input_file is None and results.store_file is None:
+        quit('ERROR: No input file (-input) or run store (-store) provided!')
+    if results.cohort_prefixes is not None and results.cohort_regex is not None:
+        quit('ERROR: Only one of cohort prefixes (-cohort_prefixes) and cohort regular expression (-cohort_regex) can be given!')
+    if results.store_file is not None and (results.histograms_file is not None or results.mux_scans_file is not None):
+        quit('ERROR: Histograms (-histograms) and mux scans (-mux_scans) need input file (-input), not run store (-store)!')
+    if results.trend_window < 1:
+        quit('ERROR: Trend window (-trend_window) must be at least 1!')
+    if results.percentiles is not None and not all(0 <= percentile <= 100 for percentile in results.percentiles):
+        quit('ERROR: Percentiles (-percentiles) must be between 0 and 100!')
+    # saved trend buckets imply trend worksheet
+    if results.trend_state_file is not None:
+        results.trends = True
+
+    # set default output filename
+    if results.output_file is None:
+        if results.tables_only is True:
+            results.output_file='output_summary_statistics.' + results.table_format
+        else:
+            results.output_file='output_summary_statistics.xlsx'
+
+    # read tab delimited output into pandas data frame
+    with profiler.stage('input'):
+        if results.store_file is not None:
+            # runs matching query filters only, selected by store indexes
+            from CARDlongread_run_store import read_run_store
+            try:
+                longread_extract_initial=read_run_store(results.store_file, date_from=results.date_from, date_to=results.date_to, experiment_prefix=results.experiment_prefix, minknow_versions=results.minknow_versions, flow_cell_ids=results.flow_cell_ids, prom_ids=results.prom_ids)
+            except ValueError as e:
+                quit(f'ERROR: {e}')
+            if len(longread_extract_initial) == 0:
+                quit('ERROR: No runs in run store (-store) match filters!')
+        else:
+            longread_extract_initial=read_longread_extract(results.input_file)
+        # run histograms (-histograms), one row per input run
+        if results.histograms_file is not None:
+            from CARDlongread_extract_from_json import read_report_series, report_histograms
+            longread_extract_histograms=read_report_series(results.histograms_file, report_histograms)
+            if len(longread_extract_histograms.read_length_bases) != len(longread_extract_initial):
+                quit(f'ERROR: Histograms file (-histograms) has {len(longread_extract_histograms.read_length_bases)} runs but input file has {len(longread_extract_initial)}!')
+        else:
+            longread_extract_histograms=None
+        # run mux scan series (-mux_scans), one series per input run
+        if results.mux_scans_file is not None:
+            from CARDlongread_extract_from_json import read_report_series, report_mux_scans
+            longread_extract_mux_scans=read_report_series(results.mux_scans_file, report_mux_scans)
+            if len(longread_extract_mux_scans.offsets) - 1 != len(longread_extract_initial):
+                quit(f'ERROR: Mux scans file (-mux_scans) has {len(longread_extract_mux_scans.offsets) - 1} runs but input file has {len(longread_extract_initial)}!')
+        else:
+            longread_extract_mux_scans=None
+
+    # aggregate runs, get summary statistics and render figures (unless --tables_only set)
+    # only show cutoff lines if -plot_cutoff set
+    # switch to large cohort plotting above -max_plot_points (0 turns it off)
+    # reuse cached figures unless --no-figure_cache set
+    if results.figure_cache is True:
+        figure_cache_dir = results.figure_cache_dir
+    else:
+        figure_cache_dir = None
+    if results.cohort_prefixes is not None or results.cohort_regex is not None:
+        # batch mode: input read and runs labelled once, then one summary per cohort written in parallel (-cohort_workers)
+        try:
+            cohort_keys = get_cohort_keys(longread_extract_initial['Experiment Name'], results.cohort_prefixes, results.cohort_regex)
+        except re.error as e:
+            quit(f'ERROR: Invalid cohort regular expression (-cohort_regex): {e}!')
+        # saved trend buckets of each cohort (-trend_state), one state file per cohort
+        cohort_trend_states = {}
+        if results.trend_state_file is not None:
+            with profiler.stage('trends'):
+                for cohort in cohort_keys.dropna().unique():
+                    cohort_trend_states[cohort] = read_trend_state(get_cohort_output_file(results.trend_state_file, cohort))
+        cohort_summaries = build_cohort_summaries(longread_extract_initial,cohort_keys,results.run_cutoff,results.percentiles,results.iqr,profiler,longread_extract_histograms,longread_extract_mux_scans,results.half_life_cutoff,results.trends,results.trend_window,cohort_trend_states)
+        if len(cohort_summaries) == 0:
+            quit('ERROR: No runs above run cutoff in any cohort!')
+        if results.trend_state_file is not None:
+            with profiler.stage('trends'):
+                for cohort, cohort_summary in cohort_summaries.items():
+                    write_trend_state(get_cohort_output_file(results.trend_state_file, cohort), cohort_summary.trend_buckets)
+        write_cohort_summaries(cohort_summaries,results.output_file,results.plot_title,results.tables_only,results.table_format,results.plot_cutoff,results.max_plot_points,results.cohort_workers,figure_cache_dir,results.figure_cache_size,profiler)
+    else:
+        # settled trend buckets (-trend_state) reused, then replaced with buckets of this summary
+        trend_state = None
+        if results.trend_state_file is not None:
+            with profiler.stage('trends'):
+                trend_state = read_trend_state(results.trend_state_file)
+        cohort_summary = build_summary(longread_extract_initial,results.run_cutoff,results.percentiles,results.iqr,results.tables_only is False,results.plot_title,results.plot_cutoff,results.max_plot_points,results.plot_workers,figure_cache_dir,results.figure_cache_size,profiler,longread_extract_histograms,longread_extract_mux_scans,results.half_life_cutoff,results.trends,results.trend_window,trend_state)
+        if results.trend_state_file is not None:
+            with profiler.stage('trends'):
+                write_trend_state(results.trend_state_file, cohort_summary.trend_buckets)
+
+        # output tables (--tables_only) or tables and figures to excel spreadsheet
+        write_summary(cohort_summary,results.output_file,results.tables_only,results.table_format,profiler)
+    # write profile report (--profile)
+    profiler.write(results.profile)
+
+    # script complete
+    quit()
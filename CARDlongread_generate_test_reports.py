@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import json
+import random
+import argparse
+import os
+import gzip
+# process pool for parallel report writing (--workers)
+import concurrent.futures
+
+# synthetic MinKNOW release versions for each report layout
+# 2023 releases keep software_versions at top level, 2024 releases (through 24.02.19) under protocol_run_info
+minknow_versions = {
+    '2023' : ['23.04.5', '23.04.6', '23.07.5', '23.07.12', '23.11.4'],
+    '2024' : ['24.02.10', '24.02.16', '24.02.19']
+}
+# synthetic PromethION serial numbers
+prom_ids = ['PC24B302', 'PC24B149', 'PC48B254']
+# acquisitions before sequencing acquisition (index 3)
+preceding_acquisitions = ['platform_qc', 'pore_scan', 'flow_cell_check']
+# mux scan count categories besides single and reserved pores
+mux_scan_count_names = ['unavailable', 'multiple', 'saturated', 'zero', 'no_pore_found_in_scan', 'unclassified']
+
+# make yield snapshots as in acquisition output plots
+# snapshot count sets report size (MinKNOW reports carry thousands, making multi-megabyte JSON files)
+def make_yield_snapshots(rng, snapshots, total_bases):
+    snapshot_list = []
+    for snapshot in range(1, snapshots + 1):
+        bases = int(total_bases * snapshot / snapshots)
+        snapshot_list.append({'seconds' : str(snapshot * 60), 'yield_summary' : {'read_count' : str(bases // 20000), 'basecalled_pass_read_count' : str(bases // 24000), 'basecalled_pass_bases' : str(int(bases * 0.9)), 'estimated_selected_bases' : str(bases)}})
+    return snapshot_list
+
+# make acquisition with run info and yield snapshots
+def make_acquisition(rng, run_id, purpose, snapshots, total_bases):
+    return {
+        'acquisition_run_info' : {'run_id' : run_id, 'config_summary' : {'purpose' : purpose}, 'yield_summary' : {'read_count' : str(total_bases // 20000), 'estimated_selected_bases' : str(total_bases)}, 'bream_info' : {'mux_scan_results' : []}},
+        'acquisition_output' : [{'type' : 'AllData', 'plot' : [{'snapshots' : make_yield_snapshots(rng, snapshots, total_bases)}]}]
+    }
+
+# make mux scan results every 1.5 hours of a 72 hour run, active pores decaying exponentially from starting count
+def make_mux_scan_results(rng, starting_active_pores):
+    decay_rate = rng.uniform(0.005, 0.04)
+    mux_scan_results = []
+    for scan in range(48):
+        active_pores = int(starting_active_pores * (2.71828 ** (-decay_rate * scan * 1.5)))
+        reserved_pore = rng.randint(0, max(1, active_pores // 50))
+        counts = {'single_pore' : active_pores - reserved_pore, 'reserved_pore' : reserved_pore}
+        for count_name in mux_scan_count_names:
+            counts[count_name] = rng.randint(0, 500)
+        mux_scan_results.append({'mux_scan_timestamp' : str(int(scan * 1.5 * 3600)), 'counts' : counts})
+    return mux_scan_results
+
+# make read length histograms (estimated and basecalled bases, read counts) with n50 in base pairs
+def make_read_length_histograms(rng, n50, buckets):
+    bucket_ranges = [{'start' : str(bucket * 1000), 'end' : str((bucket + 1) * 1000)} for bucket in range(buckets)]
+    return [{'read_length_type' : read_length_type, 'plot' : {'histogram_data' : [{'bucket_ranges' : bucket_ranges, 'bucket_values' : [str(rng.randint(0, 10**9)) for bucket in range(buckets)], 'n50' : str(n50)}]}} for read_length_type in ['basecalled_read_count', 'basecalled_bases', 'estimated_read_count', 'estimated_bases']]
+
+# make q score histograms for passed (index 0) and failed (index 1) reads
+def make_qscore_histograms(rng, buckets):
+    return [{'read_length_type' : 'basecalled_bases', 'histogram_data' : [
+        {'bucket_ranges' : [{'start' : str(bucket * 0.5), 'end' : str((bucket + 1) * 0.5)} for bucket in range(buckets)], 'bucket_values' : [str(rng.randint(0, 10**8)) for bucket in range(buckets)], 'modal_q_score' : round(rng.uniform(15, 23), 1)},
+        {'bucket_ranges' : [{'start' : str(bucket * 0.5), 'end' : str((bucket + 1) * 0.5)} for bucket in range(buckets)], 'bucket_values' : [str(rng.randint(0, 10**7)) for bucket in range(buckets)], 'modal_q_score' : round(rng.uniform(5, 9), 1)}
+    ]}]
+
+# make one synthetic MinKNOW report dictionary
+# same seed and report index always give the same report
+# run is an initial run, top up, recovery or reconnection (same sample and flow cell as previous report)
+def make_synthetic_report(report_index, seed=0, layout='mixed', snapshots=2000, missing_qscore_fraction=0.1, empty_mux_fraction=0.05, topup_fraction=0.1, recovery_fraction=0.02, reconnection_fraction=0.02, cohort='SYNTH'):
+    rng = random.Random(f'{seed}-{report_index}')
+    # experiment for every two reports on average
+    experiment_name = f'{cohort}_{1000 + report_index // 2}'
+    sample_name = experiment_name
+    flow_cell_id = f'PA{rng.choice("KMW")}{10000 + report_index:05d}'
+    run_type = rng.random()
+    if report_index > 0 and run_type < reconnection_fraction:
+        # reconnection reuses sample and flow cell of previous report
+        previous_rng = random.Random(f'{seed}-{report_index - 1}')
+        experiment_name = f'{cohort}_{1000 + (report_index - 1) // 2}'
+        sample_name = experiment_name
+        flow_cell_id = f'PA{previous_rng.choice("KMW")}{10000 + report_index - 1:05d}'
+    elif run_type < reconnection_fraction + topup_fraction:
+        experiment_name = experiment_name + '_topup'
+        sample_name = sample_name + '_topup'
+    elif run_type < reconnection_fraction + topup_fraction + recovery_fraction:
+        experiment_name = experiment_name + '_recovery'
+        sample_name = sample_name + '_recovery'
+    # report layout and matching minknow version and run year
+    if layout == 'mixed':
+        report_layout = rng.choice(['2023', '2024'])
+    else:
+        report_layout = layout
+    start_time = f'{report_layout}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000000Z'
+    # run data output, read n50 and starting active pores
+    total_bases = int(rng.lognormvariate(4.1, 0.35) * 1e9)
+    n50 = rng.randint(15000, 50000)
+    starting_active_pores = rng.randint(2500, 9000)
+    # preceding acquisitions have small outputs
+    acquisitions = [make_acquisition(rng, f'{report_index:08x}{acquisition:02d}', purpose, 1, rng.randint(0, 10**6)) for acquisition, purpose in enumerate(preceding_acquisitions)]
+    sequencing_acquisition = make_acquisition(rng, f'{report_index:08x}03', 'sequencing', snapshots, total_bases)
+    if rng.random() >= empty_mux_fraction:
+        sequencing_acquisition['acquisition_run_info']['bream_info']['mux_scan_results'] = make_mux_scan_results(rng, starting_active_pores)
+    sequencing_acquisition['read_length_histogram'] = make_read_length_histograms(rng, n50, 100)
+    if rng.random() >= missing_qscore_fraction:
+        sequencing_acquisition['qscore_histograms'] = make_qscore_histograms(rng, 60)
+    acquisitions.append(sequencing_acquisition)
+    report = {
+        'protocol_run_info' : {
+            'run_id' : f'{rng.getrandbits(128):032x}',
+            'user_info' : {'protocol_group_id' : experiment_name, 'sample_id' : sample_name},
+            'start_time' : start_time,
+            'flow_cell' : {'flow_cell_id' : flow_cell_id, 'product_code' : 'FLO-PRO114M'}
+        },
+        'host' : {'serial' : rng.choice(prom_ids), 'product_name' : 'PromethION 24'},
+        'acquisitions' : acquisitions
+    }
+    if report_layout == '2023':
+        report['software_versions'] = {'distribution_version' : rng.choice(minknow_versions['2023'])}
+    else:
+        report['protocol_run_info']['software_versions'] = {'distribution_version' : rng.choice(minknow_versions['2024'])}
+    return report
+
+# write one synthetic report from (output file, report index, report settings) task, gzip compressed if file name ends with .gz
+def write_synthetic_report(task):
+    output_file, report_index, report_settings = task
+    report = make_synthetic_report(report_index, **report_settings)
+    if output_file.endswith('.gz'):
+        with gzip.open(output_file, 'wt') as outfile:
+            json.dump(report, outfile)
+    else:
+        with open(output_file, 'w') as outfile:
+            json.dump(report, outfile)
+    return output_file
+
+# write count synthetic reports to output directory, in parallel if workers set
+# returns list of report paths in report order
+def write_synthetic_reports(output_dir, count, workers=1, compress=False, **report_settings):
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = '.json.gz' if compress else '.json'
+    tasks = [(os.path.join(output_dir, f'synthetic_report_{report_index:06d}{suffix}'), report_index, report_settings) for report_index in range(count)]
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(write_synthetic_report, tasks, chunksize=16))
+    else:
+        return [write_synthetic_report(task) for task in tasks]
+
+if __name__ == '__main__':
+    # set up command line argument parser
+    parser = argparse.ArgumentParser(description='This program writes synthetic MinKNOW JSON sequencing reports for testing and benchmarking the long read report parser.')
+
+    parser.add_argument('--output_dir', default='synthetic_reports', type=str, help = 'directory to write synthetic JSON reports to (optional, synthetic_reports by default)')
+    parser.add_argument('--count', default=100, type=int, help = 'number of reports to write (optional, 100 by default)')
+    parser.add_argument('--seed', default=0, type=int, help = 'random seed; same seed always writes the same reports (optional, 0 by default)')
+    parser.add_argument('--layout', default='mixed', choices=['2023','2024','mixed'], help = 'MinKNOW report layout (software_versions location) of reports (optional, mixed by default)')
+    parser.add_argument('--snapshots', default=2000, type=int, help = 'yield snapshots per report, which sets report size (optional, 2000 by default, about 400 KB per report)')
+    parser.add_argument('--missing_qscore_fraction', default=0.1, type=float, help = 'fraction of reports without q score histograms (optional, 0.1 by default)')
+    parser.add_argument('--empty_mux_fraction', default=0.05, type=float, help = 'fraction of reports with empty mux_scan_results (optional, 0.05 by default)')
+    parser.add_argument('--topup_fraction', default=0.1, type=float, help = 'fraction of top up runs (optional, 0.1 by default)')
+    parser.add_argument('--recovery_fraction', default=0.02, type=float, help = 'fraction of recovery runs (optional, 0.02 by default)')
+    parser.add_argument('--reconnection_fraction', default=0.02, type=float, help = 'fraction of reconnections (same sample and flow cell as previous report) (optional, 0.02 by default)')
+    parser.add_argument('--cohort', default='SYNTH', type=str, help = 'prefix of experiment and sample names (optional, SYNTH by default)')
+    parser.add_argument('--compress', action=argparse.BooleanOptionalAction, default=False, help = 'write gzip compressed reports (.json.gz) (optional; default false)')
+    parser.add_argument('--filelist', default=None, type=str, help = 'also write text file listing all report paths, for use with --filelist of CARDlongread_extract_from_json.py (optional)')
+    parser.add_argument('--workers', default=1, type=int, help = 'number of worker processes used to write reports (optional, 1 by default)')
+
+    args = parser.parse_args()
+
+    report_files = write_synthetic_reports(args.output_dir, args.count, args.workers, args.compress, seed=args.seed, layout=args.layout, snapshots=args.snapshots, missing_qscore_fraction=args.missing_qscore_fraction, empty_mux_fraction=args.empty_mux_fraction, topup_fraction=args.topup_fraction, recovery_fraction=args.recovery_fraction, reconnection_fraction=args.reconnection_fraction, cohort=args.cohort)
+
+    # write list of report paths
+    if args.filelist is not None:
+        with open(args.filelist, 'w') as outfile:
+            for report_file in report_files:
+                outfile.write(report_file + '\n')
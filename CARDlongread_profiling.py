@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import json
+import contextlib
+import tracemalloc
+import cProfile
+import pstats
+import io
+import numpy as np
+# peak resident set size, not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# get peak resident set size of this process (or largest finished child process, e.g. parsing workers) in MB (None if unavailable)
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+def get_peak_rss_mb(children=False):
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / 1024 / 1024
+    return peak_rss / 1024
+
+# get latency percentiles (milliseconds) of list of durations in seconds
+def get_latency_percentiles(latencies):
+    if len(latencies) == 0:
+        return {'count' : 0}
+    latencies_ms = np.asarray(latencies) * 1000
+    return {'count' : len(latencies), 'total_s' : float(latencies_ms.sum() / 1000), 'mean_ms' : float(latencies_ms.mean()), 'p50_ms' : float(np.percentile(latencies_ms, 50)), 'p90_ms' : float(np.percentile(latencies_ms, 90)), 'p99_ms' : float(np.percentile(latencies_ms, 99)), 'max_ms' : float(latencies_ms.max())}
+
+# named stage timers, per-file latencies, peak RSS, tracemalloc snapshots and optional cProfile of one stage
+# disabled profiler does nothing, so stages can always be wrapped
+# cprofile_stage is a stage name, or 'auto' to profile every stage and keep the profile of the slowest one
+class stage_profiler:
+    def __init__(self, enabled=False, trace_memory=True, cprofile_stage=None, top_allocations=10, top_functions=25):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.cprofile_stage = cprofile_stage if enabled else None
+        self.top_allocations = top_allocations
+        self.top_functions = top_functions
+        self.stages = {}
+        self.file_latencies = {}
+        self.cprofiles = {}
+        self.start_time = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # time stage and record cpu time, peak RSS and traced memory (current, peak and top allocation sites) at end of stage
+    # repeated stage names add up
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        profiler = None
+        if self.cprofile_stage == name or self.cprofile_stage == 'auto':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            if profiler is not None:
+                profiler.disable()
+                if name in self.cprofiles:
+                    self.cprofiles[name].add(profiler)
+                else:
+                    self.cprofiles[name] = pstats.Stats(profiler)
+            stage_record = self.stages.setdefault(name, {'wall_s' : 0.0, 'cpu_s' : 0.0, 'calls' : 0})
+            stage_record['wall_s'] += wall_time
+            stage_record['cpu_s'] += cpu_time
+            stage_record['calls'] += 1
+            stage_record['peak_rss_mb'] = get_peak_rss_mb()
+            if self.trace_memory:
+                traced_current, traced_peak = tracemalloc.get_traced_memory()
+                stage_record['traced_current_mb'] = traced_current / 1024 / 1024
+                stage_record['traced_peak_mb'] = max(stage_record.get('traced_peak_mb', 0), traced_peak / 1024 / 1024)
+                # top allocation sites still held at end of stage, leaving out profiling itself and module imports
+                snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, module_file) for module_file in [tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>']])
+                stage_record['top_allocations'] = [{'site' : str(statistic.traceback), 'size_mb' : statistic.size / 1024 / 1024, 'count' : statistic.count} for statistic in snapshot.statistics('lineno')[:self.top_allocations]]
+
+    # record latency (seconds) of one file or item under name (e.g., per-file parse time)
+    def add_file_latency(self, name, seconds):
+        if self.enabled:
+            self.file_latencies.setdefault(name, []).append(seconds)
+
+    # get cProfile statistics of profiled stage (slowest stage with 'auto') as (stage name, text of top functions by cumulative time)
+    def get_cprofile_report(self):
+        if len(self.cprofiles) == 0:
+            return None, None
+        if self.cprofile_stage == 'auto' or self.cprofile_stage not in self.cprofiles:
+            profiled_stage = max(self.cprofiles, key=lambda stage_name: self.stages[stage_name]['wall_s'])
+        else:
+            profiled_stage = self.cprofile_stage
+        stats_text = io.StringIO()
+        self.cprofiles[profiled_stage].stream = stats_text
+        self.cprofiles[profiled_stage].sort_stats('cumulative').print_stats(self.top_functions)
+        return profiled_stage, stats_text.getvalue()
+
+    # get profile report as dictionary
+    def get_report(self):
+        report = {
+            'argv' : sys.argv,
+            'python' : sys.version,
+            'total_wall_s' : time.perf_counter() - self.start_time,
+            'peak_rss_mb' : get_peak_rss_mb(),
+            'children_peak_rss_mb' : get_peak_rss_mb(children=True),
+            'stages' : self.stages,
+            'file_latencies' : {name: get_latency_percentiles(latencies) for name, latencies in self.file_latencies.items()}
+        }
+        profiled_stage, stats_text = self.get_cprofile_report()
+        if profiled_stage is not None:
+            report['cprofile'] = {'stage' : profiled_stage, 'top_functions' : stats_text}
+        return report
+
+    # write profile report to JSON file, with full cProfile statistics of profiled stage next to it (PROFILE_FILE.prof) for pstats or snakeviz
+    def write(self, profile_file):
+        if not self.enabled:
+            return
+        report = self.get_report()
+        if 'cprofile' in report:
+            self.cprofiles[report['cprofile']['stage']].dump_stats(f'{profile_file}.prof')
+            report['cprofile']['stats_file'] = f'{profile_file}.prof'
+        with open(profile_file, 'w') as outfile:
+            json.dump(report, outfile, indent=1)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# long read sequencing report JSON files to summary statistics spreadsheet in one process
+# extracted report table passed straight to summary, without writing and re-reading a tab-delimited table
+import argparse
+# report extraction and summary statistics scripts in this directory
+import CARDlongread_extract_from_json as extractor
+import CARDlongread_extract_summary_statistics as summary
+import CARDlongread_run_store as run_store
+# per-stage timing and memory instrumentation (--profile)
+from CARDlongread_profiling import stage_profiler
+
+if __name__ == '__main__':
+    # set up command line argument parser
+    parser = argparse.ArgumentParser(description='This program extracts data from long read JSON reports and writes a summary statistics spreadsheet in one step.')
+
+    # report input, as in CARDlongread_extract_from_json.py
+    parser.add_argument('--json_dir', default=None, type=str, help = 'path to directory containing JSON files, if converting whole directory')
+    parser.add_argument('--filelist', default=None, type=str, help = 'text file containing list of all JSON reports to parse')
+    parser.add_argument('--recursive', action=argparse.BooleanOptionalAction, default=False, help = 'also search subdirectories of JSON_DIR for JSON reports (optional; default false)')
+    parser.add_argument('--include', default='*.json', type=str, help = "file name pattern for JSON reports in JSON_DIR, matched without .gz/.zst suffix (optional, '*.json' by default)")
+    parser.add_argument('--workers', default=1, type=int, help = 'number of worker processes used to parse JSON reports (optional, 1 by default)')
+    parser.add_argument('--parser', default='selective', choices=['selective','full'], help = 'decode only the JSON fields used (selective) or whole JSON reports (full; slower, validates whole file) (optional, selective by default)')
+    parser.add_argument('--extract_output', default=None, type=str, help = 'also write extracted report table to this tab-delimited, Parquet (.parquet) or Feather (.feather/.arrow) file (optional)')
+    parser.add_argument('--store', default=None, type=str, help = 'also add extracted reports to SQLite run store (created if new; reports already in store updated) (optional)')
+    parser.add_argument('--histograms', action=argparse.BooleanOptionalAction, default=False, help = 'also extract read length and q score histograms of each report for cohort, per experiment and per flow cell N50/N90 and q score worksheets, written to EXTRACT_OUTPUT.histograms.npz with --extract_output (optional; default false)')
+    parser.add_argument('--mux_scans', action=argparse.BooleanOptionalAction, default=False, help = 'also extract full mux scan series of each report for pore decay worksheet and plot, written to EXTRACT_OUTPUT.mux_scans.npz with --extract_output (optional; default false)')
+    # summary output, as in CARDlongread_extract_summary_statistics.py
+    parser.add_argument('--output', default=None, type=str, dest="output_file", help = 'output long read sequencing summary statistics XLSX (optional, output_summary_statistics.xlsx by default)')
+    parser.add_argument('--plot_title', default=None, type=str, help = 'title for each plot in output XLSX (optional)')
+    parser.add_argument('--tables_only', '--tables-only', action=argparse.BooleanOptionalAction, default=False, dest="tables_only", help = 'only write summary tables (no figures) as tab-delimited text or JSON instead of XLSX (optional; default false)')
+    parser.add_argument('--table_format', default='tsv', choices=['tsv','json'], help = 'output format of summary tables with --tables_only (optional, tsv by default)')
+    parser.add_argument('--plot_cutoff', action=argparse.BooleanOptionalAction, default=True, help = 'include cutoff lines in violin plots (optional; default true; --no-plot_cutoff to override)')
+    parser.add_argument('--half_life_cutoff', default=24, type=float, help = 'pore half-life (hours) below which runs are flagged as fast decay with --mux_scans (optional, 24 h default)')
+    parser.add_argument('--run_cutoff', default=1, type=float, help = 'minimum data output per flow cell run to include (optional, 1 Gb default)')
+    parser.add_argument('--plot_workers', default=1, type=int, help = 'number of worker processes used to render figures (optional, 1 by default)')
+    parser.add_argument('--max_plot_points', default=1000, type=int, help = 'point count above which violin plots use strip plots instead of swarm plots and scatterplots are downsampled (optional, 1000 by default; 0 to always plot every point)')
+    parser.add_argument('--figure_cache', action=argparse.BooleanOptionalAction, default=True, help = 'reuse figures with unchanged inputs from on-disk figure cache (optional; default true; --no-figure_cache to bypass)')
+    parser.add_argument('--figure_cache_dir', default=summary.default_figure_cache_dir, type=str, help = 'figure cache directory (optional, ~/.cache/CARDlongread_figures by default)')
+    parser.add_argument('--figure_cache_size', default=summary.default_figure_cache_size, type=float, help = 'maximum figure cache size in MB; least recently used figures removed first (optional, 256 by default)')
+    parser.add_argument('--percentiles', nargs='+', default=None, type=float, help = 'percentiles (0-100) to add to summary statistics table (optional)')
+    parser.add_argument('--iqr', action=argparse.BooleanOptionalAction, default=False, help = 'include interquartile range in summary statistics table (optional; default false)')
+    parser.add_argument('--trends', action=argparse.BooleanOptionalAction, default=False, help = 'add trend worksheet of runs per week and per month of run date, with rolling statistics (optional; default false)')
+    parser.add_argument('--trend_window', default=4, type=int, help = 'number of weeks or months in rolling windows of trend worksheet (optional, 4 by default)')
+    parser.add_argument('--trend_state', default=None, type=str, help = 'save per-week and per-month aggregates to this NumPy (.npz) file and reuse settled weeks and months in later summaries; sets --trends (optional)')
+    # profiling
+    parser.add_argument('--profile', default=None, type=str, help = 'write stage timings, per-file parse latency percentiles, peak RSS and tracemalloc snapshots per stage to this JSON file (optional)')
+    parser.add_argument('--profile_tracemalloc', action=argparse.BooleanOptionalAction, default=True, help = 'trace Python memory allocations per stage with --profile; slows parsing and plotting, so turn off for accurate timings (optional; default true)')
+    parser.add_argument('--cprofile', nargs='?', const='auto', default=None, type=str, help = 'with --profile, also run cProfile on one stage (parse, table, aggregation, statistics, histograms, decay, trends, plotting, workbook or tables; slowest stage if no stage given) and save statistics to PROFILE.prof (optional)')
+
+    args = parser.parse_args()
+    # stage timers and memory snapshots, doing nothing unless --profile set
+    profiler = stage_profiler(args.profile is not None, args.profile_tracemalloc, args.cprofile)
+
+    # set default output filename
+    if args.output_file is None:
+        if args.tables_only is True:
+            args.output_file = 'output_summary_statistics.' + args.table_format
+        else:
+            args.output_file = 'output_summary_statistics.xlsx'
+    if args.trend_window < 1:
+        quit('ERROR: Trend window (--trend_window) must be at least 1!')
+    if args.percentiles is not None and not all(0 <= percentile <= 100 for percentile in args.percentiles):
+        quit('ERROR: Percentiles (--percentiles) must be between 0 and 100!')
+    # saved trend buckets imply trend worksheet
+    if args.trend_state is not None:
+        args.trends = True
+    # extracted table format from extension
+    if args.extract_output is not None:
+        extract_format = extractor.get_sequencing_report_format(args.extract_output)
+        if extract_format != 'tsv' and not extractor.pyarrow_available:
+            quit(f'ERROR: pyarrow package required for {extract_format} output (--extract_output)!')
+
+    # get list of files
+    # directory walk is lazy so reports are parsed while the walk continues
+    if args.json_dir is not None:
+        files = extractor.find_json_reports(args.json_dir, args.include, args.recursive)
+    elif args.filelist is not None:
+        files = extractor.read_report_filelist(args.filelist)
+    else:
+        quit('ERROR: No directory (--json_dir) or file list (--filelist) provided!')
+
+    # parse reports into typed data frame
+    # report series (--histograms, --mux_scans) kept in rows matching data frame
+    series = [name for name, requested in [('histograms', args.histograms), ('mux_scans', args.mux_scans)] if requested]
+    # report file column for run store (--store)
+    report_file_column = run_store.report_file_column if args.store is not None else None
+    if len(series) > 0:
+        longread_extract, *longread_extract_series = extractor.extract_reports(files, args.parser, args.workers, profiler=profiler, histograms=args.histograms, mux_scans=args.mux_scans, report_file_column=report_file_column)
+    else:
+        longread_extract = extractor.extract_reports(files, args.parser, args.workers, profiler=profiler, report_file_column=report_file_column)
+        longread_extract_series = []
+    longread_extract_series = dict(zip(series, longread_extract_series))
+    if args.store is not None:
+        with profiler.stage('write'):
+            try:
+                run_store.write_run_store(args.store, longread_extract)
+            except ValueError as e:
+                quit(f'ERROR: {e}')
+        longread_extract = longread_extract.drop(columns=report_file_column)
+    if args.extract_output is not None:
+        with profiler.stage('write'):
+            extractor.write_sequencing_report_df(longread_extract, args.extract_output, extract_format)
+            for name, series_values in longread_extract_series.items():
+                extractor.write_report_series(f'{args.extract_output}.{name}.npz', series_values)
+
+    # summarise data frame from extraction directly
+    if args.figure_cache is True:
+        figure_cache_dir = args.figure_cache_dir
+    else:
+        figure_cache_dir = None
+    # settled trend buckets (--trend_state) reused, then replaced with buckets of this summary
+    trend_state = None
+    if args.trend_state is not None:
+        with profiler.stage('trends'):
+            trend_state = summary.read_trend_state(args.trend_state)
+    cohort_summary = summary.build_summary(longread_extract, args.run_cutoff, args.percentiles, args.iqr, args.tables_only is False, args.plot_title, args.plot_cutoff, args.max_plot_points, args.plot_workers, figure_cache_dir, args.figure_cache_size, profiler, longread_extract_series.get('histograms'), longread_extract_series.get('mux_scans'), args.half_life_cutoff, args.trends, args.trend_window, trend_state)
+    if args.trend_state is not None:
+        with profiler.stage('trends'):
+            summary.write_trend_state(args.trend_state, cohort_summary.trend_buckets)
+    summary.write_summary(cohort_summary, args.output_file, args.tables_only, args.table_format, profiler)
+    # write profile report (--profile)
+    profiler.write(args.profile)
+
+    # end program
+    quit()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# embedded SQLite run store of features extracted from long read sequencing reports
+# one row per report file (primary key), indexed on the columns summaries are usually filtered by,
+# so a subset of runs (date range, experiment prefix, MinKNOW version, ...) is read without parsing and masking a whole table
+import os
+import sqlite3
+import urllib.parse
+import pandas as pd
+# output table columns and types of report extraction script in this directory
+from CARDlongread_extract_from_json import sequencing_report_columns, sequencing_report_column_names, make_sequencing_report_column
+
+# run store table, report file column (absolute report path) and indexed columns
+run_store_table = 'runs'
+report_file_column = 'Report File'
+run_store_indexed_columns = ['Flow Cell ID', 'Experiment Name', 'PROM ID', 'Run Date', 'MinKNOW Version']
+# SQLite column types of output table column types
+# dates stored as YYYY-MM-DD text, which sorts (and compares in date ranges) in date order
+run_store_column_types = {'object' : 'TEXT', 'category' : 'TEXT', 'datetime64[ns]' : 'TEXT', 'Float64' : 'REAL', 'Int64' : 'INTEGER'}
+
+# quote column name as SQL identifier (column names have spaces and parentheses)
+def quote_column(column_name):
+    return '"' + column_name.replace('"', '""') + '"'
+
+# open run store, creating runs table and indexes if new
+# with read_only set, store opened read-only for queries and never created (so a mistyped path is not left as an empty store)
+# raises ValueError if read-only store missing or not a run store, or if store was made for different output table columns
+def open_run_store(store_file, read_only=False):
+    if read_only:
+        if not os.path.isfile(store_file):
+            raise ValueError(f'{store_file}: run store not found')
+        connection = sqlite3.connect('file:' + urllib.parse.quote(os.path.abspath(store_file)) + '?mode=ro', uri=True)
+    else:
+        connection = sqlite3.connect(store_file)
+    try:
+        if not read_only:
+            column_definitions = [f'{quote_column(report_file_column)} TEXT PRIMARY KEY'] + [f'{quote_column(name)} {run_store_column_types[column_type]}' for name, column_type in sequencing_report_columns.items()]
+            with connection:
+                connection.execute(f'CREATE TABLE IF NOT EXISTS {run_store_table} ({", ".join(column_definitions)})')
+                for column_name in run_store_indexed_columns:
+                    index_name = 'runs_' + ''.join(character if character.isalnum() else '_' for character in column_name.lower())
+                    connection.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {run_store_table} ({quote_column(column_name)})')
+        store_columns = [row[1] for row in connection.execute(f'PRAGMA table_info({run_store_table})')]
+    except sqlite3.DatabaseError as e:
+        connection.close()
+        raise ValueError(f'{store_file}: not a run store ({e})')
+    if len(store_columns) == 0:
+        connection.close()
+        raise ValueError(f'{store_file}: not a run store (no {run_store_table} table)')
+    if store_columns != [report_file_column] + sequencing_report_column_names:
+        connection.close()
+        raise ValueError(f'{store_file}: run store columns do not match output table columns')
+    return connection
+
+# add or update runs in run store from data frame of extract_reports(..., report_file_column=report_file_column)
+# runs already in store (same report file) are updated in place, keeping their position in store order
+def write_run_store(store_file, sequencing_report_df):
+    store_df = sequencing_report_df[[report_file_column] + sequencing_report_column_names].copy()
+    for name, column_type in sequencing_report_columns.items():
+        if column_type.startswith('datetime64'):
+            store_df[name] = store_df[name].dt.strftime('%Y-%m-%d')
+    # missing values (NaN, NA, NaT) stored as NULL
+    store_df = store_df.astype(object).where(store_df.notna(), None)
+    column_names = [report_file_column] + sequencing_report_column_names
+    update_columns = ', '.join(f'{quote_column(name)} = excluded.{quote_column(name)}' for name in sequencing_report_column_names)
+    connection = open_run_store(store_file)
+    try:
+        with connection:
+            connection.executemany(f'INSERT INTO {run_store_table} ({", ".join(quote_column(name) for name in column_names)}) VALUES ({", ".join("?" for name in column_names)}) ON CONFLICT({quote_column(report_file_column)}) DO UPDATE SET {update_columns}', store_df.itertuples(index=False, name=None))
+    finally:
+        connection.close()
+
+# make SQL query of runs matching filters, all optional and combined with AND
+# date_from and date_to are YYYY-MM-DD (inclusive), experiment_prefix matches start of experiment names,
+# minknow_versions, flow_cell_ids and prom_ids are lists of allowed values
+# prefix and ranges are written as comparisons so SQLite answers them from the column indexes
+# returns (query, parameters)
+def get_run_store_query(date_from=None, date_to=None, experiment_prefix=None, minknow_versions=None, flow_cell_ids=None, prom_ids=None):
+    conditions = []
+    parameters = []
+    if date_from is not None:
+        conditions.append(f'{quote_column("Run Date")} >= ?')
+        parameters.append(date_from)
+    if date_to is not None:
+        conditions.append(f'{quote_column("Run Date")} <= ?')
+        parameters.append(date_to)
+    if experiment_prefix is not None and len(experiment_prefix) > 0:
+        # names starting with prefix sort between prefix and prefix with last character incremented
+        conditions.append(f'{quote_column("Experiment Name")} >= ? AND {quote_column("Experiment Name")} < ?')
+        parameters.extend([experiment_prefix, experiment_prefix[:-1] + chr(ord(experiment_prefix[-1]) + 1)])
+    for column_name, values in [('MinKNOW Version', minknow_versions), ('Flow Cell ID', flow_cell_ids), ('PROM ID', prom_ids)]:
+        if values is not None:
+            conditions.append(f'{quote_column(column_name)} IN ({", ".join("?" for value in values)})')
+            parameters.extend(values)
+    query = f'SELECT {", ".join(quote_column(name) for name in sequencing_report_column_names)} FROM {run_store_table}'
+    if len(conditions) > 0:
+        query = query + ' WHERE ' + ' AND '.join(conditions)
+    # store order (order runs were first added), as in output table
+    return query + ' ORDER BY rowid', parameters
+
+# read runs matching filters (see get_run_store_query) from run store as data frame with output table column types
+# store opened read-only, ValueError if missing
+def read_run_store(store_file, **filters):
+    query, parameters = get_run_store_query(**filters)
+    connection = open_run_store(store_file, read_only=True)
+    try:
+        rows = connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+    if len(rows) > 0:
+        store_columns = zip(*rows)
+    else:
+        store_columns = [[] for name in sequencing_report_column_names]
+    return pd.DataFrame({name : make_sequencing_report_column(column, sequencing_report_columns[name]) for name, column in zip(sequencing_report_column_names, store_columns)})
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# watch mode of report extraction (--watch of CARDlongread_extract_from_json.py)
+# polls a report tree for new JSON reports as runs finish, parses only new reports, appends their rows to the output table
+# and rebuilds the summary spreadsheet at most every few minutes
+import os
+import time
+import pandas as pd
+# report extraction script in this directory
+from CARDlongread_extract_from_json import extract_reports, match_report_name, sequencing_report_columns, report_series, write_sequencing_report_df, write_report_series
+from CARDlongread_run_store import write_run_store, report_file_column
+from CARDlongread_profiling import stage_profiler
+
+# cheap repeated scans of a report tree for new, completely written reports
+# each poll stats every directory once, and lists only directories whose mtime changed (a report was added, removed or renamed there)
+# or changed recently (mtime granularity of some file systems is coarse), so unchanged parts of the tree cost one stat per directory
+# reports are returned once settled: unchanged size and mtime since the previous poll and last modified at least settle_time seconds ago,
+# so partially written reports are picked up after writing stops
+# reports changed or removed after being returned are not returned again, except reports that could not be parsed (see forget)
+class report_tree_watcher:
+    def __init__(self, json_dir, include='*.json', recursive=False, settle_time=60):
+        self.json_dir = json_dir
+        self.include = include
+        self.recursive = recursive
+        self.settle_time_ns = int(settle_time * 1e9)
+        # directory path -> (mtime, subdirectories, report paths) of last listing
+        self.directories = {}
+        # report path -> (size, mtime) when last seen, for reports not yet settled
+        self.pending_reports = {}
+        # report paths already returned
+        self.returned_reports = set()
+        # report path -> (size, mtime) of reports returned but not parsed, returned again once changed
+        self.failed_reports = {}
+
+    # list directory into sorted subdirectories and report paths (matching include)
+    def list_directory(self, directory):
+        subdirectories = []
+        report_files = []
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        subdirectories.append(entry.path)
+                elif match_report_name(entry.name, self.include):
+                    report_files.append(entry.path)
+        return subdirectories, report_files
+
+    # scan tree once and return settled reports not returned before, in directory walk order (as find_json_reports)
+    def scan(self):
+        scan_time_ns = time.time_ns()
+        visited_directories = set()
+        candidate_reports = []
+        directories = [self.json_dir]
+        while len(directories) > 0:
+            directory = directories.pop()
+            visited_directories.add(directory)
+            try:
+                directory_mtime = os.stat(directory).st_mtime_ns
+                listing = self.directories.get(directory)
+                if listing is None or listing[0] != directory_mtime or scan_time_ns - directory_mtime < self.settle_time_ns:
+                    listing = (directory_mtime,) + self.list_directory(directory)
+                    self.directories[directory] = listing
+            except OSError as e:
+                print(e)
+                continue
+            directory_mtime, subdirectories, report_files = listing
+            for report_file in report_files:
+                if report_file not in self.returned_reports or report_file in self.failed_reports:
+                    candidate_reports.append(report_file)
+            # visit subdirectories depth first in sorted order
+            directories.extend(reversed(subdirectories))
+        # forget listings of removed directories
+        for directory in list(self.directories):
+            if directory not in visited_directories:
+                del self.directories[directory]
+        # stat only reports not yet returned (or failed), so settled reports cost nothing
+        settled_reports = []
+        for report_file in candidate_reports:
+            try:
+                report_stat = os.stat(report_file)
+            except OSError:
+                self.pending_reports.pop(report_file, None)
+                continue
+            current_stat = (report_stat.st_size, report_stat.st_mtime_ns)
+            if report_file in self.failed_reports:
+                if self.failed_reports[report_file] == current_stat:
+                    continue
+                del self.failed_reports[report_file]
+                self.returned_reports.discard(report_file)
+            previous_stat = self.pending_reports.get(report_file)
+            if scan_time_ns - report_stat.st_mtime_ns >= self.settle_time_ns and (previous_stat is None or previous_stat == current_stat):
+                self.pending_reports.pop(report_file, None)
+                self.returned_reports.add(report_file)
+                settled_reports.append(report_file)
+            else:
+                self.pending_reports[report_file] = current_stat
+        return settled_reports
+
+    # mark returned reports that could not be parsed, so they are returned again once their size or mtime changes
+    def forget(self, report_files):
+        for report_file in report_files:
+            try:
+                report_stat = os.stat(report_file)
+            except OSError:
+                self.returned_reports.discard(report_file)
+                continue
+            self.failed_reports[report_file] = (report_stat.st_size, report_stat.st_mtime_ns)
+
+# watch json_dir for new reports, parse them and add their rows to output table (output_file) and/or run store (store_file)
+# first poll extracts all settled reports already in tree (reusing manifest_file rows with incremental set), later polls only new ones
+# tab-delimited output tables are appended to, Parquet and Feather output tables and report series (histograms, mux_scans) rewritten
+# with summary_output set, summary spreadsheet is rebuilt from all rows after new reports are added, at most every summary_interval minutes
+# (and once more after the last poll if reports were added since the last rebuild)
+# rebuild waits until a run is above run_cutoff, and a failed rebuild is logged and tried again after summary_interval minutes
+# figures reused from figure cache (figure_cache_dir, default figure cache directory if None) unless figure_cache is False
+# polls every poll_interval seconds, until max_polls polls if set (otherwise until interrupted)
+def watch_reports(json_dir, output_file=None, output_format='tsv', store_file=None, include='*.json', recursive=False, parser='selective', workers=1, incremental=False, manifest_file=None, histograms=False, mux_scans=False, poll_interval=60, settle_time=60, summary_output=None, summary_interval=30, plot_title=None, max_polls=None, profiler=None, run_cutoff=1, figure_cache=True, figure_cache_dir=None):
+    if profiler is None:
+        profiler = stage_profiler()
+    watcher = report_tree_watcher(json_dir, include, recursive, settle_time)
+    series = [name for name, requested in [('histograms', histograms), ('mux_scans', mux_scans)] if requested]
+    # all rows and series so far, for rewritten outputs and summary
+    sequencing_report_df = None
+    sequencing_report_series = {}
+    summary_pending = False
+    summary_time = None
+    # summary can be built once a run is above run cutoff
+    def summary_runs_found():
+        return bool((sequencing_report_df['Data output (Gb)'] > run_cutoff).any())
+    # rebuild summary spreadsheet from all rows so far, returning whether it was written
+    # errors are logged rather than raised so one failed rebuild does not stop watching
+    def write_watch_summary():
+        import CARDlongread_extract_summary_statistics as summary
+        if figure_cache is True:
+            summary_figure_cache_dir = figure_cache_dir if figure_cache_dir is not None else summary.default_figure_cache_dir
+        else:
+            summary_figure_cache_dir = None
+        try:
+            cohort_summary = summary.build_summary(sequencing_report_df, run_cutoff, plot_title=plot_title, figure_cache_dir=summary_figure_cache_dir, profiler=profiler, histograms=sequencing_report_series.get('histograms'), mux_scans=sequencing_report_series.get('mux_scans'))
+            summary.write_summary(cohort_summary, summary_output, profiler=profiler)
+        except Exception as e:
+            print(f'{time.strftime("%Y-%m-%d %H:%M:%S")}: could not write summary {summary_output}: {e!r}')
+            return False
+        print(f'{time.strftime("%Y-%m-%d %H:%M:%S")}: wrote summary {summary_output} ({len(sequencing_report_df)} reports)')
+        return True
+    poll = 0
+    while max_polls is None or poll < max_polls:
+        poll_start = time.monotonic()
+        with profiler.stage('scan'):
+            new_reports = watcher.scan()
+        if len(new_reports) > 0 or sequencing_report_df is None:
+            # parse new reports (all settled reports on first poll), keeping manifest entries of earlier polls
+            if len(series) > 0:
+                new_report_df, *new_report_series = extract_reports(new_reports, parser, workers, incremental, manifest_file, profiler, histograms=histograms, mux_scans=mux_scans, report_file_column=report_file_column, keep_manifest_reports=sequencing_report_df is not None)
+            else:
+                new_report_df = extract_reports(new_reports, parser, workers, incremental, manifest_file, profiler, report_file_column=report_file_column, keep_manifest_reports=sequencing_report_df is not None)
+                new_report_series = []
+            # reports that could not be parsed are tried again once they change
+            parsed_reports = set(new_report_df[report_file_column])
+            watcher.forget([report_file for report_file in new_reports if os.path.abspath(report_file) not in parsed_reports])
+            with profiler.stage('write'):
+                if store_file is not None:
+                    write_run_store(store_file, new_report_df)
+                new_report_df = new_report_df.drop(columns=report_file_column)
+                if sequencing_report_df is None or len(sequencing_report_df) == 0:
+                    sequencing_report_df = new_report_df
+                    sequencing_report_series = dict(zip(series, new_report_series))
+                else:
+                    # categories of categorical columns differ between batches, so restore column types after concatenating
+                    sequencing_report_df = pd.concat([sequencing_report_df, new_report_df], ignore_index=True).astype(sequencing_report_columns)
+                    sequencing_report_series = {name : report_series[name]['concat']([sequencing_report_series[name], series_values]) for name, series_values in zip(series, new_report_series)}
+                if output_file is not None:
+                    if output_format == 'tsv' and poll > 0:
+                        new_report_df.to_csv(output_file, sep='\t', index=False, na_rep='NA', mode='a', header=False)
+                    else:
+                        write_sequencing_report_df(sequencing_report_df, output_file, output_format)
+                    for name, series_values in sequencing_report_series.items():
+                        write_report_series(f'{output_file}.{name}.npz', series_values)
+            print(f'{time.strftime("%Y-%m-%d %H:%M:%S")}: added {len(new_report_df)} of {len(new_reports)} new reports ({len(sequencing_report_df)} in total)')
+            if len(new_report_df) > 0:
+                summary_pending = True
+        # rebuild summary from all rows, at most every summary_interval minutes, kept pending until written
+        if summary_output is not None and summary_pending and (summary_time is None or time.monotonic() - summary_time >= summary_interval * 60) and summary_runs_found():
+            summary_time = time.monotonic()
+            summary_pending = not write_watch_summary()
+        poll += 1
+        if max_polls is None or poll < max_polls:
+            time.sleep(max(0, poll_interval - (time.monotonic() - poll_start)))
+    if summary_output is not None and summary_pending:
+        if summary_runs_found():
+            write_watch_summary()
+        else:
+            print(f'{time.strftime("%Y-%m-%d %H:%M:%S")}: no runs above {run_cutoff} Gb, summary {summary_output} not written')
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# scripts live at repository top level
+repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_dir)
+
+import CARDlongread_generate_test_reports as generator
+
+# small synthetic reports shared by tests (60 reports, both MinKNOW layouts)
+@pytest.fixture(scope='session')
+def synthetic_report_dir(tmp_path_factory):
+    report_dir = tmp_path_factory.mktemp('synthetic_reports')
+    generator.write_synthetic_reports(str(report_dir), 60, seed=1, snapshots=50)
+    return report_dir
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import CARDlongread_extract_from_json as extractor
+import CARDlongread_extract_summary_statistics as summary
+from conftest import repository_dir
+
+# baseline per-unique-value loops, as before aggregation was vectorized (cells set with .at instead of chained assignment)
+def baseline_flow_cells_and_output_per_experiment(experiments, flow_cell_IDs, output):
+    experiments = experiments.str.replace(r'_topup', '', regex=True)
+    experiments = experiments.str.replace(r'_recovery', '', regex=True)
+    experiments = experiments.str.replace(r'-', '_', regex=True)
+    flow_cells_and_output_to_experiments = pd.concat([experiments, flow_cell_IDs, output], axis=1, join='inner')
+    unique_experiments = np.unique(experiments)
+    flow_cells_and_output_per_experiment_df = pd.DataFrame({'Experiment Name' : unique_experiments}, index=unique_experiments, columns=['Experiment Name','Flow Cells','Total output (Gb)'])
+    for i in unique_experiments:
+        unique_flow_cells_per_experiment = pd.unique(flow_cells_and_output_to_experiments[flow_cells_and_output_to_experiments['Experiment Name'] == i]['Flow Cell ID'])
+        total_output_per_experiment = sum(flow_cells_and_output_to_experiments[flow_cells_and_output_to_experiments['Experiment Name'] == i]['Data output (Gb)'])
+        flow_cells_and_output_per_experiment_df.at[i, 'Flow Cells'] = len(unique_flow_cells_per_experiment)
+        flow_cells_and_output_per_experiment_df.at[i, 'Total output (Gb)'] = total_output_per_experiment
+    flow_cells_and_output_per_experiment_df['Flow Cells'] = pd.to_numeric(flow_cells_and_output_per_experiment_df['Flow Cells'])
+    flow_cells_and_output_per_experiment_df['Total output (Gb)'] = pd.to_numeric(flow_cells_and_output_per_experiment_df['Total output (Gb)'])
+    return flow_cells_and_output_per_experiment_df
+
+def baseline_output_per_flow_cell(flow_cell_IDs, output, topup):
+    flow_cells_to_output = pd.concat([flow_cell_IDs, output, topup], axis=1, join='inner')
+    unique_flow_cells = np.unique(flow_cell_IDs.astype(str))
+    output_per_flow_cell_df = pd.DataFrame({'Flow Cell ID' : unique_flow_cells}, index=unique_flow_cells, columns=['Flow Cell ID','Flow cell output (Gb)','Top up'])
+    # array of unique top up labels per flow cell, in object array so single labels stay arrays
+    unique_topups = np.empty(len(unique_flow_cells), dtype=object)
+    for idx, i in enumerate(unique_flow_cells):
+        unique_topups[idx] = pd.unique(flow_cells_to_output[flow_cells_to_output['Flow Cell ID'] == i]['Top up'])
+        total_output_per_flow_cell = sum(flow_cells_to_output[flow_cells_to_output['Flow Cell ID'] == i]['Data output (Gb)'])
+        output_per_flow_cell_df.at[i, 'Flow cell output (Gb)'] = total_output_per_flow_cell
+    output_per_flow_cell_df['Top up'] = unique_topups
+    output_per_flow_cell_df['Flow cell output (Gb)'] = pd.to_numeric(output_per_flow_cell_df['Flow cell output (Gb)'])
+    return output_per_flow_cell_df
+
+def baseline_minknow_version_dist(column):
+    unique_minknow_versions = np.unique(column)
+    minknow_version_dist_df = pd.DataFrame({'MinKNOW Version' : unique_minknow_versions}, index=unique_minknow_versions, columns=['MinKNOW Version', 'Frequency'])
+    for i in unique_minknow_versions:
+        minknow_version_dist_df.at[i, 'Frequency'] = list(column).count(i)
+    return minknow_version_dist_df
+
+# compare tables cell by cell (exact floats), with top up label arrays compared as lists
+def assert_tables_equal(table, baseline_table):
+    assert list(table.columns) == list(baseline_table.columns)
+    assert list(table.index) == list(baseline_table.index)
+    for column in table.columns:
+        for value, baseline_value in zip(table[column], baseline_table[column]):
+            if isinstance(baseline_value, np.ndarray):
+                assert list(value) == list(baseline_value)
+            else:
+                assert value == baseline_value
+
+# example output table in repository and output table of synthetic reports (more flow cells, top ups and recoveries)
+@pytest.fixture(params=['example', 'synthetic'])
+def longread_extract(request, synthetic_report_dir):
+    if request.param == 'example':
+        longread_extract_initial = summary.read_longread_extract(os.path.join(repository_dir, 'example_output.tsv'))
+    else:
+        longread_extract_initial = extractor.extract_reports(sorted(str(report_file) for report_file in synthetic_report_dir.iterdir()))
+    run_mask, longread_extract = summary.get_summary_runs(longread_extract_initial)
+    return longread_extract
+
+def test_flow_cells_and_output_per_experiment(longread_extract):
+    assert_tables_equal(summary.get_flow_cells_and_output_per_experiment(longread_extract['Experiment Name'], longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)']), baseline_flow_cells_and_output_per_experiment(longread_extract['Experiment Name'], longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)']))
+
+def test_output_per_flow_cell(longread_extract):
+    assert_tables_equal(summary.get_output_per_flow_cell(longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'], longread_extract['Top up']), baseline_output_per_flow_cell(longread_extract['Flow Cell ID'], longread_extract['Data output (Gb)'], longread_extract['Top up']))
+
+def test_minknow_version_dist(longread_extract):
+    assert_tables_equal(summary.get_minknow_version_dist(longread_extract['MinKNOW Version']), baseline_minknow_version_dist(longread_extract['MinKNOW Version']))
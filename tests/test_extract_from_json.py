@@ -0,0 +1,65 @@
+import json
+import gzip
+import pandas as pd
+import CARDlongread_extract_from_json as extractor
+
+# baseline conversions of data output and N50 (report values are strings)
+def baseline_data_output(bases):
+    return round(pd.to_numeric(bases)/1e9, 3)
+
+def baseline_n50(n50):
+    return round(pd.to_numeric(n50)/1e3, 2)
+
+def test_n50_rounding_matches_baseline():
+    # numpy rounds half to even on scaled value, Python round on exact binary value
+    for n50 in ['36405', '24755', '12345', '5', '99995']:
+        assert extractor.common_report_fields['n50']['convert'](n50) == baseline_n50(n50)
+    for bases in ['104123456789', '1000500000', '123']:
+        assert extractor.common_report_fields['data_output']['convert'](bases) == baseline_data_output(bases)
+
+def test_extracted_values_match_baseline(synthetic_report_dir):
+    report_files = sorted(str(report_file) for report_file in synthetic_report_dir.iterdir())
+    longread_extract = extractor.extract_reports(report_files)
+    assert len(longread_extract) == len(report_files)
+    for row, report_file in zip(longread_extract.itertuples(index=False), report_files):
+        with open(report_file) as infile:
+            report = json.load(infile)
+        acquisition = report['acquisitions'][3]
+        assert row[extractor.sequencing_report_column_names.index('Data output (Gb)')] == baseline_data_output(acquisition['acquisition_run_info']['yield_summary']['estimated_selected_bases'])
+        assert row[extractor.sequencing_report_column_names.index('N50 (kb)')] == baseline_n50(acquisition['read_length_histogram'][3]['plot']['histogram_data'][0]['n50'])
+
+# report over selective_json_min_size whose skipped array has an escaped quote split across the first chunk boundary
+# (backslash last byte of first 4096-byte chunk, quote first byte of next chunk, no backslash after)
+def make_split_escape_report():
+    prefix = b'{"skipped": '
+    skipped = b'["' + b'a' * 4093 + b'\\"] {still in string"' + b', "' + b'c' * extractor.selective_json_min_size + b'"]'
+    assert skipped[4095:4097] == b'\\"'
+    return prefix + skipped + b', "kept": {"value": 1}}', len(prefix)
+
+def test_skip_json_container_escaped_quote_across_chunks():
+    report_bytes, skipped_start = make_split_escape_report()
+    assert extractor.skip_json_container(report_bytes, skipped_start) == report_bytes.index(b', "kept"')
+
+def test_selective_parser_escaped_quote_across_chunks():
+    report_bytes, skipped_start = make_split_escape_report()
+    selection = extractor.make_report_json_selection([('kept', 'value')])
+    assert extractor.load_selected_json(report_bytes, selection) == {'kept' : json.loads(report_bytes)['kept']}
+
+# truncated compressed reports are reported per file and the other reports still extracted
+def test_truncated_compressed_reports(synthetic_report_dir, tmp_path):
+    report_files = sorted(str(report_file) for report_file in synthetic_report_dir.iterdir())[:3]
+    report_bytes = extractor.read_report_file(report_files[0])
+    truncated_reports = [str(tmp_path / 'truncated.json.gz')]
+    with gzip.open(truncated_reports[0], 'wb') as outfile:
+        outfile.write(report_bytes)
+    with open(truncated_reports[0], 'r+b') as outfile:
+        outfile.truncate(300)
+    if extractor.zstandard is not None:
+        truncated_reports.append(str(tmp_path / 'truncated.json.zst'))
+        with open(truncated_reports[1], 'wb') as outfile:
+            outfile.write(extractor.zstandard.ZstdCompressor().compress(report_bytes)[:300])
+    errors = []
+    longread_extract = extractor.extract_reports(report_files + truncated_reports, error_callback=errors.append)
+    assert len(longread_extract) == len(report_files)
+    assert len(errors) == len(truncated_reports)
+    assert all(truncated_report in error for truncated_report, error in zip(truncated_reports, errors))
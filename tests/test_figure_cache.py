@@ -0,0 +1,27 @@
+import os
+import CARDlongread_extract_summary_statistics as summary
+
+# write cached figures of 1 MB, oldest first
+def write_cache_figures(cache_dir, names):
+    for age, name in enumerate(reversed(names)):
+        figure_file = cache_dir / f'{name}.png'
+        figure_file.write_bytes(b'0' * 1024 * 1024)
+        os.utime(figure_file, ns=(10**18 - age * 10**9, 10**18 - age * 10**9))
+
+# least recently used figures removed until cache fits
+def test_evict_figure_cache(tmp_path):
+    write_cache_figures(tmp_path, ['oldest', 'older', 'newest'])
+    summary.evict_figure_cache(str(tmp_path), 2)
+    assert sorted(figure_file.name for figure_file in tmp_path.iterdir()) == ['newest.png', 'older.png']
+
+# figure removed by another process sharing the cache after the cache directory is listed is skipped
+def test_evict_figure_cache_removed_figure(tmp_path, monkeypatch):
+    write_cache_figures(tmp_path, ['oldest', 'older', 'removed', 'newest'])
+    scandir = os.scandir
+    def scandir_then_remove(path):
+        cache_entries = list(scandir(path))
+        os.remove(tmp_path / 'removed.png')
+        return iter(cache_entries)
+    monkeypatch.setattr(summary.os, 'scandir', scandir_then_remove)
+    summary.evict_figure_cache(str(tmp_path), 2)
+    assert sorted(figure_file.name for figure_file in tmp_path.iterdir()) == ['newest.png', 'older.png']
@@ -0,0 +1,18 @@
+import pytest
+import CARDlongread_extract_from_json as extractor
+import CARDlongread_run_store as run_store
+
+# runs written to store read back with output table columns and types
+def test_run_store_round_trip(tmp_path, synthetic_report_dir):
+    longread_extract = extractor.extract_reports(sorted(str(report_file) for report_file in synthetic_report_dir.iterdir()), report_file_column=run_store.report_file_column)
+    store_file = tmp_path / 'runs.db'
+    run_store.write_run_store(str(store_file), longread_extract)
+    store_extract = run_store.read_run_store(str(store_file))
+    assert store_extract.equals(longread_extract[extractor.sequencing_report_column_names])
+
+# reading a missing store fails instead of creating an empty store at that path
+def test_read_missing_run_store(tmp_path):
+    store_file = tmp_path / 'mistyped.db'
+    with pytest.raises(ValueError, match='run store not found'):
+        run_store.read_run_store(str(store_file))
+    assert not store_file.exists()
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+import CARDlongread_extract_summary_statistics as summary
+
+# 0th and 100th percentiles are the minimum and maximum of each column
+def test_percentile_range_ends():
+    columns = [pd.Series([3.0, 1.0, 2.0]), pd.Series([10.0, 40.0])]
+    summary_statistics_df = summary.get_batched_summary_statistics(columns, ['first', 'second'], [0, 100])
+    assert np.array_equal(summary_statistics_df['0th percentile'], summary_statistics_df['Min'])
+    assert np.array_equal(summary_statistics_df['100th percentile'], summary_statistics_df['Max'])
+
+# percentiles outside 0-100 raise ValueError naming them instead of indexing past the sorted columns
+@pytest.mark.parametrize('percentiles', [[150], [-1, 50]])
+def test_percentile_out_of_range(percentiles):
+    with pytest.raises(ValueError, match='between 0 and 100'):
+        summary.get_batched_summary_statistics([pd.Series([1.0, 2.0, 3.0])], ['values'], percentiles)
+
+# percentile columns named with ordinals
+def test_percentile_column_names():
+    summary_statistics_df = summary.get_batched_summary_statistics([pd.Series([1.0, 2.0, 3.0])], ['values'], [1, 2, 3, 11, 12, 13, 22, 33, 2.5, 100])
+    assert [column for column in summary_statistics_df.columns if column.endswith('percentile')] == ['1st percentile', '2nd percentile', '3rd percentile', '11th percentile', '12th percentile', '13th percentile', '22nd percentile', '33rd percentile', '2.5th percentile', '100th percentile']
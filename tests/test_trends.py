@@ -0,0 +1,68 @@
+import os
+import dataclasses
+import numpy as np
+import pandas as pd
+import pytest
+import CARDlongread_extract_summary_statistics as summary
+from conftest import repository_dir
+
+def assert_buckets_equal(buckets, expected_buckets):
+    for field in dataclasses.fields(summary.trend_buckets):
+        if field.name == 'sums':
+            np.testing.assert_allclose(buckets.sums, expected_buckets.sums)
+        else:
+            np.testing.assert_array_equal(getattr(buckets, field.name), getattr(expected_buckets, field.name))
+
+# runs of example output table, with run dates as text (tab-delimited input) or dates (Parquet, Feather or run store input)
+@pytest.fixture(params=['text', 'dates'])
+def longread_extract(request):
+    run_mask, longread_extract = summary.get_summary_runs(summary.read_longread_extract(os.path.join(repository_dir, 'example_output.tsv')))
+    if request.param == 'dates':
+        longread_extract['Run Date'] = pd.to_datetime(longread_extract['Run Date'])
+    return longread_extract
+
+# trend means and quantiles match pandas on runs of each week (quantiles within half a bin)
+def test_trend_table_matches_runs(longread_extract):
+    trend_df = summary.get_trend_table(summary.get_trend_buckets(longread_extract, 'Week'), 'Week', 4, (10, 90)).set_index('Week start')
+    week_starts = pd.to_datetime(longread_extract['Run Date']).dt.to_period('W-SUN').dt.start_time.dt.strftime('%Y-%m-%d')
+    assert trend_df['Runs'].sum() == len(longread_extract)
+    for column, metric in summary.trend_metrics.items():
+        half_bin = (metric['bin_edges'][1] - metric['bin_edges'][0]) / 2
+        week_statistics = longread_extract.groupby(week_starts)[column].agg(['mean', 'median', lambda values: values.quantile(0.9)])
+        np.testing.assert_allclose(trend_df.loc[week_statistics.index, f'{metric["name"]} mean'], week_statistics['mean'])
+        assert np.all(np.abs(trend_df.loc[week_statistics.index, f'{metric["name"]} median'] - week_statistics['median']) <= half_bin + 1e-9)
+        assert np.all(np.abs(trend_df.loc[week_statistics.index, f'{metric["name"]} 90th percentile'] - week_statistics.iloc[:, 2]) <= half_bin + 1e-9)
+
+# buckets updated from saved state of earlier runs match buckets aggregated from scratch, and settled buckets are reused as saved
+@pytest.mark.parametrize('period', list(summary.trend_periods))
+def test_trend_state_update(longread_extract, period, tmp_path):
+    run_dates = pd.to_datetime(longread_extract['Run Date'])
+    earlier_runs = longread_extract[run_dates < run_dates.max() - pd.Timedelta(days=60)]
+    summary.write_trend_state(tmp_path / 'trends.npz', {period : summary.get_trend_buckets(earlier_runs, period)})
+    previous = summary.read_trend_state(tmp_path / 'trends.npz')[period]
+    expected_buckets = summary.get_trend_buckets(longread_extract, period)
+    assert_buckets_equal(summary.get_trend_buckets(longread_extract, period, previous), expected_buckets)
+    # settled buckets taken from state: marked sums kept, later buckets aggregated again
+    marked_buckets = summary.get_trend_buckets(longread_extract, period, dataclasses.replace(previous, sums=previous.sums + 1000))
+    settled = previous.keys < previous.keys[-1]
+    assert settled.sum() > 1
+    np.testing.assert_allclose(marked_buckets.sums[:settled.sum()], expected_buckets.sums[:settled.sum()] + 1000)
+    np.testing.assert_allclose(marked_buckets.sums[settled.sum():], expected_buckets.sums[settled.sum():])
+    # run added to a settled bucket: all runs aggregated again
+    backfilled_runs = pd.concat([longread_extract, earlier_runs.iloc[[0]]], ignore_index=True)
+    assert_buckets_equal(summary.get_trend_buckets(backfilled_runs, period, dataclasses.replace(previous, sums=previous.sums + 1000)), summary.get_trend_buckets(backfilled_runs, period))
+
+# run changed in a settled bucket (same run count): settled buckets not reused, all runs aggregated again
+@pytest.mark.parametrize('period', list(summary.trend_periods))
+@pytest.mark.parametrize('change', ['output', 'flow cell'])
+def test_trend_state_changed_run(longread_extract, period, change):
+    run_dates = pd.to_datetime(longread_extract['Run Date'])
+    previous = summary.get_trend_buckets(longread_extract, period)
+    changed_runs = longread_extract.copy()
+    first_run = run_dates.idxmin()
+    if change == 'output':
+        changed_runs.loc[first_run, 'Data output (Gb)'] += 50
+    else:
+        changed_runs.loc[first_run, 'Flow Cell ID'] = 'PAX00000'
+    marked_previous = dataclasses.replace(previous, sums=previous.sums + 1000)
+    assert_buckets_equal(summary.get_trend_buckets(changed_runs, period, marked_previous), summary.get_trend_buckets(changed_runs, period))